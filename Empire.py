@@ -6,7 +6,9 @@ import sys
 import cloudpickle
 import time
 import os
+import numpy as np
 from datetime import datetime
+from reader import read_table_cache, table_columns, column_list
 
 # import cartopy
 # import cartopy.crs as ccrs
@@ -20,6 +22,116 @@ def strfdelta(tdelta, fmt):
     d["M"], d["S"] = divmod(rem, 60)
     return fmt.format(**d)
 
+class TabDataPortal(DataPortal):
+    # DataPortal that loads a set or param from the in-memory tables returned by
+    # reader.generate_tab_files(in_memory=True), or else from the binary columnar file written next to the
+    # .tab file (see reader.save_table_cache) when it is present and up to date, instead of parsing the text.
+    # Values the cache stores once per block (e.g. a sampled window repeated over periods and scenarios) are
+    # converted once and the rows repeating a block share them.
+    def __init__(self, tables=None, tab_file_path=None, **kwds):
+        DataPortal.__init__(self, **kwds)
+        self.tables = tables if tables is not None else {}
+        self.tab_file_path = tab_file_path
+
+    def cached_columns(self, filename):
+        if self.tab_file_path is not None and filename.startswith(self.tab_file_path + "/"):
+            table = self.tables.get(filename[len(self.tab_file_path) + 1:])
+            if table is not None:
+                columns = table_columns(table)
+                if columns is None:
+                    # Columns mixing numbers and text keep the values as read from Excel
+                    columns = [np.array(table.iloc[:, ind].tolist(), dtype=object) for ind in range(table.shape[1])]
+                return columns
+        return read_table_cache(filename, blocks=True)
+
+    def load(self, filename=None, format=None, set=None, param=None, **kwds):
+        columns = None
+        if filename is not None and not kwds and \
+                ((format == 'set' and param is None and set is not None) or
+                 (format == 'table' and set is None and isinstance(param, Component))):
+            columns = self.cached_columns(filename)
+        if not columns:
+            return DataPortal.load(self, filename=filename, format=format, set=set, param=param, **kwds)
+        # A table with a header only (e.g. in a reduced dataset) is an empty set or a param left at its default
+        rows = list(zip(*[column_list(column) for column in columns]))
+        if set is not None:
+            self[set.local_name] = {None: [row if len(row) > 1 else row[0] for row in rows]}
+        elif not rows:
+            return
+        elif len(columns) == 1:
+            self[param.local_name] = {None: rows[0][0]}
+        else:
+            self[param.local_name] = {row[:-1] if len(row) > 2 else row[0]: row[-1] for row in rows}
+
+    def portal(self):
+        # Model.create_instance only accepts a plain DataPortal, hand over the loaded data in one
+        return DataPortal(data_dict=self._data)
+
+def check_tab_data(model, data, members, extended=None):
+    # Function description: check the index of every loaded param and the members of every loaded set against the
+    # sets they are declared over, so that a misspelled node or generator name stops the run before the instance
+    # build instead of failing deep inside it or silently falling back to the param default
+    # Input: members: set name -> members, for the sets that are initialized in run_empire rather than loaded
+    #        extended: set name -> names of the sets whose members a BuildAction adds to it
+    # Output: list of problems, empty if the data is consistent
+    loaded = list(data.keys())
+    if extended is None:
+        extended = {}
+
+    def columns_of(domain):
+        # (set name, width, members) per component set of a domain, or None if one of them is not known
+        columns = []
+        for subset in domain.subsets(expand_all_set_operators=False):
+            if subset.parent_block() is not model:
+                return None
+            if subset.local_name in loaded:
+                values = list(data[subset.local_name])
+            else:
+                values = list(members.get(subset.local_name, []))
+            for other in extended.get(subset.local_name, []):
+                if other in loaded:
+                    values += data[other]
+            if not values:
+                return None
+            width = len(values[0]) if isinstance(values[0], tuple) else 1
+            columns.append((subset.local_name, width, frozenset(values)))
+        return columns
+
+    problems = []
+    for component in model.component_objects((Set, Param), descend_into=False):
+        name = component.local_name
+        if name not in loaded:
+            continue
+        if isinstance(component, Param):
+            if not component.is_indexed():
+                continue
+            keys = list(data[name])
+            columns = columns_of(component.index_set())
+        else:
+            keys = data[name]
+            columns = columns_of(component.domain)
+        if columns is None:
+            continue
+        width = sum(column[1] for column in columns)
+        missing = {}
+        for key in keys:
+            if not isinstance(key, tuple):
+                key = (key,)
+            if len(key) != width:
+                problems.append(name + ": " + str(key) + " has " + str(len(key)) + " index column(s), expected " +
+                                str(width) + " (" + ", ".join(column[0] for column in columns) + ")")
+                break
+            pos = 0
+            for set_name, set_width, values in columns:
+                part = key[pos] if set_width == 1 else key[pos:pos + set_width]
+                if part not in values:
+                    missing.setdefault(set_name, []).append(part)
+                pos += set_width
+        for set_name, parts in missing.items():
+            problems.append(name + ": " + str(len(parts)) + " key(s) not in set " + set_name + ", e.g. " +
+                            ", ".join(repr(part) for part in list(dict.fromkeys(parts))[:5]))
+    return problems
+
 # noinspection PyTypeChecker
 def run_empire(name, tab_file_path, result_file_path, scenariogeneration, scenario_data_path,
                solver, temp_dir, FirstHoursOfRegSeason, FirstHoursOfPeakSeason, lengthRegSeason,
@@ -27,7 +139,7 @@ def run_empire(name, tab_file_path, result_file_path, scenariogeneration, scenar
                discountrate, WACC, LeapYearsInvestment, WRITE_LP, PICKLE_INSTANCE, EMISSION_CAP,
                USE_TEMP_DIR, offshoreNodesList, windfarmNodes = None,
                hydrogen=False, HEATMODULE = True, FLEX_IND=True,
-               steel_CCS_cost_increase=None, steel_CCS_capture_rate=None):
+               steel_CCS_cost_increase=None, steel_CCS_capture_rate=None, tab_data=None):
 
     if USE_TEMP_DIR:
         TempfileManager.tempdir = temp_dir
@@ -166,7 +278,7 @@ def run_empire(name, tab_file_path, result_file_path, scenariogeneration, scenar
 
     #Load the data
 
-    data = DataPortal()
+    data = TabDataPortal(tab_data, tab_file_path)
     data.load(filename=tab_file_path + "/" + 'Sets_Generator.tab',format="set", set=model.Generator)
     data.load(filename=tab_file_path + "/" + 'Sets_RampingGenerators.tab',format="set", set=model.RampingGenerators)
     data.load(filename=tab_file_path + "/" + 'Sets_HydroGenerator.tab',format="set", set=model.HydroGenerator)
@@ -274,6 +386,16 @@ def run_empire(name, tab_file_path, result_file_path, scenariogeneration, scenar
             for tg in model.GeneratorsOfTechnologyHeat:
                 model.GeneratorsOfTechnology.add(tg)
         model.build_SetsHeatModule = BuildAction(rule=prepSetsHeatModule_rule)
+        extendedSets = {'Generator': ['GeneratorTR', 'GeneratorTR_Industrial'],
+                        'RampingGenerators': ['RampingGeneratorsHeat'],
+                        'Storage': ['StorageTR'],
+                        'DependentStorage': ['DependentStorageTR'],
+                        'Technology': ['TechnologyHeat'],
+                        'StoragesOfNode': ['StoragesOfNodeHeat'],
+                        'GeneratorsOfNode': ['GeneratorsOfNodeHeat'],
+                        'GeneratorsOfTechnology': ['GeneratorsOfTechnologyHeat']} # added by prepSetsHeatModule_rule
+    else:
+        extendedSets = {}
 
     def prep_hydrogenGenerators_rule(model):
         for g in model.Generator:
@@ -663,6 +785,11 @@ def run_empire(name, tab_file_path, result_file_path, scenariogeneration, scenar
     data.load(filename=scenariopath + "/" + 'Stochastic_HydroGenMaxSeasonalProduction.tab', param=model.maxRegHydroGenRaw, format="table")
     data.load(filename=scenariopath + "/" + 'Stochastic_StochasticAvailability.tab', param=model.genCapAvailStochRaw, format="table")
     data.load(filename=scenariopath + "/" + 'Stochastic_ElectricLoadRaw.tab', param=model.sloadRaw, format="table")
+    # Probabilities of scenarios clustered or reduced from a larger pool (see scenario_random.representative_key
+    # and reduce_scenarios), else the scenarios are equally likely
+    scenario_probabilities = os.path.exists(scenariopath + "/" + 'Stochastic_ScenarioProbability.tab')
+    if scenario_probabilities:
+        data.load(filename=scenariopath + "/" + 'Stochastic_ScenarioProbability.tab', param=model.sceProbab, format="table")
 
     # data.load(filename=tab_file_path + "/" + 'General_seasonScale.tab', param=model.seasScale, format="table")
     data.load(filename=tab_file_path + "/" + 'General_AvailableBioEnergy.tab', param=model.availableBioEnergy, format="table")
@@ -785,7 +912,16 @@ def run_empire(name, tab_file_path, result_file_path, scenariogeneration, scenar
         model.build_ParametersHeatModule = BuildAction(rule=prepParametersHeatModule_rule)
 
     def prepSceProbab_rule(model):
-        #Build an equiprobable probability distribution for scenarios
+        #Build an equiprobable probability distribution for scenarios, unless their probabilities are loaded
+
+        if scenario_probabilities:
+            missing = [sce for sce in model.Scenario if sce not in model.sceProbab.sparse_keys()]
+            if missing:
+                raise ValueError("Stochastic_ScenarioProbability.tab has no probability for " + ", ".join(missing))
+            total = sum(value(model.sceProbab[sce]) for sce in model.Scenario)
+            if abs(total - 1) > 1e-6:
+                raise ValueError("The scenario probabilities in Stochastic_ScenarioProbability.tab sum to " + str(total))
+            return
 
         for sce in model.Scenario:
             model.sceProbab[sce] = value(1/len(model.Scenario))
@@ -2451,12 +2587,22 @@ def run_empire(name, tab_file_path, result_file_path, scenariogeneration, scenar
 
     print("Objective and constraints read...")
 
+    print("{hour}:{minute}:{second}: Checking input data against the declared sets...".format(
+        hour=datetime.now().strftime("%H"), minute=datetime.now().strftime("%M"), second=datetime.now().strftime("%S")))
+
+    problems = check_tab_data(model, data, {'Period': Period, 'Operationalhour': Operationalhour, 'Season': Season,
+                                            'Scenario': Scenario, 'HoursOfSeason': HoursOfSeason}, extendedSets)
+    if problems:
+        for problem in problems:
+            print("ERROR! " + problem)
+        sys.exit("ERROR! Input data does not match the declared sets, see above")
+
     print("{hour}:{minute}:{second}: Building instance...".format(
         hour=datetime.now().strftime("%H"), minute=datetime.now().strftime("%M"), second=datetime.now().strftime("%S")))
 
     start = time.time()
 
-    instance = model.create_instance(data) #, report_timing=True)
+    instance = model.create_instance(data.portal()) #, report_timing=True)
     instance.dual = Suffix(direction=Suffix.IMPORT) #Make sure the dual value is collected into solver results (if solver supplies dual information)
 
     inv_per = []
@@ -0,0 +1,161 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import pandas as pd
+
+from reader import sheet_jobs, write_sets, write_file, generate_tab_files
+
+# Benchmark of the Excel -> .tab conversion in reader.py. Every sheet is converted from scratch into a
+# temporary folder; wall time, peak Python heap (tracemalloc, measured in a separate pass since tracing
+# slows the conversion down), rows and bytes written are reported per sheet and per workbook and saved as JSON.
+#
+#   python benchmark_reader.py                                  -> writes benchmark_reader.json
+#   python benchmark_reader.py --baseline benchmark_reader.json -> also compares with an earlier run
+
+def output_size(tab_file_path, files):
+    # Function description: rows (without header) and bytes of the written .tab files and their binary caches
+    rows = 0
+    size = 0
+    for f in files:
+        path = tab_file_path + "/" + f
+        with open(path, 'rb') as tab:
+            rows += sum(1 for line in tab) - 1
+        size += os.path.getsize(path)
+        cache = os.path.splitext(path)[0] + '.npz'
+        if os.path.exists(cache):
+            size += os.path.getsize(cache)
+    return rows, size
+
+def bench_workbook(filepath, excel, sets, tables, tab_file_path, trace=False):
+    # Function description: convert one workbook like reader.read_workbook, timing every sheet
+    # Output: dict with workbook totals and a list of per-sheet results
+    def measure(start):
+        result = {'seconds': time.perf_counter() - start}
+        if trace:
+            result['peak_bytes'] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.reset_peak()
+        return result
+
+    sheets = []
+    if trace:
+        tracemalloc.reset_peak()
+    start = time.perf_counter()
+    workbook = pd.ExcelFile(filepath + "/" + excel)
+    opened = measure(start)
+    for sheet, columns in sets:
+        tick = time.perf_counter()
+        files = write_sets(workbook.parse(sheet), excel, sheet, tab_file_path, columns)
+        sheets.append(dict(sheet=sheet, files=list(files), **measure(tick)))
+    for sheet, columns in tables:
+        tick = time.perf_counter()
+        files = write_file(workbook.parse(sheet, skiprows=2, usecols=columns), excel, sheet, tab_file_path)
+        sheets.append(dict(sheet=sheet, files=list(files), **measure(tick)))
+    workbook.close()
+    total = {'seconds': time.perf_counter() - start}
+    if trace:
+        total['peak_bytes'] = max([opened['peak_bytes']] + [s['peak_bytes'] for s in sheets])
+    return dict(excel=excel, open_seconds=opened['seconds'], sheets=sheets, **total)
+
+def run_benchmark(filepath, HEATMODULE=True, hydrogen=True, workers=1, memory=True):
+    tab_file_path = tempfile.mkdtemp(prefix='benchmark_tabs_')
+    try:
+        jobs = sheet_jobs(HEATMODULE, hydrogen)
+        os.makedirs(tab_file_path + '/HeatModule', exist_ok=True)
+        results = [bench_workbook(filepath, tab_file_path=tab_file_path, **wb) for wb in jobs]
+
+        if memory:
+            tracemalloc.start()
+            for wb, result in zip(jobs, results):
+                traced = bench_workbook(filepath, tab_file_path=tab_file_path, trace=True, **wb)
+                result['peak_bytes'] = traced['peak_bytes']
+                for sheet, traced_sheet in zip(result['sheets'], traced['sheets']):
+                    sheet['peak_bytes'] = traced_sheet['peak_bytes']
+            tracemalloc.stop()
+
+        for result in results:
+            for sheet in result['sheets']:
+                sheet['rows'], sheet['bytes'] = output_size(tab_file_path, sheet['files'])
+            result['rows'] = sum(s['rows'] for s in result['sheets'])
+            result['bytes'] = sum(s['bytes'] for s in result['sheets'])
+
+        # End-to-end generate_tab_files from scratch, as run_EMPIRE.py calls it
+        shutil.rmtree(tab_file_path)
+        start = time.perf_counter()
+        generate_tab_files(filepath, tab_file_path, HEATMODULE=HEATMODULE, hydrogen=hydrogen, force=True,
+                           workers=workers)
+        end_to_end = time.perf_counter() - start
+    finally:
+        shutil.rmtree(tab_file_path, ignore_errors=True)
+
+    total = {'seconds': sum(r['seconds'] for r in results),
+             'generate_tab_files_seconds': end_to_end,
+             'rows': sum(r['rows'] for r in results),
+             'bytes': sum(r['bytes'] for r in results),
+             'files': sum(len(s['files']) for r in results for s in r['sheets'])}
+    if memory:
+        total['peak_bytes'] = max(r['peak_bytes'] for r in results)
+    return {'dataset': filepath,
+            'date': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'HEATMODULE': HEATMODULE,
+            'hydrogen': hydrogen,
+            'workers': workers,
+            'total': total,
+            'workbooks': results}
+
+def print_report(report, baseline=None):
+    previous = {}
+    if baseline is not None:
+        previous = {r['excel']: r for r in baseline['workbooks']}
+
+    def compare(seconds, old):
+        if old is None:
+            return ''
+        return '  ({:+.0f}% vs baseline)'.format(100 * (seconds / old['seconds'] - 1))
+
+    for result in report['workbooks']:
+        print("{:40s} {:8.3f} s {:9d} rows {:11d} bytes {:>10s}{}".format(
+            result['excel'], result['seconds'], result['rows'], result['bytes'],
+            '{:.1f} MB'.format(result['peak_bytes'] / 1e6) if 'peak_bytes' in result else '',
+            compare(result['seconds'], previous.get(result['excel']))))
+        old_sheets = {s['sheet']: s for s in previous.get(result['excel'], {}).get('sheets', [])}
+        for sheet in sorted(result['sheets'], key=lambda s: -s['seconds'])[:5]:
+            print("    {:36s} {:8.3f} s {:9d} rows{}".format(
+                sheet['sheet'], sheet['seconds'], sheet['rows'], compare(sheet['seconds'], old_sheets.get(sheet['sheet']))))
+    total = report['total']
+    print("Total: {:.3f} s per-sheet conversion, {:.3f} s generate_tab_files, {} files, {} rows, {} bytes".format(
+        total['seconds'], total['generate_tab_files_seconds'], total['files'], total['rows'], total['bytes']))
+    if baseline is not None:
+        print("Baseline ({}): {:.3f} s per-sheet conversion, {:.3f} s generate_tab_files".format(
+            baseline['date'], baseline['total']['seconds'], baseline['total']['generate_tab_files_seconds']))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the Excel to .tab conversion of reader.py")
+    parser.add_argument('--data', default='Data handler/full_model', help="folder holding the workbooks")
+    parser.add_argument('--output', default='benchmark_reader.json', help="JSON file the results are saved to")
+    parser.add_argument('--baseline', default=None, help="earlier JSON result to compare with")
+    parser.add_argument('--workers', type=int, default=1, help="workers for the end-to-end generate_tab_files run")
+    parser.add_argument('--no-heatmodule', action='store_true')
+    parser.add_argument('--no-hydrogen', action='store_true')
+    parser.add_argument('--no-memory', action='store_true', help="skip the tracemalloc pass")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.baseline is not None:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    report = run_benchmark(args.data, HEATMODULE=not args.no_heatmodule, hydrogen=not args.no_hydrogen,
+                           workers=args.workers, memory=not args.no_memory)
+    print_report(report, baseline)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=1)
+    print("Results saved to " + args.output)
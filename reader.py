@@ -1,291 +1,919 @@
 import pandas as pd
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+import json
 import os
+import shutil
+import zipfile
 
-def read_file(filepath, excel, sheet, columns, tab_file_path):
-    input_sheet = pd.read_excel(filepath + "/" +excel, sheet, skiprows=2)
+# Bump when the way sheets are converted changes, so existing manifests are discarded
+TAB_FORMAT_VERSION = 2
+MANIFEST_NAME = 'tab_manifest.json'
+
+def tab_name(excel, sheet):
+    return excel.replace(".xlsx", '_') + sheet + '.tab'
+
+def cache_name(path):
+    return os.path.splitext(path)[0] + '.npz'
+
+def cache_column(values):
+    # Function description: convert a column to the typed array Pyomo would produce when parsing the .tab file,
+    # numbers as int/float and everything else as str. Returns None for columns mixing numbers and text.
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        # convert the categories only and take them by code
+        categories = cache_column(pd.Series(values.cat.categories.astype(str)))
+        if categories is None:
+            return None
+        return categories[values.cat.codes.to_numpy()]
+    if values.dtype == np.float32:
+        # float32 columns (sampled from the time series cache) are written with their shortest repr,
+        # keep the float64 values of that text
+        return values.to_numpy().astype(str).astype(np.float64)
+    if values.dtype.kind in 'iuf':
+        return values.to_numpy()
+    numeric = pd.to_numeric(values, errors='coerce')
+    if numeric.notna().all():
+        return numeric.to_numpy()
+    if numeric.notna().any():
+        return None
+    return np.asarray(values.astype(str), dtype=str)
+
+def block_column(blocks, stored=None, size=0):
+    # Function description: typed values (see cache_column) of a column given as blocks of rows in row order, each a
+    # (key, values) pair. The values of blocks with the same key are stored once, blocks with key None every time.
+    # Input: stored: key -> offset of the blocks stored before (updated), size: number of values stored before
+    # Output: [list of the value arrays to store, array of [offset, length] per block], or None if the values mix
+    # numbers and text
+    if stored is None:
+        stored = {}
+    values = []
+    segments = np.empty((len(blocks), 2), dtype=np.int64)
+    for ind, (key, block) in enumerate(blocks):
+        offset = stored.get(key) if key is not None else None
+        if offset is None:
+            column = cache_column(pd.Series(block))
+            if column is None:
+                return None
+            offset = size
+            size += len(column)
+            values.append(column)
+            if key is not None:
+                stored[key] = offset
+        segments[ind] = [offset, len(block)]
+    if len(set(column.dtype.kind in 'iuf' for column in values)) > 1:
+        return None
+    return [values, segments]
+
+def expand_blocks(values, segments):
+    # Function description: the full column of a column stored once per block (see block_column)
+    segments = segments.reshape(-1, 2)
+    lengths = segments[:, 1]
+    starts = np.cumsum(lengths) - lengths
+    return values[np.repeat(segments[:, 0] - starts, lengths) + np.arange(lengths.sum(), dtype=np.int64)]
+
+def column_list(column):
+    # Function description: the values of a cache column as list. The rows of a column read as blocks (see
+    # read_table_cache) share the Python objects of the block they repeat.
+    if not isinstance(column, tuple):
+        return column.tolist()
+    [values, segments] = column
+    shared = {}
+    rows = []
+    for offset, length in segments.tolist():
+        if (offset, length) not in shared:
+            shared[(offset, length)] = values[offset:offset + length].tolist()
+        rows += shared[(offset, length)]
+    return rows
+
+def as_blocks(column):
+    # column of the cache as (values, segments), a plain column being one block
+    if isinstance(column, tuple):
+        return column
+    return (column, np.array([[0, len(column)]], dtype=np.int64))
+
+def table_columns(save_csv_frame):
+    # Function description: typed column arrays of a cleaned table (see cache_column), or None if a column mixes types
+    columns = [cache_column(save_csv_frame.iloc[:, ind]) for ind in range(save_csv_frame.shape[1])]
+    if any(column is None for column in columns):
+        return None
+    return columns
+
+def cache_columns(save_csv_frame, blocks=None):
+    # typed columns of the frame (see table_columns), with blocks the last one as (values, segments) (see
+    # block_column), or None if a column mixes numbers and text
+    if blocks is None:
+        return table_columns(save_csv_frame)
+    columns = table_columns(save_csv_frame.iloc[:, :-1])
+    values = block_column(blocks)
+    if columns is None or values is None:
+        return None
+    return columns + [(np.concatenate(values[0]) if values[0] else np.empty(0), values[1])]
+
+def cache_arrays(header, columns):
+    # arrays of the npz cache: a column read as blocks (values, segments) is saved as "b<ind>" and "s<ind>"
+    arrays = {'columns': np.asarray(header, dtype=str)}
+    for ind, column in enumerate(columns):
+        if isinstance(column, tuple):
+            arrays['b' + str(ind)] = column[0]
+            arrays['s' + str(ind)] = column[1]
+        else:
+            arrays['c' + str(ind)] = column
+    return arrays
+
+def save_table_cache(save_csv_frame, path, blocks=None):
+    # Function description: save the frame written to the .tab file at path as binary columnar file "excel_sheet.npz"
+    # next to it, which Empire.run_empire loads instead of parsing the text. A stale cache is removed.
+    # With blocks (the rows of the last column as (key, values) pairs, see block_column) the values of the last
+    # column are saved once per key.
+    columns = cache_columns(save_csv_frame, blocks)
+    if columns is None:
+        if os.path.exists(cache_name(path)):
+            os.remove(cache_name(path))
+        return
+    tmp_path = cache_name(path) + '.' + str(os.getpid()) + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, **cache_arrays(save_csv_frame.columns, columns))
+    os.replace(tmp_path, cache_name(path))
+
+def read_table_cache(path, blocks=False):
+    # Function description: read the binary columnar file saved next to the .tab file at path
+    # Output: list of column arrays, or None if there is no cache at least as new as the .tab file. A column saved
+    # once per block is expanded, or with blocks=True returned as (values, segments) (see block_column).
+    cache = cache_name(path)
+    if not os.path.exists(cache):
+        return None
+    if os.path.exists(path) and os.path.getmtime(cache) < os.path.getmtime(path):
+        return None
+    columns = []
+    with np.load(cache) as npz:
+        for ind in range(len(npz['columns'])):
+            if 's' + str(ind) in npz.files:
+                column = (npz['b' + str(ind)], npz['s' + str(ind)])
+                if not blocks:
+                    column = expand_blocks(*column)
+            else:
+                column = npz['c' + str(ind)]
+            columns.append(column)
+    return columns
+
+def store_file(store, digest, extension='.tab'):
+    return store + "/" + digest[:2] + "/" + digest + extension
+
+def link_file(source, path):
+    # Hard link source to path, replacing path. Falls back to a copy where hard links are not possible
+    # (other file system, no permission). Writers always replace files, so linked files are never modified in place.
+    tmp_path = path + '.' + str(os.getpid()) + '.tmp'
+    try:
+        os.link(source, tmp_path)
+    except OSError:
+        shutil.copy2(source, tmp_path)
+    os.replace(tmp_path, path)
+
+def link_from_store(store, digest, path):
+    # Function description: place the stored .tab file with the given content hash (and its binary cache) at path
+    link_file(store_file(store, digest), path)
+    if os.path.exists(store_file(store, digest, '.npz')):
+        link_file(store_file(store, digest, '.npz'), cache_name(path))
+    elif os.path.exists(cache_name(path)):
+        os.remove(cache_name(path))
+
+def save_tab(save_csv_frame, path, store=None, blocks=None):
+    # Write to a temporary file next to the target and move it in place, so a .tab file is never seen half written
+    # With a store, the file is kept once in the content-addressed store under its sha256 and linked to path
+    # blocks: see save_table_cache
+    # Output: the content hash of the file if a store is used, else None
+    tmp_path = path + '.' + str(os.getpid()) + '.tmp'
+    save_csv_frame.to_csv(tmp_path, header=True, index=None, sep='\t', mode='w')
+    if store is None:
+        os.replace(tmp_path, path)
+        save_table_cache(save_csv_frame, path, blocks)
+        return None
+    digest = hash_file(tmp_path)
+    if os.path.exists(store_file(store, digest)):
+        os.remove(tmp_path)
+    else:
+        if not os.path.exists(store + "/" + digest[:2]):
+            os.makedirs(store + "/" + digest[:2], exist_ok=True)
+        os.replace(tmp_path, store_file(store, digest))
+        save_table_cache(save_csv_frame, store_file(store, digest), blocks)
+    link_from_store(store, digest, path)
+    return digest
+
+class TabWriter:
+    # Writes a .tab file chunk by chunk, with the same text and binary cache (see save_table_cache) save_tab writes
+    # for the whole table. The typed cache columns of every chunk are spilled to a temporary file and assembled
+    # into the cache when the writer is closed, so memory is bounded by a chunk instead of the whole table.
+    # Chunks written with blocks store the values of the last column once per block key over all chunks.
+    # Used as context manager, the files are only moved in place if no exception occurred.
+
+    def __init__(self, path, columns):
+        self.path = path
+        self.columns = [str(c) for c in columns]
+        self.tmp_path = path + '.' + str(os.getpid()) + '.tmp'
+        self.spill_path = cache_name(path) + '.' + str(os.getpid()) + '.chunks'
+        self.text = open(self.tmp_path, 'w', newline='')
+        # the header goes through to_csv as the rows do, with the same line terminator as save_tab
+        pd.DataFrame(columns=self.columns).to_csv(self.text, header=True, index=None, sep='\t')
+        self.spill = open(self.spill_path, 'wb')
+        self.chunks = []  # per chunk: the (dtype, offset in the spill file, length) of every column
+        self.cached = True
+        self.stored = {}  # block key -> offset of its values in the last column
+        self.segments = []  # per chunk: [offset, length] of its blocks in the last column
+        self.size = 0  # values of the last column spilled
+        self.blocked = False
+
+    def write(self, save_csv_frame, blocks=None):
+        save_csv_frame.to_csv(self.text, header=False, index=None, sep='\t')
+        if not self.cached:
+            return
+        if blocks is None:
+            columns = table_columns(save_csv_frame)
+            segments = np.array([[self.size, len(save_csv_frame)]], dtype=np.int64)
+        else:
+            columns = table_columns(save_csv_frame.iloc[:, :-1])
+            values = block_column(blocks, self.stored, self.size)
+            if columns is not None and values is not None:
+                [values, segments] = values
+                columns.append(np.concatenate(values) if values else np.empty(0))
+                self.blocked = True
+            else:
+                columns = None
+        if columns is None:
+            self.cached = False
+            return
+        chunk = []
+        for column in columns:
+            chunk.append((column.dtype, self.spill.tell(), len(column)))
+            self.spill.write(np.ascontiguousarray(column).tobytes())
+        self.chunks.append(chunk)
+        self.segments.append(segments)
+        self.size += len(columns[-1])
+
+    def cache_dtypes(self):
+        # dtype of every cache column over all chunks, or None if a column mixes numbers and text
+        if not self.chunks:
+            return [np.dtype(np.float64)] * len(self.columns)
+        dtypes = []
+        for ind in range(len(self.columns)):
+            # chunks with no values of a column (e.g. only repeated blocks) do not decide its dtype
+            chunk_dtypes = [chunk[ind][0] for chunk in self.chunks if chunk[ind][2] > 0] or \
+                           [chunk[ind][0] for chunk in self.chunks]
+            if len(set(dtype.kind in 'iuf' for dtype in chunk_dtypes)) > 1:
+                return None
+            dtypes.append(np.result_type(*chunk_dtypes))
+        return dtypes
+
+    def save_cache(self, dtypes):
+        tmp_path = cache_name(self.path) + '.' + str(os.getpid()) + '.tmp'
+        with zipfile.ZipFile(tmp_path, 'w', zipfile.ZIP_STORED, allowZip64=True) as npz:
+            with npz.open('columns.npy', 'w') as f:
+                np.lib.format.write_array(f, np.asarray(self.columns, dtype=str))
+            for ind, dtype in enumerate(dtypes):
+                name = 'b' if self.blocked and ind == len(dtypes) - 1 else 'c'
+                with npz.open(name + str(ind) + '.npy', 'w', force_zip64=True) as f:
+                    np.lib.format.write_array_header_1_0(f, {'descr': np.lib.format.dtype_to_descr(dtype),
+                                                             'fortran_order': False,
+                                                             'shape': (sum(chunk[ind][2] for chunk in self.chunks),)})
+                    for chunk in self.chunks:
+                        [chunk_dtype, offset, n] = chunk[ind]
+                        column = np.fromfile(self.spill_path, dtype=chunk_dtype, count=n, offset=offset)
+                        f.write(column.astype(dtype).tobytes())
+            if self.blocked:
+                with npz.open('s' + str(len(dtypes) - 1) + '.npy', 'w') as f:
+                    np.lib.format.write_array(f, np.concatenate(self.segments))
+        os.replace(tmp_path, cache_name(self.path))
 
-    data_table = input_sheet.iloc[:, columns]
+    def close(self):
+        self.text.close()
+        self.spill.close()
+        try:
+            os.replace(self.tmp_path, self.path)
+            dtypes = self.cache_dtypes() if self.cached else None
+            if dtypes is not None:
+                self.save_cache(dtypes)
+            elif os.path.exists(cache_name(self.path)):
+                os.remove(cache_name(self.path))
+        finally:
+            os.remove(self.spill_path)
+
+    def abort(self):
+        self.text.close()
+        self.spill.close()
+        for f in [self.tmp_path, self.spill_path]:
+            if os.path.exists(f):
+                os.remove(f)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+def append_tab(save_csv_frame, path, blocks=None):
+    # Function description: append the rows of save_csv_frame to the .tab file at path (written by save_tab with the
+    # same columns) without rewriting its rows, and extend its binary cache. Writes a new file if there is none.
+    # blocks: see save_table_cache, blocks are only shared within the rows appended
+    if not os.path.exists(path):
+        save_tab(save_csv_frame, path, blocks=blocks)
+        return
+    with open(path) as f:
+        header = f.readline().rstrip('\n').split('\t')
+    if header != [str(c) for c in save_csv_frame.columns]:
+        raise ValueError("Cannot append columns " + str(list(save_csv_frame.columns)) + " to " + path +
+                         " with columns " + str(header))
+    cache = read_table_cache(path, blocks=True)
+    tmp_path = path + '.' + str(os.getpid()) + '.tmp'
+    shutil.copyfile(path, tmp_path)
+    save_csv_frame.to_csv(tmp_path, header=False, index=None, sep='\t', mode='a')
+    os.replace(tmp_path, path)
+    columns = cache_columns(save_csv_frame, blocks)
+    if columns is not None and cache is not None:
+        # numbers appended to a text column (or the other way round) would no longer match the .tab file
+        if any((as_blocks(old)[0].dtype.kind in 'iuf') != (as_blocks(new)[0].dtype.kind in 'iuf')
+               for old, new in zip(cache, columns)):
+            columns = None
+    if cache is None or columns is None:
+        if os.path.exists(cache_name(path)):
+            os.remove(cache_name(path))
+        return
+    appended = []
+    for old, new in zip(cache, columns):
+        if isinstance(old, tuple) or isinstance(new, tuple):
+            [old_values, old_segments] = as_blocks(old)
+            [new_values, new_segments] = as_blocks(new)
+            appended.append((np.concatenate([old_values, new_values]),
+                             np.concatenate([old_segments, new_segments + [len(old_values), 0]])))
+        else:
+            appended.append(np.concatenate([old, new]))
+    tmp_path = cache_name(path) + '.' + str(os.getpid()) + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, **cache_arrays(header, appended))
+    os.replace(tmp_path, cache_name(path))
+
+def is_set_workbook(excel):
+    # Table sheets of the set workbooks are set relations (all columns are keys), all other table sheets
+    # are parameters (key columns followed by the value)
+    return os.path.basename(excel).endswith('Sets.xlsx')
+
+def clean_keys(values):
+    # Function description: remove whitespace from set members. Numeric members stay numbers (as Pyomo reads them
+    # from the .tab file), all others become a categorical column.
+    if values.dtype.kind in 'iuf':
+        return values
+    values = values.astype(str).str.replace('\s', '', regex=True)
+    numeric = pd.to_numeric(values, errors='coerce')
+    if numeric.notna().all():
+        return numeric
+    return values.astype('category')
+
+def clean_values(values, name):
+    # Function description: convert parameter values to float. Raises ValueError listing the Excel rows
+    # holding something that is not a number, instead of letting Pyomo fail on it during the instance build.
+    if values.dtype.kind not in 'iuf':
+        values = values.astype(str).str.replace('\s', '', regex=True)
+    numeric = pd.to_numeric(values, errors='coerce')
+    if numeric.isna().any():
+        bad = values[numeric.isna()]
+        raise ValueError(name + ": column " + str(values.name) + " is not numeric in Excel row(s) " +
+                         ', '.join(str(row + 4) + " ('" + str(value) + "')" for row, value in bad.head(10).items()))
+    return numeric.astype(float)
+
+def clean_table(input_sheet, value_column=True, name=''):
+    # Function description: clean a parsed sheet into the typed table saved as .tab file
+    # Input: value_column: the last column holds parameter values (False for set relations)
+    # Output: table with the key columns normalized by clean_keys and the values as float
+    data_table = input_sheet
     data_table.columns = pd.Series(data_table.columns).str.replace(' ', '_')
     data_nonempty = data_table.dropna()
 
     save_csv_frame = pd.DataFrame(data_nonempty)
 
-    save_csv_frame.replace('\s', '', regex=True, inplace=True)
+    keys = save_csv_frame.columns[:-1] if value_column else save_csv_frame.columns
+    for column in keys:
+        save_csv_frame[column] = clean_keys(save_csv_frame[column])
+    if value_column:
+        column = save_csv_frame.columns[-1]
+        save_csv_frame[column] = clean_values(save_csv_frame[column], name)
+    return save_csv_frame
+
+def clean_set(input_sheet, ind):
+    # Function description: clean column ind of a parsed set sheet into the table saved as .tab file
+    data_table = input_sheet.iloc[:, ind]
+    data_nonempty = data_table.dropna()
+    save_csv_frame = pd.DataFrame(data_nonempty)
+    save_csv_frame[save_csv_frame.columns[0]] = clean_keys(save_csv_frame.iloc[:, 0])
+    return save_csv_frame
+
+def write_file(input_sheet, excel, sheet, tab_file_path, store=None):
+    # Function description: clean a parsed parameter sheet and save it as .tab file "excel_sheet.tab"
+    save_csv_frame = clean_table(input_sheet, not is_set_workbook(excel), excel + " sheet " + sheet)
 
     if not os.path.exists(tab_file_path):
         os.makedirs(tab_file_path)
-    #excel = excel.replace(".xlsx", "_")
-    #excel = excel.replace("Excel/", "")
-    save_csv_frame.to_csv(tab_file_path + "/" + excel.replace(".xlsx", '_') + sheet + '.tab', header=True, index=None, sep='\t', mode='w')
-    #save_csv_frame.to_csv(excel.replace(".xlsx", '_') + sheet + '.tab', header=True, index=None, sep='\t', mode='w')
-
-def read_sets(filepath, excel, sheet, tab_file_path):
-    input_sheet = pd.read_excel(filepath + "/" + excel, sheet)
+    digest = save_tab(save_csv_frame, tab_file_path + "/" + tab_name(excel, sheet), store)
+    return {tab_name(excel, sheet): digest}
 
+def write_sets(input_sheet, excel, sheet, tab_file_path, columns=None, store=None):
+    # Function description: save every column of a parsed set sheet as .tab file "excel_column.tab"
+    # Input: columns limits the output to the named columns (default: all)
+    # Output: dict of the written file names and their content hash in the store (None without store)
+    written = {}
     for ind, column in enumerate(input_sheet.columns):
-        data_table = input_sheet.iloc[:, ind]
-        data_nonempty = data_table.dropna()
-        data_nonempty.replace(" ", "")
-        save_csv_frame = pd.DataFrame(data_nonempty)
-        save_csv_frame.replace('\s', '', regex=True, inplace=True)
+        if columns is not None and column not in columns:
+            continue
+        save_csv_frame = clean_set(input_sheet, ind)
         if not os.path.exists(tab_file_path):
             os.makedirs(tab_file_path)
-        #excel = excel.replace(".xlsx", "_")
-        #excel = excel.replace("Excel/", "")
         if 'Unnamed' in column:
             print('\n\n\nWARNING: Unnamed column found in sheet ' + sheet + '\n\n\n')
-        save_csv_frame.to_csv(tab_file_path + "/" + excel.replace(".xlsx", '_') + column + '.tab', header=True, index=None, sep='\t', mode='w')
-        #save_csv_frame.to_csv(excel.replace(".xlsx", '_') + column + '.tab', header=True, index=None, sep='\t', mode='w')
+        written[tab_name(excel, column)] = save_tab(save_csv_frame, tab_file_path + "/" + tab_name(excel, column), store)
+    return written
 
-def generate_tab_files(filepath, tab_file_path, HEATMODULE=True, hydrogen=False):
-    # Function description: read column value from excel sheet and save as .tab file "sheet.tab"
-    # Input: excel name, sheet name, the number of columns to be read
-    # Output:  .tab file
-    
-    print("Generating .tab-files...")
+def read_file(filepath, excel, sheet, columns, tab_file_path):
+    input_sheet = pd.read_excel(filepath + "/" + excel, sheet, skiprows=2, usecols=columns)
+    write_file(input_sheet, excel, sheet, tab_file_path)
 
-    # Reading Excel workbooks using our function read_file
+def read_sets(filepath, excel, sheet, tab_file_path):
+    input_sheet = pd.read_excel(filepath + "/" + excel, sheet)
+    write_sets(input_sheet, excel, sheet, tab_file_path)
 
-    if not os.path.exists(tab_file_path):
-        os.makedirs(tab_file_path)
+def hash_file(path):
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            sha.update(block)
+    return sha.hexdigest()
 
-    read_sets(filepath, 'Sets.xlsx', 'Nodes',tab_file_path = tab_file_path)
-    read_sets(filepath, 'Sets.xlsx', 'NaturalGasNodes',tab_file_path = tab_file_path)
-    read_sets(filepath, 'Sets.xlsx', 'SteelProducers',tab_file_path = tab_file_path)
-    read_sets(filepath, 'Sets.xlsx', 'AmmoniaProducers',tab_file_path = tab_file_path)
-    read_sets(filepath, 'Sets.xlsx', 'CementProducers',tab_file_path = tab_file_path)
-    read_sets(filepath, 'Sets.xlsx', 'OilProducers',tab_file_path = tab_file_path)
-    #read_sets(filepath, 'Sets.xlsx', 'Times', tab_file_path = tab_file_path)
-    read_sets(filepath, 'Sets.xlsx', 'LineType', tab_file_path = tab_file_path)
-    read_sets(filepath, 'Sets.xlsx', 'Technology', tab_file_path = tab_file_path)
-    read_sets(filepath, 'Sets.xlsx', 'Storage', tab_file_path = tab_file_path)
-    read_sets(filepath, 'Sets.xlsx', 'Generators', tab_file_path = tab_file_path)
-    read_file(filepath, 'Sets.xlsx', 'StorageOfNodes', [0, 1], tab_file_path = tab_file_path)
-    read_file(filepath, 'Sets.xlsx', 'GeneratorsOfNode', [0, 1], tab_file_path = tab_file_path)
-    read_file(filepath, 'Sets.xlsx', 'GeneratorsOfTechnology', [0, 1], tab_file_path = tab_file_path)
-    read_file(filepath, 'Sets.xlsx', 'DirectionalLines', [0, 1], tab_file_path = tab_file_path)
-    read_file(filepath, 'Sets.xlsx', 'LineTypeOfDirectionalLines', [0, 1, 2], tab_file_path = tab_file_path)
-    # GD: New for industry + natural gas module
-    read_sets(filepath, 'Sets.xlsx', 'NaturalGasTerminals', tab_file_path = tab_file_path)
-    read_file(filepath, 'Sets.xlsx', 'NaturalGasTerminalsOfNode', [0, 1], tab_file_path = tab_file_path)
-    read_file(filepath, 'Sets.xlsx', 'NaturalGasDirectionalLines', [0, 1], tab_file_path = tab_file_path)
+def hash_sheet(input_sheet, columns=None):
+    # Function description: hash the parsed content of a sheet, including its header and the columns read
+    sha = hashlib.sha256()
+    sha.update(repr((TAB_FORMAT_VERSION, columns, list(input_sheet.columns))).encode())
+    sha.update(pd.util.hash_pandas_object(input_sheet, index=False).values.tobytes())
+    return sha.hexdigest()
+
+def read_manifest(tab_file_path):
+    try:
+        with open(tab_file_path + "/" + MANIFEST_NAME) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if manifest.get('version') != TAB_FORMAT_VERSION:
+        return {}
+    return manifest.get('workbooks', {})
+
+def write_manifest(tab_file_path, manifest):
+    tmp_path = tab_file_path + "/" + MANIFEST_NAME + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump({'version': TAB_FORMAT_VERSION, 'workbooks': manifest}, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, tab_file_path + "/" + MANIFEST_NAME)
+
+def tabs_exist(tab_file_path, files):
+    return all(os.path.exists(tab_file_path + "/" + f) for f in files)
+
+def store_key(excel, sheet, columns):
+    return excel + '|' + sheet + '|' + json.dumps(columns)
+
+def read_store_entry(store, workbook_hash):
+    # Function description: the sheets of a workbook (by file hash) converted into the store by any earlier run
+    try:
+        with open(store + "/workbooks/" + workbook_hash + '.json') as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if entry.get('version') != TAB_FORMAT_VERSION:
+        return {}
+    return entry.get('sheets', {})
+
+def write_store_entry(store, workbook_hash, sheets):
+    if not os.path.exists(store + "/workbooks"):
+        os.makedirs(store + "/workbooks", exist_ok=True)
+    path = store + "/workbooks/" + workbook_hash + '.json'
+    tmp_path = path + '.' + str(os.getpid()) + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump({'version': TAB_FORMAT_VERSION, 'sheets': sheets}, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+def read_workbook(filepath, excel, sets, tables, tab_file_path, manifest=None, store=None):
+    # Function description: open an excel workbook once and write every requested sheet from the in-memory copy
+    # Input: excel name, set sheets with the columns to be written (one .tab per column),
+    #        table sheets with the columns to be read
+    # Output: .tab files. With a manifest, only sheets whose content hash changed are rewritten.
+    #         With a store, sheets of a workbook already converted by another run (other tab_file_path,
+    #         same workbook content) are linked from the store without opening the workbook.
+    if manifest is None:
+        manifest = {}
+    workbook_hash = hash_file(filepath + "/" + excel)
+    previous = manifest.get(excel, {'workbook': None, 'sheets': {}})
+    sheets = previous['sheets']
+    requested = [sheet for sheet, columns in sets] + [sheet for sheet, columns in tables]
+    if previous['workbook'] == workbook_hash and \
+            all(s in sheets and tabs_exist(tab_file_path, sheets[s]['files']) for s in requested):
+        return 0
+
+    entry = {'workbook': workbook_hash, 'sheets': {}}
+    written = 0
+    stored = {}
+    if store is not None:
+        stored = read_store_entry(store, workbook_hash)
+        for sheet, columns in list(sets) + list(tables):
+            known = stored.get(store_key(excel, sheet, columns))
+            if known is None or not all(os.path.exists(store_file(store, d)) for d in known['files'].values()):
+                continue
+            for name, digest in known['files'].items():
+                link_from_store(store, digest, tab_file_path + "/" + name)
+            entry['sheets'][sheet] = {'hash': known['hash'], 'files': list(known['files'])}
+            written += len(known['files'])
+        sets = [(sheet, columns) for sheet, columns in sets if sheet not in entry['sheets']]
+        tables = [(sheet, columns) for sheet, columns in tables if sheet not in entry['sheets']]
 
+    if sets or tables:
+        with pd.ExcelFile(filepath + "/" + excel) as workbook:
+            for sheet, columns in sets:
+                input_sheet = workbook.parse(sheet)
+                sheet_hash = hash_sheet(input_sheet, columns)
+                old = sheets.get(sheet)
+                if store is None and old is not None and old['hash'] == sheet_hash \
+                        and tabs_exist(tab_file_path, old['files']):
+                    entry['sheets'][sheet] = old
+                    continue
+                files = write_sets(input_sheet, excel, sheet, tab_file_path, columns, store)
+                entry['sheets'][sheet] = {'hash': sheet_hash, 'files': list(files)}
+                stored[store_key(excel, sheet, columns)] = {'hash': sheet_hash, 'files': files}
+                written += len(files)
+            for sheet, columns in tables:
+                input_sheet = workbook.parse(sheet, skiprows=2, usecols=columns)
+                sheet_hash = hash_sheet(input_sheet, columns)
+                old = sheets.get(sheet)
+                if store is None and old is not None and old['hash'] == sheet_hash \
+                        and tabs_exist(tab_file_path, old['files']):
+                    entry['sheets'][sheet] = old
+                    continue
+                files = write_file(input_sheet, excel, sheet, tab_file_path, store)
+                entry['sheets'][sheet] = {'hash': sheet_hash, 'files': list(files)}
+                stored[store_key(excel, sheet, columns)] = {'hash': sheet_hash, 'files': files}
+                written += len(files)
+        if store is not None:
+            write_store_entry(store, workbook_hash, stored)
+    manifest[excel] = entry
+    return written
+
+def read_workbook_tables(filepath, excel, sets, tables):
+    # Function description: open an excel workbook once and return every requested sheet as cleaned table
+    # Output: dict of .tab file name (relative to the tab file folder) -> table, nothing is written
+    bundle = {}
+    with pd.ExcelFile(filepath + "/" + excel) as workbook:
+        for sheet, columns in sets:
+            input_sheet = workbook.parse(sheet)
+            for ind, column in enumerate(input_sheet.columns):
+                if columns is None or column in columns:
+                    bundle[tab_name(excel, column)] = clean_set(input_sheet, ind)
+        for sheet, columns in tables:
+            bundle[tab_name(excel, sheet)] = clean_table(workbook.parse(sheet, skiprows=2, usecols=columns),
+                                                         not is_set_workbook(excel), excel + " sheet " + sheet)
+    return bundle
+
+def convert_workbook(filepath, excel, sets, tables, tab_file_path, previous, store=None):
+    # Function description: process pool entry point; converts one workbook and returns its new manifest entry
+    manifest = {}
+    if previous is not None:
+        manifest[excel] = previous
+    written = read_workbook(filepath, excel, sets, tables, tab_file_path, manifest, store)
+    return excel, manifest.get(excel), written
+
+# Every sheet generate_tab_files can convert, mirroring the data.load calls in Empire.run_empire.
+# Each entry is (excel, sheet, columns, target, module):
+#   columns: column indices read from a parameter sheet, or None for a set sheet (one .tab per column)
+#   target:  the Pyomo param/set the .tab is loaded into, for set sheets a dict column -> set.
+#            None if run_empire does not load it; such sheets and columns are not converted.
+#   module:  None if always loaded, otherwise the run_empire flag it is loaded under ('HEATMODULE', 'hydrogen')
+SHEETS = [
+    ('Sets.xlsx', 'Nodes', None, {'Node': 'Node',
+                                  'OnshoreNode': 'OnshoreNode'}, None),
+    ('Sets.xlsx', 'NaturalGasNodes', None, {'NaturalGasNodes': 'NaturalGasNode'}, None),
+    ('Sets.xlsx', 'SteelProducers', None, {'SteelProducers': 'SteelProducers'}, None),
+    ('Sets.xlsx', 'AmmoniaProducers', None, {'AmmoniaProducers': 'AmmoniaProducers'}, None),
+    ('Sets.xlsx', 'CementProducers', None, {'CementProducers': 'CementProducers'}, None),
+    ('Sets.xlsx', 'OilProducers', None, {'OilProducers': 'OilProducers'}, None),
+    #('Sets.xlsx', 'Times', None, {'Times': None}, None),
+    ('Sets.xlsx', 'LineType', None, {'LineType': 'TransmissionType'}, None),
+    ('Sets.xlsx', 'Technology', None, {'Technology': 'Technology'}, None),
+    ('Sets.xlsx', 'Storage', None, {'Storage': 'Storage',
+                                    'DependentStorage': 'DependentStorage'}, None),
+    ('Sets.xlsx', 'Generators', None, {'Generator': 'Generator',
+                                       'HydroGeneratorWithReservoir': 'RegHydroGenerator',
+                                       'HydroGenerator': 'HydroGenerator',
+                                       'RampingGenerators': 'RampingGenerators'}, None),
+    # GD: New for industry + natural gas module
+    ('Sets.xlsx', 'NaturalGasTerminals', None, {'NaturalGasTerminals': 'NaturalGasTerminals'}, None),
+    ('Sets.xlsx', 'StorageOfNodes', [0, 1], 'StoragesOfNode', None),
+    ('Sets.xlsx', 'GeneratorsOfNode', [0, 1], 'GeneratorsOfNode', None),
+    ('Sets.xlsx', 'GeneratorsOfTechnology', [0, 1], 'GeneratorsOfTechnology', None),
+    ('Sets.xlsx', 'DirectionalLines', [0, 1], 'DirectionalLink', None),
+    ('Sets.xlsx', 'LineTypeOfDirectionalLines', [0, 1, 2], 'TransmissionTypeOfDirectionalLink', None),
+    # GD: New for industry + natural gas module
+    ('Sets.xlsx', 'NaturalGasTerminalsOfNode', [0, 1], 'NaturalGasTerminalsOfNode', None),
+    ('Sets.xlsx', 'NaturalGasDirectionalLines', [0, 1], 'NaturalGasDirectionalLink', None),
 
     # Reading GeneratorPeriod
-    read_file(filepath, 'Generator.xlsx', 'FixedOMCosts', [0, 1, 2], tab_file_path = tab_file_path)
-    read_file(filepath, 'Generator.xlsx', 'CapitalCosts', [0, 1, 2], tab_file_path = tab_file_path)
-    read_file(filepath, 'Generator.xlsx', 'VariableOMCosts', [0, 1], tab_file_path = tab_file_path)
-    read_file(filepath, 'Generator.xlsx', 'FuelCosts', [0, 1, 2], tab_file_path = tab_file_path)
-    read_file(filepath, 'Generator.xlsx', 'CCSCostTSVariable', [0, 1], tab_file_path = tab_file_path)
-    read_file(filepath, 'Generator.xlsx', 'Efficiency', [0, 1, 2], tab_file_path = tab_file_path)
-    read_file(filepath, 'Generator.xlsx', 'RefInitialCap', [0, 1, 2], tab_file_path = tab_file_path)
-    read_file(filepath, 'Generator.xlsx', 'ScaleFactorInitialCap', [0, 1, 2], tab_file_path = tab_file_path)
-    read_file(filepath, 'Generator.xlsx', 'InitialCapacity', [0, 1, 2, 3], tab_file_path = tab_file_path)
-    read_file(filepath, 'Generator.xlsx', 'MaxBuiltCapacity', [0, 1, 2, 3], tab_file_path = tab_file_path)
-    read_file(filepath, 'Generator.xlsx', 'MaxInstalledCapacity', [0, 1, 2], tab_file_path = tab_file_path)
-    read_file(filepath, 'Generator.xlsx', 'RampRate', [0, 1], tab_file_path = tab_file_path)
-    read_file(filepath, 'Generator.xlsx', 'GeneratorTypeAvailability', [0, 1], tab_file_path = tab_file_path)
-    read_file(filepath, 'Generator.xlsx', 'CO2Content', [0, 1], tab_file_path = tab_file_path)
-    read_file(filepath, 'Generator.xlsx', 'CO2Captured', [0, 1], tab_file_path = tab_file_path)
-    read_file(filepath, 'Generator.xlsx', 'Lifetime', [0, 1], tab_file_path = tab_file_path)
+    ('Generator.xlsx', 'FixedOMCosts', [0, 1, 2], 'genFixedOMCost', None),
+    ('Generator.xlsx', 'CapitalCosts', [0, 1, 2], 'genCapitalCost', None),
+    ('Generator.xlsx', 'VariableOMCosts', [0, 1], 'genVariableOMCost', None),
+    ('Generator.xlsx', 'FuelCosts', [0, 1, 2], 'genFuelCost', None),
+    ('Generator.xlsx', 'CCSCostTSVariable', [0, 1], None, None),
+    ('Generator.xlsx', 'Efficiency', [0, 1, 2], 'genEfficiency', None),
+    ('Generator.xlsx', 'RefInitialCap', [0, 1, 2], 'genRefInitCap', None),
+    ('Generator.xlsx', 'ScaleFactorInitialCap', [0, 1, 2], 'genScaleInitCap', None),
+    ('Generator.xlsx', 'InitialCapacity', [0, 1, 2, 3], 'genInitCap', None),
+    ('Generator.xlsx', 'MaxBuiltCapacity', [0, 1, 2, 3], 'genMaxBuiltCap', None),
+    ('Generator.xlsx', 'MaxInstalledCapacity', [0, 1, 2], 'genMaxInstalledCapRaw', None),
+    ('Generator.xlsx', 'RampRate', [0, 1], 'genRampUpCap', None),
+    ('Generator.xlsx', 'GeneratorTypeAvailability', [0, 1], 'genCapAvailTypeRaw', None),
+    ('Generator.xlsx', 'CO2Content', [0, 1], 'genCO2TypeFactor', None),
+    ('Generator.xlsx', 'CO2Captured', [0, 1], 'genCO2Captured', None),
+    ('Generator.xlsx', 'Lifetime', [0, 1], 'genLifetime', None),
 
     #Reading InterConnector
-    read_file(filepath, 'Transmission.xlsx', 'lineEfficiency', [0, 1, 2], tab_file_path = tab_file_path)
-    read_file(filepath, 'Transmission.xlsx', 'MaxInstallCapacityRaw', [0, 1, 2, 3], tab_file_path = tab_file_path)
-    read_file(filepath, 'Transmission.xlsx', 'MaxBuiltCapacity', [0, 1, 2, 3], tab_file_path = tab_file_path)
-    read_file(filepath, 'Transmission.xlsx', 'Length', [0, 1, 2], tab_file_path = tab_file_path)
-    read_file(filepath, 'Transmission.xlsx', 'TypeCapitalCost', [0, 1, 2], tab_file_path = tab_file_path)
-    read_file(filepath, 'Transmission.xlsx', 'TypeFixedOMCost', [0, 1, 2], tab_file_path = tab_file_path)
-    read_file(filepath, 'Transmission.xlsx', 'InitialCapacity', [0, 1, 2, 3], tab_file_path = tab_file_path)
-    read_file(filepath, 'Transmission.xlsx', 'Lifetime', [0, 1, 2], tab_file_path = tab_file_path)
-
+    ('Transmission.xlsx', 'lineEfficiency', [0, 1, 2], 'lineEfficiency', None),
+    ('Transmission.xlsx', 'MaxInstallCapacityRaw', [0, 1, 2, 3], 'transmissionMaxInstalledCapRaw', None),
+    ('Transmission.xlsx', 'MaxBuiltCapacity', [0, 1, 2, 3], 'transmissionMaxBuiltCap', None),
+    ('Transmission.xlsx', 'Length', [0, 1, 2], 'transmissionLength', None),
+    ('Transmission.xlsx', 'TypeCapitalCost', [0, 1, 2], 'transmissionTypeCapitalCost', None),
+    ('Transmission.xlsx', 'TypeFixedOMCost', [0, 1, 2], 'transmissionTypeFixedOMCost', None),
+    ('Transmission.xlsx', 'InitialCapacity', [0, 1, 2, 3], 'transmissionInitCap', None),
+    ('Transmission.xlsx', 'Lifetime', [0, 1, 2], 'transmissionLifetime', None),
     # GD: Reading the cost for the offshore converter
-    read_file(filepath, 'Transmission.xlsx', 'OffshoreConverterCapitalCost', [0,1], tab_file_path = tab_file_path)
-    read_file(filepath, 'Transmission.xlsx', 'OffshoreConverterOMCost', [0,1], tab_file_path = tab_file_path)
+    ('Transmission.xlsx', 'OffshoreConverterCapitalCost', [0, 1], 'offshoreConvCapitalCost', None),
+    ('Transmission.xlsx', 'OffshoreConverterOMCost', [0, 1], 'offshoreConvOMCost', None),
 
     #Reading Node
-    read_file(filepath, 'Node.xlsx', 'ElectricAnnualDemand', [0, 1, 2], tab_file_path = tab_file_path)
-    read_file(filepath, 'Node.xlsx', 'NodeLostLoadCost', [0, 1, 2], tab_file_path = tab_file_path)
-    read_file(filepath, 'Node.xlsx', 'HydroGenMaxAnnualProduction', [0, 1], tab_file_path = tab_file_path)
-    read_file(filepath, 'Node.xlsx', 'Latitude', [0, 1], tab_file_path = tab_file_path)
-    read_file(filepath, 'Node.xlsx', 'Longitude', [0, 1], tab_file_path = tab_file_path)
+    ('Node.xlsx', 'ElectricAnnualDemand', [0, 1, 2], 'sloadAnnualDemand', None),
+    ('Node.xlsx', 'NodeLostLoadCost', [0, 1, 2], 'nodeLostLoadCost', None),
+    ('Node.xlsx', 'HydroGenMaxAnnualProduction', [0, 1], 'maxHydroNode', None),
+    ('Node.xlsx', 'Latitude', [0, 1], 'Latitude', None),
+    ('Node.xlsx', 'Longitude', [0, 1], 'Longitude', None),
 
     #Reading Season
-    read_file(filepath, 'General.xlsx', 'seasonScale', [0, 1], tab_file_path = tab_file_path)
-    read_file(filepath, 'General.xlsx', 'CO2Cap', [0, 1], tab_file_path = tab_file_path)
-    read_file(filepath, 'General.xlsx', 'CO2Price', [0, 1], tab_file_path = tab_file_path)
-    read_file(filepath, 'General.xlsx', 'AvailableBioEnergy', [0, 1], tab_file_path = tab_file_path)
+    ('General.xlsx', 'seasonScale', [0, 1], None, None),
+    ('General.xlsx', 'CO2Cap', [0, 1], 'CO2cap', None),
+    ('General.xlsx', 'CO2Price', [0, 1], 'CO2price', None),
+    ('General.xlsx', 'AvailableBioEnergy', [0, 1], 'availableBioEnergy', None),
 
     #Reading Storage
-    read_file(filepath, 'Storage.xlsx', 'StorageBleedEfficiency', [0, 1], tab_file_path = tab_file_path)
-    read_file(filepath, 'Storage.xlsx', 'StorageChargeEff', [0, 1], tab_file_path = tab_file_path)
-    read_file(filepath, 'Storage.xlsx', 'StorageDischargeEff', [0, 1], tab_file_path = tab_file_path)
-    read_file(filepath, 'Storage.xlsx', 'StoragePowToEnergy', [0, 1], tab_file_path = tab_file_path)
-    read_file(filepath, 'Storage.xlsx', 'StorageInitialEnergyLevel', [0, 1], tab_file_path = tab_file_path)
-    read_file(filepath, 'Storage.xlsx', 'InitialPowerCapacity', [0, 1, 2, 3], tab_file_path = tab_file_path)
-    read_file(filepath, 'Storage.xlsx', 'PowerCapitalCost', [0, 1, 2], tab_file_path = tab_file_path)
-    read_file(filepath, 'Storage.xlsx', 'PowerFixedOMCost', [0, 1, 2], tab_file_path = tab_file_path)
-    read_file(filepath, 'Storage.xlsx', 'PowerMaxBuiltCapacity', [0, 1, 2, 3], tab_file_path = tab_file_path)
-    read_file(filepath, 'Storage.xlsx', 'EnergyCapitalCost', [0, 1, 2], tab_file_path = tab_file_path)
-    read_file(filepath, 'Storage.xlsx', 'EnergyFixedOMCost', [0, 1, 2], tab_file_path = tab_file_path)
-    read_file(filepath, 'Storage.xlsx', 'EnergyInitialCapacity', [0, 1, 2, 3], tab_file_path = tab_file_path)
-    read_file(filepath, 'Storage.xlsx', 'EnergyMaxBuiltCapacity', [0, 1, 2, 3], tab_file_path = tab_file_path)
-    read_file(filepath, 'Storage.xlsx', 'EnergyMaxInstalledCapacity', [0, 1, 2], tab_file_path = tab_file_path)
-    read_file(filepath, 'Storage.xlsx', 'PowerMaxInstalledCapacity', [0, 1, 2], tab_file_path = tab_file_path)
-    read_file(filepath, 'Storage.xlsx', 'Lifetime', [0, 1], tab_file_path = tab_file_path)
-
-    read_file(filepath, 'NaturalGas.xlsx','StorageCapacity', [0,1],tab_file_path = tab_file_path)
-    read_file(filepath, 'NaturalGas.xlsx','PipelineCapacity', [0,1,2],tab_file_path = tab_file_path)
-    read_file(filepath, 'NaturalGas.xlsx','PipelineElectricityUse', [0],tab_file_path = tab_file_path)
-    read_file(filepath, 'NaturalGas.xlsx','TerminalCost', [0,1,2,3],tab_file_path = tab_file_path)
-    read_file(filepath, 'NaturalGas.xlsx','TerminalCapacity', [0,1,2,3],tab_file_path = tab_file_path)
-    read_file(filepath, 'NaturalGas.xlsx','Reserves', [0,1],tab_file_path = tab_file_path)
-    
-    read_sets(filepath, 'CO2.xlsx', 'CO2SequestrationNodes', tab_file_path = tab_file_path)
-    read_file(filepath, 'CO2.xlsx', 'StorageSiteCapitalCost', [0, 1], tab_file_path = tab_file_path)
-    read_file(filepath, 'CO2.xlsx', 'StorageSiteFixedOMCost', [0, 1], tab_file_path = tab_file_path)
-    read_file(filepath, 'CO2.xlsx', 'PipelineCapitalCost', [0], tab_file_path = tab_file_path)
-    read_file(filepath, 'CO2.xlsx', 'PipelineFixedOM', [0], tab_file_path = tab_file_path)
-    read_file(filepath, 'CO2.xlsx', 'PipelineElectricityUsage', [0], tab_file_path = tab_file_path)
-    read_file(filepath, 'CO2.xlsx', 'MaxSequestrationCapacity', [0,1], tab_file_path = tab_file_path)
-
-    if HEATMODULE:
-        if not os.path.exists(tab_file_path + '/HeatModule'):
+    ('Storage.xlsx', 'StorageBleedEfficiency', [0, 1], 'storageBleedEff', None),
+    ('Storage.xlsx', 'StorageChargeEff', [0, 1], 'storageChargeEff', None),
+    ('Storage.xlsx', 'StorageDischargeEff', [0, 1], 'storageDischargeEff', None),
+    ('Storage.xlsx', 'StoragePowToEnergy', [0, 1], 'storagePowToEnergy', None),
+    ('Storage.xlsx', 'StorageInitialEnergyLevel', [0, 1], 'storOperationalInit', None),
+    ('Storage.xlsx', 'InitialPowerCapacity', [0, 1, 2, 3], 'storPWInitCap', None),
+    ('Storage.xlsx', 'PowerCapitalCost', [0, 1, 2], 'storPWCapitalCost', None),
+    ('Storage.xlsx', 'PowerFixedOMCost', [0, 1, 2], 'storPWFixedOMCost', None),
+    ('Storage.xlsx', 'PowerMaxBuiltCapacity', [0, 1, 2, 3], 'storPWMaxBuiltCap', None),
+    ('Storage.xlsx', 'EnergyCapitalCost', [0, 1, 2], 'storENCapitalCost', None),
+    ('Storage.xlsx', 'EnergyFixedOMCost', [0, 1, 2], 'storENFixedOMCost', None),
+    ('Storage.xlsx', 'EnergyInitialCapacity', [0, 1, 2, 3], 'storENInitCap', None),
+    ('Storage.xlsx', 'EnergyMaxBuiltCapacity', [0, 1, 2, 3], 'storENMaxBuiltCap', None),
+    ('Storage.xlsx', 'EnergyMaxInstalledCapacity', [0, 1, 2], 'storENMaxInstalledCapRaw', None),
+    ('Storage.xlsx', 'PowerMaxInstalledCapacity', [0, 1, 2], 'storPWMaxInstalledCapRaw', None),
+    ('Storage.xlsx', 'Lifetime', [0, 1], 'storageLifetime', None),
+
+    ('NaturalGas.xlsx', 'StorageCapacity', [0, 1], 'ng_storageCapacity', None),
+    ('NaturalGas.xlsx', 'PipelineCapacity', [0, 1, 2], 'ng_pipelineCapacity', None),
+    ('NaturalGas.xlsx', 'PipelineElectricityUse', [0], 'ng_pipelinePowerDemandPerTon', None),
+    ('NaturalGas.xlsx', 'TerminalCost', [0, 1, 2, 3], 'ng_terminalCost', None),
+    ('NaturalGas.xlsx', 'TerminalCapacity', [0, 1, 2, 3], 'ng_terminalCapacity', None),
+    ('NaturalGas.xlsx', 'Reserves', [0, 1], 'ng_reserves', None),
+
+    # CO2 capture and storage is only loaded with the hydrogen module
+    ('CO2.xlsx', 'CO2SequestrationNodes', None, {'CO2SequestrationNodes': 'CO2SequestrationNodes'}, 'hydrogen'),
+    ('CO2.xlsx', 'StorageSiteCapitalCost', [0, 1], 'CO2StorageSiteCapitalCost', 'hydrogen'),
+    ('CO2.xlsx', 'StorageSiteFixedOMCost', [0, 1], 'StorageSiteFixedOMCost', 'hydrogen'),
+    ('CO2.xlsx', 'PipelineCapitalCost', [0], 'CO2PipelineCapCost', 'hydrogen'),
+    ('CO2.xlsx', 'PipelineFixedOM', [0], 'CO2PipelineOMCost', 'hydrogen'),
+    ('CO2.xlsx', 'PipelineElectricityUsage', [0], 'CO2PipelineElectricityUsage', 'hydrogen'),
+    ('CO2.xlsx', 'MaxSequestrationCapacity', [0, 1], 'maxSequestrationCapacity', 'hydrogen'),
+
+    # Reading Excel heat sets
+    ('HeatModule/HeatModuleSets.xlsx', 'Storage', None, {'StorageHeat': 'StorageTR',
+                                                         'DependentStorageHeat': 'DependentStorageTR'}, 'HEATMODULE'),
+    ('HeatModule/HeatModuleSets.xlsx', 'Generator', None, {'RampingGenerators': 'RampingGeneratorsHeat',
+                                                           'GeneratorHeat': 'GeneratorTR',
+                                                           'GeneratorHeatAndElectricity': 'GeneratorCHP',
+                                                           'IndustrialHeat': 'GeneratorTR_Industrial'}, 'HEATMODULE'),
+    ('HeatModule/HeatModuleSets.xlsx', 'Technology', None, {'TechnologyHeat': 'TechnologyHeat'}, 'HEATMODULE'),
+    ('HeatModule/HeatModuleSets.xlsx', 'Converter', None, {'ElectrToHeatConverter': 'Converter'}, 'HEATMODULE'),
+    ('HeatModule/HeatModuleSets.xlsx', 'StorageOfNodes', [0, 1], 'StoragesOfNodeHeat', 'HEATMODULE'),
+    ('HeatModule/HeatModuleSets.xlsx', 'ConverterOfNodes', [0, 1], 'ConverterOfNode', 'HEATMODULE'),
+    ('HeatModule/HeatModuleSets.xlsx', 'GeneratorsOfNode', [0, 1], 'GeneratorsOfNodeHeat', 'HEATMODULE'),
+    ('HeatModule/HeatModuleSets.xlsx', 'GeneratorsOfTechnology', [0, 1], 'GeneratorsOfTechnologyHeat', 'HEATMODULE'),
+
+    # Reading heat Generator
+    ('HeatModule/HeatModuleGenerator.xlsx', 'FixedOMCosts', [0, 1, 2], 'genFixedOMCostHeat', 'HEATMODULE'),
+    ('HeatModule/HeatModuleGenerator.xlsx', 'CapitalCosts', [0, 1, 2], 'genCapitalCostHeat', 'HEATMODULE'),
+    ('HeatModule/HeatModuleGenerator.xlsx', 'VariableOMCosts', [0, 1], 'genVariableOMCostHeat', 'HEATMODULE'),
+    ('HeatModule/HeatModuleGenerator.xlsx', 'FuelCosts', [0, 1, 2], 'genFuelCostHeat', 'HEATMODULE'),
+    ('HeatModule/HeatModuleGenerator.xlsx', 'Efficiency', [0, 1, 2], 'genEfficiencyHeat', 'HEATMODULE'),
+    ('HeatModule/HeatModuleGenerator.xlsx', 'RefInitialCap', [0, 1, 2], 'genRefInitCapHeat', 'HEATMODULE'),
+    ('HeatModule/HeatModuleGenerator.xlsx', 'ScaleFactorInitialCap', [0, 1, 2], 'genScaleInitCapHeat', 'HEATMODULE'),
+    ('HeatModule/HeatModuleGenerator.xlsx', 'InitialCapacity', [0, 1, 2, 3], None, None),
+    ('HeatModule/HeatModuleGenerator.xlsx', 'MaxBuiltCapacity', [0, 1, 2, 3], None, None),
+    ('HeatModule/HeatModuleGenerator.xlsx', 'MaxInstalledCapacity', [0, 1, 2], 'genMaxInstalledCapRawHeat', 'HEATMODULE'),
+    ('HeatModule/HeatModuleGenerator.xlsx', 'RampRate', [0, 1], 'genRampUpCapHeat', 'HEATMODULE'),
+    ('HeatModule/HeatModuleGenerator.xlsx', 'GeneratorTypeAvailability', [0, 1], 'genCapAvailTypeRawHeat', 'HEATMODULE'),
+    ('HeatModule/HeatModuleGenerator.xlsx', 'CO2Content', [0, 1], 'genCO2TypeFactorHeat', 'HEATMODULE'),
+    ('HeatModule/HeatModuleGenerator.xlsx', 'Lifetime', [0, 1], 'genLifetimeHeat', 'HEATMODULE'),
+    ('HeatModule/HeatModuleGenerator.xlsx', 'CHPEfficiency', [0, 1, 2], 'genCHPEfficiencyRaw', 'HEATMODULE'),
+
+    #Reading heat Storage
+    ('HeatModule/HeatModuleStorage.xlsx', 'StorageBleedEfficiency', [0, 1], 'storageBleedEffHeat', 'HEATMODULE'),
+    ('HeatModule/HeatModuleStorage.xlsx', 'StorageChargeEff', [0, 1], 'storageChargeEffHeat', 'HEATMODULE'),
+    ('HeatModule/HeatModuleStorage.xlsx', 'StorageDischargeEff', [0, 1], 'storageDischargeEffHeat', 'HEATMODULE'),
+    ('HeatModule/HeatModuleStorage.xlsx', 'StorageInitialEnergyLevel', [0, 1], 'storOperationalInitHeat', 'HEATMODULE'),
+    ('HeatModule/HeatModuleStorage.xlsx', 'InitialPowerCapacity', [0, 1, 2, 3], 'storPWInitCapHeat', 'HEATMODULE'),
+    ('HeatModule/HeatModuleStorage.xlsx', 'PowerCapitalCost', [0, 1, 2], 'storPWCapitalCostHeat', 'HEATMODULE'),
+    ('HeatModule/HeatModuleStorage.xlsx', 'PowerFixedOMCost', [0, 1, 2], 'storPWFixedOMCostHeat', 'HEATMODULE'),
+    ('HeatModule/HeatModuleStorage.xlsx', 'PowerMaxBuiltCapacity', [0, 1, 2, 3], None, None),
+    ('HeatModule/HeatModuleStorage.xlsx', 'EnergyCapitalCost', [0, 1, 2], 'storENCapitalCostHeat', 'HEATMODULE'),
+    ('HeatModule/HeatModuleStorage.xlsx', 'EnergyFixedOMCost', [0, 1, 2], 'storENFixedOMCostHeat', 'HEATMODULE'),
+    ('HeatModule/HeatModuleStorage.xlsx', 'EnergyInitialCapacity', [0, 1, 2, 3], 'storENInitCapHeat', 'HEATMODULE'),
+    ('HeatModule/HeatModuleStorage.xlsx', 'EnergyMaxBuiltCapacity', [0, 1, 2, 3], None, None),
+    ('HeatModule/HeatModuleStorage.xlsx', 'EnergyMaxInstalledCapacity', [0, 1, 2], None, None),
+    ('HeatModule/HeatModuleStorage.xlsx', 'PowerMaxInstalledCapacity', [0, 1, 2], None, None),
+    ('HeatModule/HeatModuleStorage.xlsx', 'Lifetime', [0, 1], 'storageLifetimeHeat', 'HEATMODULE'),
+    ('HeatModule/HeatModuleStorage.xlsx', 'StoragePowToEnergy', [0, 1], 'storagePowToEnergyTR', 'HEATMODULE'),
+
+    #reading head adjustments at nodes
+    ('HeatModule/HeatModuleNode.xlsx', 'HeatAnnualDemand', [0, 1, 2], 'sloadAnnualDemandTR', 'HEATMODULE'),
+    ('HeatModule/HeatModuleNode.xlsx', 'NodeLostLoadCost', [0, 1, 2], 'nodeLostLoadCostTR', 'HEATMODULE'),
+    ('HeatModule/HeatModuleNode.xlsx', 'ElectricHeatShare', [0, 1], 'ElectricHeatShare', 'HEATMODULE'),
+
+    # Reading ElecToHeat
+    ('HeatModule/HeatModuleConverter.xlsx', 'FixedOMCosts', [0, 1, 2], 'ConverterFixedOMCost', 'HEATMODULE'),
+    ('HeatModule/HeatModuleConverter.xlsx', 'CapitalCosts', [0, 1, 2], 'ConverterCapitalCost', 'HEATMODULE'),
+    ('HeatModule/HeatModuleConverter.xlsx', 'InitialCapacity', [0, 1, 2, 3], 'ConverterInitCap', 'HEATMODULE'),
+    ('HeatModule/HeatModuleConverter.xlsx', 'MaxBuildCapacity', [0, 1, 2, 3], 'ConverterMaxBuiltCap', 'HEATMODULE'),
+    ('HeatModule/HeatModuleConverter.xlsx', 'MaxInstallCapacity', [0, 1, 2], 'ConverterMaxInstalledCapRaw', 'HEATMODULE'),
+    ('HeatModule/HeatModuleConverter.xlsx', 'Efficiency', [0, 1], None, None),
+    ('HeatModule/HeatModuleConverter.xlsx', 'Lifetime', [0, 1], 'ConverterLifetime', 'HEATMODULE'),
+
+    ('Hydrogen.xlsx', 'ProductionNodes', None, {'ProductionNodes': 'HydrogenProdNode'}, 'hydrogen'),
+    # ('Hydrogen.xlsx', 'Generators', None, {'Generators': None}, 'hydrogen'),
+    ('Hydrogen.xlsx', 'ReformerLocations', None, {'ReformerLocations': 'ReformerLocations'}, 'hydrogen'),
+    ('Hydrogen.xlsx', 'ReformerPlants', None, {'ReformerPlants': 'ReformerPlants'}, 'hydrogen'),
+    ('Hydrogen.xlsx', 'ReformerCapitalCost', [0, 1, 2], 'ReformerPlantsCapitalCost', 'hydrogen'),
+    ('Hydrogen.xlsx', 'ReformerFixedOMCost', [0, 1, 2], 'ReformerPlantFixedOMCost', 'hydrogen'),
+    ('Hydrogen.xlsx', 'ReformerVariableOMCost', [0, 1, 2], 'ReformerPlantVarOMCost', 'hydrogen'),
+    ('Hydrogen.xlsx', 'ReformerEfficiency', [0, 1, 2], 'ReformerPlantEfficiency', 'hydrogen'),
+    ('Hydrogen.xlsx', 'ReformerElectricityUse', [0, 1, 2], 'ReformerPlantElectricityUse', 'hydrogen'),
+    ('Hydrogen.xlsx', 'ReformerLifetime', [0, 1], 'ReformerPlantLifetime', 'hydrogen'),
+    ('Hydrogen.xlsx', 'ReformerEmissionFactor', [0, 1, 2], 'ReformerEmissionFactor', 'hydrogen'),
+    ('Hydrogen.xlsx', 'ReformerCO2CaptureFactor', [0, 1, 2], 'ReformerCO2CaptureFactor', 'hydrogen'),
+    ('Hydrogen.xlsx', 'ElectrolyzerPlantCapitalCost', [0, 1], 'elyzerPlantCapitalCost', 'hydrogen'),
+    ('Hydrogen.xlsx', 'ElectrolyzerFixedOMCost', [0, 1], 'elyzerFixedOMCost', 'hydrogen'),
+    ('Hydrogen.xlsx', 'ElectrolyzerStackCapitalCost', [0, 1], 'elyzerStackCapitalCost', 'hydrogen'),
+    ('Hydrogen.xlsx', 'ElectrolyzerLifetime', [0], 'elyzerLifetime', 'hydrogen'),
+    ('Hydrogen.xlsx', 'ElectrolyzerPowerUse', [0, 1], 'elyzerPowerConsumptionPerTon', 'hydrogen'),
+    ('Hydrogen.xlsx', 'PipelineCapitalCost', [0, 1], 'hydrogenPipelineCapCost', 'hydrogen'),
+    ('Hydrogen.xlsx', 'PipelineOMCostPerKM', [0, 1], 'hydrogenPipelineOMCost', 'hydrogen'),
+    ('Hydrogen.xlsx', 'PipelineCompressorPowerUsage', [0], 'hydrogenPipelineCompressorElectricityUsage', 'hydrogen'),
+    ('Hydrogen.xlsx', 'StorageCapitalCost', [0, 1], 'hydrogenStorageCapitalCost', 'hydrogen'),
+    ('Hydrogen.xlsx', 'StorageFixedOMCost', [0, 1], 'hydrogenStorageFixedOMCost', 'hydrogen'),
+    ('Hydrogen.xlsx', 'StorageMaxCapacity', [0, 1], 'hydrogenMaxStorageCapacity', 'hydrogen'),
+
+    # Industry and transport demand are loaded by run_empire with or without the hydrogen module
+    ('Industry.xlsx', 'Steel_Plants', None, {'SteelProductionPlants': 'SteelPlants'}, None),
+    ('Industry.xlsx', 'Cement_Plants', None, {'CementProductionPlants': 'CementPlants'}, None),
+    ('Industry.xlsx', 'Ammonia_Plants', None, {'AmmoniaProductionPlants': 'AmmoniaPlants'}, None),
+    ('Industry.xlsx', 'Steel_InitialCapacity', [0, 1, 2], 'steel_initialCapacity', None),
+    ('Industry.xlsx', 'Steel_ScaleFactorInitialCap', [0, 1, 2], 'steel_scaleFactorInitialCap', None),
+    ('Industry.xlsx', 'Steel_InvCost', [0, 1, 2], 'steel_plantCapitalCost', None),
+    ('Industry.xlsx', 'Steel_FixedOM', [0, 1, 2], 'steel_plantFixedOM', None),
+    ('Industry.xlsx', 'Steel_VarOpex', [0, 1, 2], 'steel_varOpex', None),
+    ('Industry.xlsx', 'Steel_CoalConsumption', [0, 1, 2], 'steel_coalConsumption', None),
+    ('Industry.xlsx', 'Steel_HydrogenConsumption', [0, 1, 2], 'steel_hydrogenConsumption', None),
+    ('Industry.xlsx', 'Steel_BioConsumption', [0, 1, 2], 'steel_bioConsumption', None),
+    ('Industry.xlsx', 'Steel_OilConsumption', [0, 1, 2], 'steel_oilConsumption', None),
+    ('Industry.xlsx', 'Steel_ElConsumption', [0, 1, 2], 'steel_electricityConsumption', None),
+    ('Industry.xlsx', 'Steel_CO2Emissions', [0, 1], 'steel_CO2Emissions', None),
+    ('Industry.xlsx', 'Steel_CO2Captured', [0, 1], 'steel_CO2Captured', None),
+    ('Industry.xlsx', 'Steel_YearlyProduction', [0, 1, 2], 'steel_yearlyProduction', None),
+    ('Industry.xlsx', 'Cement_InitialCapacity', [0, 1, 2], 'cement_initialCapacity', None),
+    ('Industry.xlsx', 'Cement_ScaleFactorInitialCap', [0, 1, 2], 'cement_scaleFactorInitialCap', None),
+    ('Industry.xlsx', 'Cement_InvCost', [0, 1, 2], 'cement_plantCapitalCost', None),
+    ('Industry.xlsx', 'Cement_FixedOM', [0, 1, 2], 'cement_plantFixedOM', None),
+    ('Industry.xlsx', 'Cement_FuelConsumption', [0, 1, 2], 'cement_fuelConsumption', None),
+    ('Industry.xlsx', 'Cement_CO2CaptureRate', [0, 1], 'cement_co2CaptureRate', None),
+    ('Industry.xlsx', 'Cement_ElConsumption', [0, 1, 2], 'cement_electricityConsumption', None),
+    ('Industry.xlsx', 'Cement_YearlyProduction', [0, 1], 'cement_yearlyProduction', None),
+    ('Industry.xlsx', 'Ammonia_InitialCapacity', [0, 1, 2], 'ammonia_initialCapacity', None),
+    ('Industry.xlsx', 'Ammonia_ScaleFactorInitialCap', [0, 1, 2], 'ammonia_scaleFactorInitialCap', None),
+    ('Industry.xlsx', 'Ammonia_InvCost', [0, 1, 2], 'ammonia_plantCapitalCost', None),
+    ('Industry.xlsx', 'Ammonia_FixedOM', [0, 1, 2], 'ammonia_plantFixedOM', None),
+    ('Industry.xlsx', 'Ammonia_FeedstockConsumption', [0, 1], 'ammonia_fuelConsumption', None),
+    ('Industry.xlsx', 'Ammonia_ElConsumption', [0, 1], 'ammonia_electricityConsumption', None),
+    ('Industry.xlsx', 'Ammonia_YearlyProduction', [0, 1], 'ammonia_yearlyProduction', None),
+    ('Industry.xlsx', 'Refinery_HydrogenConsumption', [0], 'refinery_hydrogenConsumption', None),
+    ('Industry.xlsx', 'Refinery_HeatConsumption', [0], 'refinery_heatConsumption', None),
+    ('Industry.xlsx', 'Refinery_YearlyProduction', [0, 1, 2], 'refinery_yearlyProduction', None),
+
+    # ('Transport.xlsx', 'SetsTransportTypes', None, None, None),
+    # ('Transport.xlsx', 'SetsVehicleTypes', None, None, None),
+    # ('Transport.xlsx', 'SetsVehicleTypeOfTransportType', [0, 1], None, None),
+    # ('Transport.xlsx', 'Demand_MWh', [0, 1, 2, 3], None, None),
+    # ('Transport.xlsx', 'Demand_km', [0, 1, 2, 3], None, None),
+    # ('Transport.xlsx', 'Lifetime', [0, 1], None, None),
+    # ('Transport.xlsx', 'CapitalCost', [0, 1, 2], None, None),
+    # ('Transport.xlsx', 'EnergyConsumption', [0, 1, 2], None, None),
+    # ('Transport.xlsx', 'AviationFuelCost', [0, 1, 2], None, None),
+    # ('Transport.xlsx', 'InitialCapacity', [0, 1, 2], None, None),
+    # ('Transport.xlsx', 'InitialCapacityScaleFactor', [0, 1, 2], None, None),
+    ('Transport.xlsx', 'ElectricityDemand', [0, 1, 2], 'transport_electricity_demand', None),
+    ('Transport.xlsx', 'HydrogenDemand', [0, 1, 2], 'transport_hydrogen_demand', None),
+    ('Transport.xlsx', 'NaturalGasDemand', [0, 1, 2], 'transport_naturalGas_demand', None),
+]
+
+def sheet_jobs(HEATMODULE=True, hydrogen=False):
+    # Function description: select the sheets from SHEETS loaded by the given model configuration
+    # Output: one job per workbook, in manifest order, with the set sheets (and the set columns to
+    #         write) and the table sheets (and the columns to read) to convert
+    active = {None: True, 'HEATMODULE': bool(HEATMODULE), 'hydrogen': hydrogen is True}
+    workbooks = {}
+    for excel, sheet, columns, target, module in SHEETS:
+        if not active[module] or not target:
+            continue
+        wb = workbooks.setdefault(excel, dict(excel=excel, sets=[], tables=[]))
+        if columns is None:
+            wb['sets'].append((sheet, [c for c, s in target.items() if s is not None]))
+        else:
+            wb['tables'].append((sheet, columns))
+    return list(workbooks.values())
+
+def generate_tab_files(filepath, tab_file_path, HEATMODULE=True, hydrogen=False, force=False, workers=1,
+                       store=None, in_memory=False, archive=False):
+    # Function description: read column value from excel sheet and save as .tab file "sheet.tab"
+    # Input: excel name, sheet name, the number of columns to be read
+    # Output:  .tab file. Only the sheets listed in SHEETS that run_empire loads for the given
+    #          HEATMODULE/hydrogen flags are converted. Sheets whose content is unchanged since the
+    #          last run (see tab_manifest.json) are skipped unless force is True.
+    # With workers > 1 the workbooks are converted in a process pool of that size. On platforms that
+    # spawn rather than fork (Windows, macOS) the calling script must be guarded by if __name__ == "__main__".
+    # With a store directory, every .tab file is kept once in the store under its content hash and
+    # tab_file_path only holds links to it. Workbooks already converted for another run or dataset are
+    # linked from the store without being parsed.
+    # With in_memory, the tables are returned as dict of .tab file name -> DataFrame, to be passed to
+    # run_empire(tab_data=...). They are only written to tab_file_path (all of them) if archive is True.
+
+    print("Generating .tab-files...")
+
+    # Reading Excel workbooks using our function read_workbook. Each workbook is parsed once.
+
+    # The folders are only made if .tab-files are written, not for tables only handed over in memory
+    if not in_memory or archive:
+        if not os.path.exists(tab_file_path):
+            os.makedirs(tab_file_path)
+        if HEATMODULE and not os.path.exists(tab_file_path + '/HeatModule'):
             os.makedirs(tab_file_path + '/HeatModule')
 
-        # Reading Excel heat sets
-        read_sets(filepath, 'HeatModule/HeatModuleSets.xlsx', 'Storage', tab_file_path = tab_file_path)
-        read_sets(filepath, 'HeatModule/HeatModuleSets.xlsx', 'Generator', tab_file_path = tab_file_path)
-        read_sets(filepath, 'HeatModule/HeatModuleSets.xlsx', 'Technology', tab_file_path = tab_file_path)
-        read_sets(filepath, 'HeatModule/HeatModuleSets.xlsx', 'Converter', tab_file_path = tab_file_path)
-
-        read_file(filepath, 'HeatModule/HeatModuleSets.xlsx', 'StorageOfNodes', [0, 1], tab_file_path = tab_file_path)
-        read_file(filepath, 'HeatModule/HeatModuleSets.xlsx', 'ConverterOfNodes', [0, 1], tab_file_path = tab_file_path)
-        read_file(filepath, 'HeatModule/HeatModuleSets.xlsx', 'GeneratorsOfNode', [0, 1], tab_file_path = tab_file_path)
-        read_file(filepath, 'HeatModule/HeatModuleSets.xlsx', 'GeneratorsOfTechnology', [0, 1], tab_file_path = tab_file_path)
-
-        # Reading heat Generator
-        read_file(filepath, 'HeatModule/HeatModuleGenerator.xlsx', 'FixedOMCosts', [0, 1, 2], tab_file_path = tab_file_path)
-        read_file(filepath, 'HeatModule/HeatModuleGenerator.xlsx', 'CapitalCosts', [0, 1, 2], tab_file_path = tab_file_path)
-        read_file(filepath, 'HeatModule/HeatModuleGenerator.xlsx', 'VariableOMCosts', [0, 1], tab_file_path = tab_file_path)
-        read_file(filepath, 'HeatModule/HeatModuleGenerator.xlsx', 'FuelCosts', [0, 1, 2], tab_file_path = tab_file_path)
-        read_file(filepath, 'HeatModule/HeatModuleGenerator.xlsx', 'Efficiency', [0, 1, 2], tab_file_path = tab_file_path)
-        read_file(filepath, 'HeatModule/HeatModuleGenerator.xlsx', 'RefInitialCap', [0, 1, 2], tab_file_path = tab_file_path)
-        read_file(filepath, 'HeatModule/HeatModuleGenerator.xlsx', 'ScaleFactorInitialCap', [0, 1, 2], tab_file_path = tab_file_path)
-        read_file(filepath, 'HeatModule/HeatModuleGenerator.xlsx', 'InitialCapacity', [0, 1, 2, 3], tab_file_path = tab_file_path)
-        read_file(filepath, 'HeatModule/HeatModuleGenerator.xlsx', 'MaxBuiltCapacity', [0, 1, 2, 3], tab_file_path = tab_file_path)
-        read_file(filepath, 'HeatModule/HeatModuleGenerator.xlsx', 'MaxInstalledCapacity', [0, 1, 2], tab_file_path = tab_file_path)
-        read_file(filepath, 'HeatModule/HeatModuleGenerator.xlsx', 'RampRate', [0, 1], tab_file_path = tab_file_path)
-        read_file(filepath, 'HeatModule/HeatModuleGenerator.xlsx', 'GeneratorTypeAvailability', [0, 1], tab_file_path = tab_file_path)
-        read_file(filepath, 'HeatModule/HeatModuleGenerator.xlsx', 'CO2Content', [0, 1], tab_file_path = tab_file_path)
-        read_file(filepath, 'HeatModule/HeatModuleGenerator.xlsx', 'Lifetime', [0, 1], tab_file_path = tab_file_path)
-        read_file(filepath, 'HeatModule/HeatModuleGenerator.xlsx', 'CHPEfficiency', [0, 1, 2], tab_file_path = tab_file_path)
-
-        #Reading heat Storage
-        read_file(filepath, 'HeatModule/HeatModuleStorage.xlsx', 'StorageBleedEfficiency', [0, 1], tab_file_path = tab_file_path)
-        read_file(filepath, 'HeatModule/HeatModuleStorage.xlsx', 'StorageChargeEff', [0, 1], tab_file_path = tab_file_path)
-        read_file(filepath, 'HeatModule/HeatModuleStorage.xlsx', 'StorageDischargeEff', [0, 1], tab_file_path = tab_file_path)
-        read_file(filepath, 'HeatModule/HeatModuleStorage.xlsx', 'StorageInitialEnergyLevel', [0, 1], tab_file_path = tab_file_path)
-        read_file(filepath, 'HeatModule/HeatModuleStorage.xlsx', 'InitialPowerCapacity', [0, 1, 2, 3], tab_file_path = tab_file_path)
-        read_file(filepath, 'HeatModule/HeatModuleStorage.xlsx', 'PowerCapitalCost', [0, 1, 2], tab_file_path = tab_file_path)
-        read_file(filepath, 'HeatModule/HeatModuleStorage.xlsx', 'PowerFixedOMCost', [0, 1, 2], tab_file_path = tab_file_path)
-        read_file(filepath, 'HeatModule/HeatModuleStorage.xlsx', 'PowerMaxBuiltCapacity', [0, 1, 2, 3], tab_file_path = tab_file_path)
-        read_file(filepath, 'HeatModule/HeatModuleStorage.xlsx', 'EnergyCapitalCost', [0, 1, 2], tab_file_path = tab_file_path)
-        read_file(filepath, 'HeatModule/HeatModuleStorage.xlsx', 'EnergyFixedOMCost', [0, 1, 2], tab_file_path = tab_file_path)
-        read_file(filepath, 'HeatModule/HeatModuleStorage.xlsx', 'EnergyInitialCapacity', [0, 1, 2, 3], tab_file_path = tab_file_path)
-        read_file(filepath, 'HeatModule/HeatModuleStorage.xlsx', 'EnergyMaxBuiltCapacity', [0, 1, 2, 3], tab_file_path = tab_file_path)
-        read_file(filepath, 'HeatModule/HeatModuleStorage.xlsx', 'EnergyMaxInstalledCapacity', [0, 1, 2], tab_file_path = tab_file_path)
-        read_file(filepath, 'HeatModule/HeatModuleStorage.xlsx', 'PowerMaxInstalledCapacity', [0, 1, 2], tab_file_path = tab_file_path)
-        read_file(filepath, 'HeatModule/HeatModuleStorage.xlsx', 'Lifetime', [0, 1], tab_file_path = tab_file_path)
-        read_file(filepath, 'HeatModule/HeatModuleStorage.xlsx', 'StoragePowToEnergy', [0, 1], tab_file_path = tab_file_path)
-
-        #reading head adjustments at nodes
-        read_file(filepath, 'HeatModule/HeatModuleNode.xlsx', 'HeatAnnualDemand', [0, 1, 2], tab_file_path = tab_file_path)
-        read_file(filepath, 'HeatModule/HeatModuleNode.xlsx', 'NodeLostLoadCost', [0, 1, 2], tab_file_path = tab_file_path)
-        read_file(filepath, 'HeatModule/HeatModuleNode.xlsx', 'ElectricHeatShare', [0, 1], tab_file_path = tab_file_path)
-
-        # Reading ElecToHeat
-        read_file(filepath, 'HeatModule/HeatModuleConverter.xlsx', 'FixedOMCosts', [0, 1, 2], tab_file_path = tab_file_path)
-        read_file(filepath, 'HeatModule/HeatModuleConverter.xlsx', 'CapitalCosts', [0, 1, 2], tab_file_path = tab_file_path)
-        read_file(filepath, 'HeatModule/HeatModuleConverter.xlsx', 'InitialCapacity', [0, 1, 2, 3], tab_file_path = tab_file_path)
-        read_file(filepath, 'HeatModule/HeatModuleConverter.xlsx', 'MaxBuildCapacity', [0, 1, 2, 3], tab_file_path = tab_file_path)
-        read_file(filepath, 'HeatModule/HeatModuleConverter.xlsx', 'MaxInstallCapacity', [0, 1, 2], tab_file_path = tab_file_path)
-        read_file(filepath, 'HeatModule/HeatModuleConverter.xlsx', 'Efficiency', [0, 1], tab_file_path = tab_file_path)
-        read_file(filepath, 'HeatModule/HeatModuleConverter.xlsx', 'Lifetime', [0, 1], tab_file_path = tab_file_path)
-
-
-    if hydrogen is True:
-        read_sets(filepath, 'Hydrogen.xlsx', 'ProductionNodes', tab_file_path = tab_file_path)
-        # read_sets(filepath, 'Hydrogen.xlsx', 'Generators', tab_file_path = tab_file_path)
-        read_sets(filepath, 'Hydrogen.xlsx', 'ReformerLocations', tab_file_path = tab_file_path)
-        read_sets(filepath, 'Hydrogen.xlsx', 'ReformerPlants', tab_file_path = tab_file_path)
-        read_file(filepath, 'Hydrogen.xlsx', 'ReformerCapitalCost', [0,1,2], tab_file_path = tab_file_path)
-        read_file(filepath, 'Hydrogen.xlsx', 'ReformerFixedOMCost', [0,1,2], tab_file_path = tab_file_path)
-        read_file(filepath, 'Hydrogen.xlsx', 'ReformerVariableOMCost', [0,1,2], tab_file_path = tab_file_path)
-        read_file(filepath, 'Hydrogen.xlsx', 'ReformerEfficiency', [0,1,2], tab_file_path = tab_file_path)
-        read_file(filepath, 'Hydrogen.xlsx', 'ReformerElectricityUse', [0,1,2], tab_file_path = tab_file_path)
-        read_file(filepath, 'Hydrogen.xlsx', 'ReformerLifetime', [0,1], tab_file_path = tab_file_path)
-        read_file(filepath, 'Hydrogen.xlsx', 'ReformerEmissionFactor', [0,1,2], tab_file_path = tab_file_path)
-        read_file(filepath, 'Hydrogen.xlsx', 'ReformerCO2CaptureFactor', [0,1,2], tab_file_path = tab_file_path)
-        read_file(filepath, 'Hydrogen.xlsx', 'ElectrolyzerPlantCapitalCost', [0,1], tab_file_path = tab_file_path)
-        read_file(filepath, 'Hydrogen.xlsx', 'ElectrolyzerFixedOMCost', [0,1], tab_file_path = tab_file_path)
-        read_file(filepath, 'Hydrogen.xlsx', 'ElectrolyzerStackCapitalCost', [0,1], tab_file_path = tab_file_path)
-        read_file(filepath, 'Hydrogen.xlsx', 'ElectrolyzerLifetime', [0], tab_file_path = tab_file_path)
-        read_file(filepath, 'Hydrogen.xlsx', 'ElectrolyzerPowerUse', [0,1], tab_file_path = tab_file_path)
-        read_file(filepath, 'Hydrogen.xlsx', 'PipelineCapitalCost', [0,1], tab_file_path = tab_file_path)
-        read_file(filepath, 'Hydrogen.xlsx', 'PipelineOMCostPerKM', [0,1], tab_file_path = tab_file_path)
-        read_file(filepath, 'Hydrogen.xlsx', 'PipelineCompressorPowerUsage', [0], tab_file_path = tab_file_path)
-        read_file(filepath, 'Hydrogen.xlsx', 'StorageCapitalCost', [0,1], tab_file_path = tab_file_path)
-        read_file(filepath, 'Hydrogen.xlsx', 'StorageFixedOMCost', [0,1], tab_file_path = tab_file_path)
-        read_file(filepath, 'Hydrogen.xlsx', 'StorageMaxCapacity', [0,1], tab_file_path = tab_file_path)
-
-        read_sets(filepath, 'Industry.xlsx', 'Steel_Plants', tab_file_path = tab_file_path)
-        read_sets(filepath, 'Industry.xlsx', 'Cement_Plants', tab_file_path = tab_file_path)
-        read_sets(filepath, 'Industry.xlsx', 'Ammonia_Plants', tab_file_path = tab_file_path)
-        read_file(filepath, 'Industry.xlsx', 'Steel_InitialCapacity', [0,1,2], tab_file_path = tab_file_path)
-        read_file(filepath, 'Industry.xlsx', 'Steel_ScaleFactorInitialCap', [0,1,2], tab_file_path = tab_file_path)
-        read_file(filepath, 'Industry.xlsx', 'Steel_InvCost', [0,1,2], tab_file_path = tab_file_path)
-        read_file(filepath, 'Industry.xlsx', 'Steel_FixedOM', [0,1,2], tab_file_path = tab_file_path)
-        read_file(filepath, 'Industry.xlsx', 'Steel_VarOpex', [0,1,2], tab_file_path = tab_file_path)
-        read_file(filepath, 'Industry.xlsx', 'Steel_CoalConsumption', [0,1,2], tab_file_path = tab_file_path)
-        read_file(filepath, 'Industry.xlsx', 'Steel_HydrogenConsumption', [0,1,2], tab_file_path = tab_file_path)
-        read_file(filepath, 'Industry.xlsx', 'Steel_BioConsumption', [0,1,2], tab_file_path = tab_file_path)
-        read_file(filepath, 'Industry.xlsx', 'Steel_OilConsumption', [0,1,2], tab_file_path = tab_file_path)
-        read_file(filepath, 'Industry.xlsx', 'Steel_ElConsumption', [0,1,2], tab_file_path = tab_file_path)
-        read_file(filepath, 'Industry.xlsx', 'Steel_CO2Emissions', [0,1], tab_file_path = tab_file_path)
-        read_file(filepath, 'Industry.xlsx', 'Steel_CO2Captured', [0,1], tab_file_path = tab_file_path)
-        read_file(filepath, 'Industry.xlsx', 'Steel_YearlyProduction', [0,1,2], tab_file_path = tab_file_path)
-        read_file(filepath, 'Industry.xlsx', 'Cement_InitialCapacity', [0,1,2], tab_file_path = tab_file_path)
-        read_file(filepath, 'Industry.xlsx', 'Cement_ScaleFactorInitialCap', [0,1,2], tab_file_path = tab_file_path)
-        read_file(filepath, 'Industry.xlsx', 'Cement_InvCost', [0,1,2], tab_file_path = tab_file_path)
-        read_file(filepath, 'Industry.xlsx', 'Cement_FixedOM', [0,1,2], tab_file_path = tab_file_path)
-        read_file(filepath, 'Industry.xlsx', 'Cement_FuelConsumption', [0,1,2], tab_file_path = tab_file_path)
-        read_file(filepath, 'Industry.xlsx', 'Cement_CO2CaptureRate', [0,1], tab_file_path = tab_file_path)
-        read_file(filepath, 'Industry.xlsx', 'Cement_ElConsumption', [0,1,2], tab_file_path = tab_file_path)
-        read_file(filepath, 'Industry.xlsx', 'Cement_YearlyProduction', [0,1], tab_file_path = tab_file_path)
-        read_file(filepath, 'Industry.xlsx', 'Ammonia_InitialCapacity', [0,1,2], tab_file_path = tab_file_path)
-        read_file(filepath, 'Industry.xlsx', 'Ammonia_ScaleFactorInitialCap', [0,1,2], tab_file_path = tab_file_path)
-        read_file(filepath, 'Industry.xlsx', 'Ammonia_InvCost', [0,1,2], tab_file_path = tab_file_path)
-        read_file(filepath, 'Industry.xlsx', 'Ammonia_FixedOM', [0,1,2], tab_file_path = tab_file_path)
-        read_file(filepath, 'Industry.xlsx', 'Ammonia_FeedstockConsumption', [0,1], tab_file_path = tab_file_path)
-        read_file(filepath, 'Industry.xlsx', 'Ammonia_ElConsumption', [0,1], tab_file_path = tab_file_path)
-        read_file(filepath, 'Industry.xlsx', 'Ammonia_YearlyProduction', [0,1], tab_file_path = tab_file_path)
-        read_file(filepath, 'Industry.xlsx', 'Refinery_HydrogenConsumption', [0], tab_file_path = tab_file_path)
-        read_file(filepath, 'Industry.xlsx', 'Refinery_HeatConsumption', [0], tab_file_path = tab_file_path)
-        read_file(filepath, 'Industry.xlsx', 'Refinery_YearlyProduction', [0,1,2], tab_file_path = tab_file_path)
-
-        # read_sets(filepath, 'Transport.xlsx', 'SetsTransportTypes', tab_file_path=tab_file_path)
-        # read_sets(filepath, 'Transport.xlsx', 'SetsVehicleTypes', tab_file_path=tab_file_path)
-        # read_file(filepath, 'Transport.xlsx', 'SetsVehicleTypeOfTransportType', [0,1], tab_file_path=tab_file_path)
-        # read_file(filepath, 'Transport.xlsx', 'Demand_MWh', [0,1,2,3], tab_file_path=tab_file_path)
-        # read_file(filepath, 'Transport.xlsx', 'Demand_km', [0,1,2,3], tab_file_path=tab_file_path)
-        # read_file(filepath, 'Transport.xlsx', 'Lifetime', [0,1], tab_file_path=tab_file_path)
-        # read_file(filepath, 'Transport.xlsx', 'CapitalCost', [0,1,2], tab_file_path=tab_file_path)
-        # read_file(filepath, 'Transport.xlsx', 'EnergyConsumption', [0,1,2], tab_file_path=tab_file_path)
-        # read_file(filepath, 'Transport.xlsx', 'AviationFuelCost', [0,1,2], tab_file_path=tab_file_path)
-        # read_file(filepath, 'Transport.xlsx', 'InitialCapacity', [0,1,2], tab_file_path=tab_file_path)
-        # read_file(filepath, 'Transport.xlsx', 'InitialCapacityScaleFactor', [0,1,2], tab_file_path=tab_file_path)
-
-        read_file(filepath, 'Transport.xlsx', 'ElectricityDemand', [0,1,2], tab_file_path=tab_file_path)
-        read_file(filepath, 'Transport.xlsx', 'HydrogenDemand', [0,1,2], tab_file_path=tab_file_path)
-        read_file(filepath, 'Transport.xlsx', 'NaturalGasDemand', [0,1,2], tab_file_path=tab_file_path)
+    if force:
+        manifest = {}
+    else:
+        manifest = read_manifest(tab_file_path)
+    workbooks = sheet_jobs(HEATMODULE, hydrogen)
+
+    if in_memory:
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=min(workers, len(workbooks))) as pool:
+                results = list(pool.map(read_workbook_tables, [filepath] * len(workbooks),
+                                        *zip(*[(wb['excel'], wb['sets'], wb['tables']) for wb in workbooks])))
+        else:
+            results = [read_workbook_tables(filepath, **wb) for wb in workbooks]
+        bundle = {}
+        for tables in results:
+            bundle.update(tables)
+        if archive:
+            for name, save_csv_frame in bundle.items():
+                save_tab(save_csv_frame, tab_file_path + "/" + name, store)
+            print(str(len(bundle)) + " .tab-files written")
+        print(str(len(bundle)) + " tables read into memory")
+        return bundle
+
+    written = 0
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(workbooks))) as pool:
+            futures = [pool.submit(convert_workbook, filepath, tab_file_path=tab_file_path,
+                                   previous=manifest.get(wb['excel']), store=store, **wb) for wb in workbooks]
+            results = [future.result() for future in futures]
+    else:
+        results = [convert_workbook(filepath, tab_file_path=tab_file_path,
+                                    previous=manifest.get(wb['excel']), store=store, **wb) for wb in workbooks]
+
+    for excel, entry, n in results:
+        manifest[excel] = entry
+        written += n
+
+    write_manifest(tab_file_path, manifest)
+    print(str(written) + " .tab-files written, unchanged sheets skipped")
+
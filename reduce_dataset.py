@@ -0,0 +1,284 @@
+import argparse
+import csv
+import os
+import re
+import shutil
+
+import openpyxl
+import pandas as pd
+
+from reader import MANIFEST_NAME, SHEETS, is_set_workbook
+from scenario_random import DICT_COUNTRIES, TIMESERIES_CACHE
+
+# Extracts a smaller, self-consistent dataset from a full EMPIRE dataset for fast development and CI runs.
+# Every sheet that reader.py converts is filtered on the nodes, technologies (and through
+# GeneratorsOfTechnology the generators) and periods that are not selected, so that relations such as
+# GeneratorsOfNode, DirectionalLines, NaturalGasDirectionalLines and the industry producers only refer to
+# members that remain in the reduced sets. The raw time series in ScenarioData keep the time column and
+# the columns of the selected countries, and sampling_key.csv keeps the selected periods and seasons.
+#
+#   python reduce_dataset.py --nodes Germany Denmark Sweden --periods 2 --seasons winter summer
+#                            --output "Data handler/reduced_model"
+#
+# Periods are the first N periods of the full dataset; they are not renumbered because the cost and
+# demand data are tied to the period index. Run the model with NoOfPeriods = N, the same regular seasons
+# and (with fix_sample) at most the number of scenarios in the reduced sampling_key.csv.
+
+# The scenario generator expands the NO column of the raw time series to these price zones
+NORWAY_NODES = ['NO1', 'NO2', 'NO3', 'NO4', 'NO5']
+
+def member(value):
+    # Function description: set member as written to the .tab files (see reader.clean_keys)
+    if value is None:
+        return None
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    value = re.sub(r'\s', '', str(value))
+    return value if value != '' else None
+
+def period(value):
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return None
+
+def column_values(ws, column, first_row):
+    return [ws.cell(row=r, column=column).value for r in range(first_row, ws.max_row + 1)]
+
+def read_set(ws, header):
+    # Function description: members of the set in the column with the given header of a set sheet
+    for cell in ws[1]:
+        if cell.value == header:
+            return {m for m in map(member, column_values(ws, cell.column, 2)) if m is not None}
+    return set()
+
+def read_relation(ws):
+    # Function description: (first, second) members of a two-column relation sheet
+    rows = zip(column_values(ws, 1, 4), column_values(ws, 2, 4))
+    return [(member(a), member(b)) for a, b in rows if member(a) is not None and member(b) is not None]
+
+class Selection:
+    # Members of the full dataset per kind of set and the ones removed from the reduced dataset
+
+    def __init__(self, filepath, nodes, periods=None, technologies=None, HEATMODULE=True):
+        sets = openpyxl.load_workbook(filepath + "/Sets.xlsx", read_only=True, data_only=True)
+        all_nodes = read_set(sets['Nodes'], 'Node')
+        all_technologies = read_set(sets['Technology'], 'Technology')
+        all_generators = read_set(sets['Generators'], 'Generator')
+        generator_technologies = read_relation(sets['GeneratorsOfTechnology'])
+        sets.close()
+        if HEATMODULE and os.path.exists(filepath + "/HeatModule/HeatModuleSets.xlsx"):
+            sets = openpyxl.load_workbook(filepath + "/HeatModule/HeatModuleSets.xlsx", read_only=True,
+                                          data_only=True)
+            all_technologies |= read_set(sets['Technology'], 'TechnologyHeat')
+            for header in ['GeneratorHeat', 'GeneratorHeatAndElectricity', 'IndustrialHeat']:
+                all_generators |= read_set(sets['Generator'], header)
+            generator_technologies += read_relation(sets['GeneratorsOfTechnology'])
+            sets.close()
+
+        nodes = {member(n) for n in nodes}
+        unknown = nodes - all_nodes
+        if unknown:
+            raise ValueError("Unknown nodes: " + ", ".join(sorted(unknown)))
+        norway = [n for n in NORWAY_NODES if n in nodes]
+        if norway and len(norway) != len(NORWAY_NODES):
+            raise ValueError("Select all of " + ", ".join(NORWAY_NODES) + " or none of them; the scenario "
+                             "generator expands the NO time series to every Norwegian price zone")
+
+        excluded_technologies = set()
+        if technologies is not None:
+            technologies = {member(t) for t in technologies}
+            unknown = technologies - all_technologies
+            if unknown:
+                raise ValueError("Unknown technologies: " + ", ".join(sorted(unknown)))
+            excluded_technologies = all_technologies - technologies
+        # A generator is removed when none of its technologies is selected
+        kept_generators = {g for t, g in generator_technologies if t not in excluded_technologies}
+        related = {g for t, g in generator_technologies}
+
+        self.nodes = nodes
+        self.periods = periods
+        self.universe = {'node': all_nodes, 'technology': all_technologies, 'generator': all_generators}
+        self.excluded = {'node': all_nodes - nodes,
+                         'technology': excluded_technologies,
+                         'generator': related - kept_generators}
+
+    def column_kinds(self, header, values):
+        # Function description: kinds of set the members of a key column can belong to. A column is of
+        # a kind when all its members are in that set of the full dataset; names shared by technologies
+        # and generators (Solar, Nuclear, ...) leave both kinds.
+        values = [v for v in values if v is not None]
+        if not values:
+            return []
+        if self.periods is not None and 'period' in str(header).lower() and \
+                all(period(v) is not None for v in values):
+            return ['period']
+        members = {member(v) for v in values}
+        return [k for k, universe in self.universe.items() if members <= universe]
+
+    def is_excluded(self, kinds, value):
+        if value is None or not kinds:
+            return False
+        if kinds == ['period']:
+            return period(value) > self.periods
+        return all(member(value) in self.excluded[k] for k in kinds)
+
+def is_generated(name):
+    # Function description: files and folders that runs write into a dataset (the .tab files of a run, their
+    # manifest and binary caches, the parsed time series), built for the full node set. They are not copied
+    # to the reduced dataset and are rebuilt there on first use.
+    return name.startswith('Tab_Files_') or name in [MANIFEST_NAME, TIMESERIES_CACHE] or \
+        name.endswith(('.npz', '.tmp'))
+
+def copy_unfiltered(filepath, reduced_path):
+    # Function description: copy the files of the dataset that are not filtered (documentation, unused
+    # workbooks) as they are, leaving out ScenarioData and the generated files
+    for root, dirs, files in os.walk(filepath):
+        dirs[:] = [d for d in dirs if not is_generated(d) and
+                   not (root == filepath and d == 'ScenarioData')]
+        folder = reduced_path + root[len(filepath):]
+        os.makedirs(folder, exist_ok=True)
+        for f in files:
+            if not is_generated(f):
+                shutil.copy2(root + "/" + f, folder + "/" + f)
+
+def rewrite_column(ws, column, first_row, values):
+    for r in range(first_row, ws.max_row + 1):
+        i = r - first_row
+        ws.cell(row=r, column=column).value = values[i] if i < len(values) else None
+
+def reduce_set_sheet(ws, selection):
+    # Function description: set sheets hold one set per column (header in the first row), every column is
+    # filtered on its own
+    # Output: number of removed members and the headers of the sets left empty, which Pyomo cannot load
+    removed = 0
+    emptied = []
+    for cell in ws[1]:
+        if cell.value is None:
+            continue
+        values = column_values(ws, cell.column, 2)
+        kinds = selection.column_kinds(cell.value, values)
+        kept = [v for v in values if v is not None and not selection.is_excluded(kinds, v)]
+        removed += sum(1 for v in values if v is not None) - len(kept)
+        if not kept and any(v is not None for v in values):
+            emptied.append(cell.value)
+        rewrite_column(ws, cell.column, 2, kept)
+    return removed, emptied
+
+def reduce_table_sheet(ws, columns, keys, selection):
+    # Function description: table sheets have two description rows and a header row; a row is removed
+    # when one of its key columns refers to a removed member. Only the columns reader.py reads are
+    # rewritten, notes and side tables next to them stay in place.
+    columns = [c + 1 for c in columns]
+    data = list(zip(*[column_values(ws, c, 4) for c in columns]))
+    kinds = [selection.column_kinds(ws.cell(row=3, column=c).value, [row[i] for row in data])
+             for i, c in enumerate(columns[:keys])]
+    kept = [row for row in data if any(v is not None for v in row) and
+            not any(selection.is_excluded(kinds[i], row[i]) for i in range(keys))]
+    for i, c in enumerate(columns):
+        rewrite_column(ws, c, 4, [row[i] for row in kept])
+    return len([row for row in data if any(v is not None for v in row)]) - len(kept)
+
+def reduce_workbooks(filepath, reduced_path, selection):
+    workbooks = {}
+    for excel, sheet, columns, target, module in SHEETS:
+        workbooks.setdefault(excel, []).append((sheet, columns))
+
+    for excel, sheets in workbooks.items():
+        if not os.path.exists(filepath + "/" + excel):
+            continue
+        # Formulas are replaced by their values, they would refer to rows that have moved
+        wb = openpyxl.load_workbook(filepath + "/" + excel, data_only=True)
+        removed = 0
+        for sheet, columns in sheets:
+            if sheet not in wb.sheetnames:
+                continue
+            if columns is None:
+                n, emptied = reduce_set_sheet(wb[sheet], selection)
+                removed += n
+                for header in emptied:
+                    print("WARNING! Set {} in {} ({}) is empty in the reduced dataset".format(header, excel, sheet))
+            else:
+                keys = len(columns) if is_set_workbook(excel) else len(columns) - 1
+                removed += reduce_table_sheet(wb[sheet], columns, keys, selection)
+        wb.save(reduced_path + "/" + excel)
+        print("{}: {} rows/members removed".format(excel, removed))
+
+def kept_column(column, selection, dict_countries):
+    if column == 'time':
+        return True
+    if column == 'NO':
+        return all(n in selection.nodes for n in NORWAY_NODES)
+    return member(dict_countries.get(column, column)) in selection.nodes
+
+def reduce_timeseries(source, target, selection, dict_countries):
+    # Function description: keep the time column and the columns of the selected countries of a raw
+    # time series, streamed line by line so that the values are copied exactly
+    with open(source, newline='') as f_in, open(target, 'w', newline='') as f_out:
+        reader = csv.reader(f_in)
+        writer = csv.writer(f_out)
+        header = next(reader)
+        keep = [i for i, c in enumerate(header) if kept_column(c, selection, dict_countries)]
+        writer.writerow([header[i] for i in keep])
+        for row in reader:
+            writer.writerow([row[i] for i in keep])
+    return len(header) - len(keep)
+
+def reduce_scenario_data(filepath, reduced_path, selection, seasons=None, dict_countries=DICT_COUNTRIES):
+    source = filepath + "/ScenarioData"
+    if not os.path.exists(source):
+        return
+    for root, dirs, files in os.walk(source):
+        # The parsed time series cache is rebuilt from the reduced csv-files on first use
+        dirs[:] = [d for d in dirs if not is_generated(d)]
+        folder = reduced_path + "/ScenarioData" + root[len(source):]
+        os.makedirs(folder, exist_ok=True)
+        for f in files:
+            if is_generated(f):
+                continue
+            if f == 'sampling_key.csv':
+                sampling_key = pd.read_csv(root + "/" + f)
+                keep = pd.Series(True, index=sampling_key.index)
+                if selection.periods is not None:
+                    keep &= sampling_key['Period'] <= selection.periods
+                if seasons is not None:
+                    keep &= sampling_key['Season'].isin(list(seasons) + ['peak'])
+                sampling_key[keep].to_csv(folder + "/" + f, index=False)
+                print("{}: {} rows removed".format(f, int((~keep).sum())))
+            elif f.endswith('.csv') and 'time' in pd.read_csv(root + "/" + f, nrows=0).columns:
+                removed = reduce_timeseries(root + "/" + f, folder + "/" + f, selection, dict_countries)
+                print("{}: {} columns removed".format(f, removed))
+            else:
+                shutil.copy2(root + "/" + f, folder + "/" + f)
+
+def reduce_dataset(filepath, reduced_path, nodes, periods=None, seasons=None, technologies=None,
+                   HEATMODULE=True, dict_countries=DICT_COUNTRIES):
+    # Function description: write a reduced copy of the dataset in filepath to reduced_path
+    # Input: the nodes to keep (as in Sets.xlsx, whitespace is ignored), the number of leading periods to
+    #        keep, the regular seasons to keep in sampling_key.csv and the technologies to keep (None keeps
+    #        all of them). dict_countries maps the column codes of the raw time series to node names.
+    # Output: a dataset folder with the same layout that generate_tab_files and generate_random_scenario read
+    source = os.path.abspath(filepath)
+    if os.path.commonpath([source, os.path.abspath(reduced_path)]) == source:
+        raise ValueError("The reduced dataset must be written to a folder outside of " + filepath)
+    selection = Selection(filepath, nodes, periods, technologies, HEATMODULE)
+
+    copy_unfiltered(filepath, reduced_path)
+    reduce_workbooks(filepath, reduced_path, selection)
+    reduce_scenario_data(filepath, reduced_path, selection, seasons, dict_countries)
+    return selection
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a reduced, self-consistent copy of an EMPIRE dataset")
+    parser.add_argument('--data', default='Data handler/full_model', help="folder holding the full dataset")
+    parser.add_argument('--output', required=True, help="folder the reduced dataset is written to")
+    parser.add_argument('--nodes', nargs='+', required=True, help="nodes to keep, e.g. Germany NO1 NO2 NO3 NO4 NO5")
+    parser.add_argument('--periods', type=int, default=None, help="number of leading periods to keep")
+    parser.add_argument('--seasons', nargs='+', default=None, help="regular seasons to keep in sampling_key.csv")
+    parser.add_argument('--technologies', nargs='+', default=None, help="technologies to keep (default all)")
+    parser.add_argument('--no-heatmodule', action='store_true')
+    args = parser.parse_args()
+
+    reduce_dataset(args.data, args.output, args.nodes, periods=args.periods, seasons=args.seasons,
+                   technologies=args.technologies, HEATMODULE=not args.no_heatmodule)
+    print("Reduced dataset written to " + args.output)
@@ -1,6 +1,6 @@
 from reader import generate_tab_files
 from Empire import run_empire
-from scenario_random import generate_random_scenario
+from scenario_random import generate_random_scenario, DICT_COUNTRIES
 from datetime import datetime
 import time
 import gc
@@ -30,6 +30,15 @@ WRITE_LP = False #True
 PICKLE_INSTANCE = False #True
 hydrogen=True
 FIX_SAMPLE = True
+SCENARIO_SEED = None #int: repeat the random scenarios of an earlier run (its seed is printed)
+SCENARIO_WORKERS = 1 #processes sampling the scenarios
+TAB_WORKERS = 1 #processes converting the workbooks to .tab-files
+TAB_STORE = None #directory of a .tab-file store shared by runs and datasets (e.g. 'Data handler/tab_store'), None: full .tab-files per run
+EXTEND_SCENARIOS = False #True: keep the scenarios already in tab_file_path and only sample the ones added
+SCENARIO_SAMPLER = 'random' #'random' #'stratified': years, months and hours spread over the scenarios #'kmedoids': representative scenarios clustered from a pool, with probabilities #'reduction': scenarios reduced from a pool, with probabilities
+SCENARIO_POOL = None #scenarios sampled for 'kmedoids' and 'reduction', 10*NoOfScenarios if None
+STREAM_SCENARIOS = False #True: write every sampled scenario to the .tab-files right away, bounding memory
+IN_MEMORY = False #True: hand the tables to run_empire without writing .tab-files
 FLEX_IND = True
 steel_ccs_cost_increase = None
 steel_CCS_capture_rate = None
@@ -37,126 +46,120 @@ steel_CCS_capture_rate = None
 #######
 ##RUN##
 #######
-if FLEX_IND is True:
-    ind_str = 'flexible_industry'
-else:
-    ind_str = 'inflexible_industry'
-name = f'{version}_{ind_str}_expensive_gas'
-if steel_ccs_cost_increase is not None:
-    name = f'{name}_steelCCS_{1+steel_ccs_cost_increase/100:.1f}'
-if steel_CCS_capture_rate is not None:
-    name = f'{name}_steelCCScapRate_{steel_CCS_capture_rate:.2f}'
-# if scenariogeneration:
-#     name = name + "_randomSGR" + '_scen' + str(NoOfScenarios)
-# else:
-#     name = name + "_noSGR"
-# name = name + str(datetime.now().strftime("_%Y%m%d%H%M"))
-workbook_path = 'Data handler/' + version
-tab_file_path = 'Data handler/' + version + '/Tab_Files_' + name
-scenario_data_path = 'Data handler/' + version + '/ScenarioData'
-result_file_path = 'Results/' + name
-FirstHoursOfRegSeason = [lengthRegSeason*i + 1 for i in range(NoOfRegSeason)]
-FirstHoursOfPeakSeason = [lengthRegSeason*NoOfRegSeason + lengthPeakSeason*i + 1 for i in range(NoOfPeakSeason)]
-Period = [i + 1 for i in range(NoOfPeriods)]
-Scenario = ["scenario"+str(i + 1) for i in range(NoOfScenarios)]
-peak_seasons = ['peak'+str(i + 1) for i in range(NoOfPeakSeason)]
-Season = regular_seasons + peak_seasons
-Operationalhour = [i + 1 for i in range(FirstHoursOfPeakSeason[-1] + lengthPeakSeason - 1)]
-HoursOfRegSeason = [(s,h) for s in regular_seasons for h in Operationalhour \
-                 if h in list(range(regular_seasons.index(s)*lengthRegSeason+1,
-                               regular_seasons.index(s)*lengthRegSeason+lengthRegSeason+1))]
-HoursOfPeakSeason = [(s,h) for s in peak_seasons for h in Operationalhour \
-                     if h in list(range(lengthRegSeason*len(regular_seasons)+ \
-                                        peak_seasons.index(s)*lengthPeakSeason+1,
-                                        lengthRegSeason*len(regular_seasons)+ \
-                                            peak_seasons.index(s)*lengthPeakSeason+ \
-                                                lengthPeakSeason+1))]
-HoursOfSeason = HoursOfRegSeason + HoursOfPeakSeason
-dict_countries = {"AT": "Austria", "BA": "BosniaH", "BE": "Belgium",
-                  "BG": "Bulgaria", "CH": "Switzerland", "CZ": "CzechR",
-                  "DE": "Germany", "DK": "Denmark", "EE": "Estonia",
-                  "ES": "Spain", "FI": "Finland", "FR": "France",
-                  "GB": "GreatBrit.", "GR": "Greece", "HR": "Croatia",
-                  "HU": "Hungary", "IE": "Ireland", "IT": "Italy",
-                  "LT": "Lithuania", "LU": "Luxemb.", "LV": "Latvia",
-                  "MK": "Macedonia", "NL": "Netherlands", "NO": "Norway",
-                  "PL": "Poland", "PT": "Portugal", "RO": "Romania",
-                  "RS": "Serbia", "SE": "Sweden", "SI": "Slovenia",
-                  "SK": "Slovakia", "MF": "MorayFirth", "FF": "FirthofForth",
-                  "DB": "DoggerBank", "HS": "Hornsea", "OD": "OuterDowsing",
-                  "NF": "Norfolk", "EA": "EastAnglia", "BS": "Borssele",
-                  "HK": "HollandseeKust", "HB": "HelgoländerBucht", "NS": "Nordsøen",
-                  "UN": "UtsiraNord", "SN1": "SørligeNordsjøI", "SN2": "SørligeNordsjøII",
-                  "EHGB":"Energyhub Great Britain", "EHNO": "Energyhub Norway",
-                  "EHEU": "Energyhub EU"}
-offshoreNodesList = ["Energyhub Great Britain", "Energyhub Norway", "Energyhub EU"]
-windfarmNodes = ["Moray Firth","Firth of Forth","Dogger Bank","Hornsea","Outer Dowsing","Norfolk","East Anglia","Borssele","Hollandsee Kust","Helgoländer Bucht","Nordsøen","Utsira Nord","Sørlige Nordsjø I","Sørlige Nordsjø II"]
+# The run is only started when the script is executed, not when the scenario worker processes import it
+if __name__ == "__main__":
+    if FLEX_IND is True:
+        ind_str = 'flexible_industry'
+    else:
+        ind_str = 'inflexible_industry'
+    name = f'{version}_{ind_str}_expensive_gas'
+    if steel_ccs_cost_increase is not None:
+        name = f'{name}_steelCCS_{1+steel_ccs_cost_increase/100:.1f}'
+    if steel_CCS_capture_rate is not None:
+        name = f'{name}_steelCCScapRate_{steel_CCS_capture_rate:.2f}'
+    # if scenariogeneration:
+    #     name = name + "_randomSGR" + '_scen' + str(NoOfScenarios)
+    # else:
+    #     name = name + "_noSGR"
+    # name = name + str(datetime.now().strftime("_%Y%m%d%H%M"))
+    workbook_path = 'Data handler/' + version
+    tab_file_path = 'Data handler/' + version + '/Tab_Files_' + name
+    scenario_data_path = 'Data handler/' + version + '/ScenarioData'
+    result_file_path = 'Results/' + name
+    FirstHoursOfRegSeason = [lengthRegSeason*i + 1 for i in range(NoOfRegSeason)]
+    FirstHoursOfPeakSeason = [lengthRegSeason*NoOfRegSeason + lengthPeakSeason*i + 1 for i in range(NoOfPeakSeason)]
+    Period = [i + 1 for i in range(NoOfPeriods)]
+    Scenario = ["scenario"+str(i + 1) for i in range(NoOfScenarios)]
+    peak_seasons = ['peak'+str(i + 1) for i in range(NoOfPeakSeason)]
+    Season = regular_seasons + peak_seasons
+    Operationalhour = [i + 1 for i in range(FirstHoursOfPeakSeason[-1] + lengthPeakSeason - 1)]
+    HoursOfRegSeason = [(s,h) for s in regular_seasons for h in Operationalhour \
+                     if h in list(range(regular_seasons.index(s)*lengthRegSeason+1,
+                                   regular_seasons.index(s)*lengthRegSeason+lengthRegSeason+1))]
+    HoursOfPeakSeason = [(s,h) for s in peak_seasons for h in Operationalhour \
+                         if h in list(range(lengthRegSeason*len(regular_seasons)+ \
+                                            peak_seasons.index(s)*lengthPeakSeason+1,
+                                            lengthRegSeason*len(regular_seasons)+ \
+                                                peak_seasons.index(s)*lengthPeakSeason+ \
+                                                    lengthPeakSeason+1))]
+    HoursOfSeason = HoursOfRegSeason + HoursOfPeakSeason
+    dict_countries = DICT_COUNTRIES
+    offshoreNodesList = ["Energyhub Great Britain", "Energyhub Norway", "Energyhub EU"]
+    windfarmNodes = ["Moray Firth","Firth of Forth","Dogger Bank","Hornsea","Outer Dowsing","Norfolk","East Anglia","Borssele","Hollandsee Kust","Helgoländer Bucht","Nordsøen","Utsira Nord","Sørlige Nordsjø I","Sørlige Nordsjø II"]
 
-print('++++++++')
-print('+EMPIRE+')
-print('++++++++')
-print('Solver: ' + solver)
-print('Scenario Generation: ' + str(scenariogeneration))
-print('++++++++')
-print('ID: ' + name)
-print('++++++++')
-print('Hydrogen: ' + str(hydrogen))
-print('Heat module: ' + str(HEATMODULE))
-print('++++++++')
+    print('++++++++')
+    print('+EMPIRE+')
+    print('++++++++')
+    print('Solver: ' + solver)
+    print('Scenario Generation: ' + str(scenariogeneration))
+    print('++++++++')
+    print('ID: ' + name)
+    print('++++++++')
+    print('Hydrogen: ' + str(hydrogen))
+    print('Heat module: ' + str(HEATMODULE))
+    print('++++++++')
 
 
-if scenariogeneration:
-    tick = time.time()
-    generate_random_scenario(filepath = scenario_data_path,
-                             tab_file_path = tab_file_path,
-                             scenarios = NoOfScenarios,
-                             seasons = regular_seasons,
-                             Periods = NoOfPeriods,
-                             regularSeasonHours = lengthRegSeason,
-                             peakSeasonHours = lengthPeakSeason,
-                             dict_countries = dict_countries,
-                             HEATMODULE=HEATMODULE,
-                             fix_sample=FIX_SAMPLE)
-    tock = time.time()
-    print("{hour}:{minute}:{second}: Scenario generation took [sec]:".format(
-    hour=datetime.now().strftime("%H"), minute=datetime.now().strftime("%M"), second=datetime.now().strftime("%S")) + str(tock - tick))
+    if scenariogeneration:
+        tick = time.time()
+        generate_random_scenario(filepath = scenario_data_path,
+                                 tab_file_path = tab_file_path,
+                                 scenarios = NoOfScenarios,
+                                 seasons = regular_seasons,
+                                 Periods = NoOfPeriods,
+                                 regularSeasonHours = lengthRegSeason,
+                                 peakSeasonHours = lengthPeakSeason,
+                                 dict_countries = dict_countries,
+                                 HEATMODULE=HEATMODULE,
+                                 fix_sample=FIX_SAMPLE,
+                                 seed=SCENARIO_SEED,
+                                 workers=SCENARIO_WORKERS,
+                                 extend=EXTEND_SCENARIOS,
+                                 sampler=SCENARIO_SAMPLER,
+                                 pool=SCENARIO_POOL,
+                                 stream=STREAM_SCENARIOS)
+        tock = time.time()
+        print("{hour}:{minute}:{second}: Scenario generation took [sec]:".format(
+        hour=datetime.now().strftime("%H"), minute=datetime.now().strftime("%M"), second=datetime.now().strftime("%S")) + str(tock - tick))
 
-generate_tab_files(filepath = workbook_path, tab_file_path = tab_file_path,
-                   HEATMODULE=HEATMODULE, hydrogen = hydrogen)
+    tab_data = generate_tab_files(filepath = workbook_path, tab_file_path = tab_file_path,
+                                  HEATMODULE=HEATMODULE, hydrogen = hydrogen, workers = TAB_WORKERS,
+                                  store = TAB_STORE, in_memory = IN_MEMORY)
 
-if steel_ccs_cost_increase is not None:
-    steel_ccs_cost_increase = steel_ccs_cost_increase/100
+    if steel_ccs_cost_increase is not None:
+        steel_ccs_cost_increase = steel_ccs_cost_increase/100
 
-run_empire(name = name,
-           tab_file_path = tab_file_path,
-           result_file_path = result_file_path,
-           scenariogeneration = scenariogeneration,
-           scenario_data_path = scenario_data_path,
-           solver = solver,
-           temp_dir = temp_dir,
-           FirstHoursOfRegSeason = FirstHoursOfRegSeason,
-           FirstHoursOfPeakSeason = FirstHoursOfPeakSeason,
-           lengthRegSeason = lengthRegSeason,
-           lengthPeakSeason = lengthPeakSeason,
-           Period = Period,
-           Operationalhour = Operationalhour,
-           Scenario = Scenario,
-           Season = Season,
-           HoursOfSeason = HoursOfSeason,
-           NoOfRegSeason=NoOfRegSeason,
-           NoOfPeakSeason=NoOfPeakSeason,
-           discountrate = discountrate,
-           WACC = WACC,
-           LeapYearsInvestment = LeapYearsInvestment,
-           WRITE_LP = WRITE_LP,
-           PICKLE_INSTANCE = PICKLE_INSTANCE,
-           EMISSION_CAP = EMISSION_CAP,
-           USE_TEMP_DIR = USE_TEMP_DIR,
-           offshoreNodesList = offshoreNodesList,
-           hydrogen = hydrogen,
-           windfarmNodes = windfarmNodes,
-           HEATMODULE=HEATMODULE,
-           FLEX_IND=FLEX_IND,
-           steel_CCS_cost_increase= steel_ccs_cost_increase,
-           steel_CCS_capture_rate = steel_CCS_capture_rate)
-gc.collect()
\ No newline at end of file
+    run_empire(name = name,
+               tab_file_path = tab_file_path,
+               result_file_path = result_file_path,
+               scenariogeneration = scenariogeneration,
+               scenario_data_path = scenario_data_path,
+               solver = solver,
+               temp_dir = temp_dir,
+               FirstHoursOfRegSeason = FirstHoursOfRegSeason,
+               FirstHoursOfPeakSeason = FirstHoursOfPeakSeason,
+               lengthRegSeason = lengthRegSeason,
+               lengthPeakSeason = lengthPeakSeason,
+               Period = Period,
+               Operationalhour = Operationalhour,
+               Scenario = Scenario,
+               Season = Season,
+               HoursOfSeason = HoursOfSeason,
+               NoOfRegSeason=NoOfRegSeason,
+               NoOfPeakSeason=NoOfPeakSeason,
+               discountrate = discountrate,
+               WACC = WACC,
+               LeapYearsInvestment = LeapYearsInvestment,
+               WRITE_LP = WRITE_LP,
+               PICKLE_INSTANCE = PICKLE_INSTANCE,
+               EMISSION_CAP = EMISSION_CAP,
+               USE_TEMP_DIR = USE_TEMP_DIR,
+               offshoreNodesList = offshoreNodesList,
+               hydrogen = hydrogen,
+               windfarmNodes = windfarmNodes,
+               HEATMODULE=HEATMODULE,
+               FLEX_IND=FLEX_IND,
+               steel_CCS_cost_increase= steel_ccs_cost_increase,
+               steel_CCS_capture_rate = steel_CCS_capture_rate,
+               tab_data = tab_data)
+    gc.collect()
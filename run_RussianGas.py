@@ -1,6 +1,6 @@
 from reader import generate_tab_files
 from Empire import run_empire
-from scenario_random import generate_random_scenario
+from scenario_random import generate_random_scenario, DICT_COUNTRIES
 from datetime import datetime
 import time
 import gc
@@ -30,6 +30,7 @@ WRITE_LP = False #True
 PICKLE_INSTANCE = False #True
 hydrogen=True
 FIX_SAMPLE = True
+TAB_STORE = None #directory of a .tab-file store shared by runs and datasets (e.g. 'Data handler/tab_store'), None: full .tab-files per run
 FLEX_IND = True
 
 #######
@@ -61,23 +62,7 @@ HoursOfPeakSeason = [(s,h) for s in peak_seasons for h in Operationalhour \
                                             peak_seasons.index(s)*lengthPeakSeason+ \
                                                 lengthPeakSeason+1))]
 HoursOfSeason = HoursOfRegSeason + HoursOfPeakSeason
-dict_countries = {"AT": "Austria", "BA": "BosniaH", "BE": "Belgium",
-                  "BG": "Bulgaria", "CH": "Switzerland", "CZ": "CzechR",
-                  "DE": "Germany", "DK": "Denmark", "EE": "Estonia",
-                  "ES": "Spain", "FI": "Finland", "FR": "France",
-                  "GB": "GreatBrit.", "GR": "Greece", "HR": "Croatia",
-                  "HU": "Hungary", "IE": "Ireland", "IT": "Italy",
-                  "LT": "Lithuania", "LU": "Luxemb.", "LV": "Latvia",
-                  "MK": "Macedonia", "NL": "Netherlands", "NO": "Norway",
-                  "PL": "Poland", "PT": "Portugal", "RO": "Romania",
-                  "RS": "Serbia", "SE": "Sweden", "SI": "Slovenia",
-                  "SK": "Slovakia", "MF": "MorayFirth", "FF": "FirthofForth",
-                  "DB": "DoggerBank", "HS": "Hornsea", "OD": "OuterDowsing",
-                  "NF": "Norfolk", "EA": "EastAnglia", "BS": "Borssele",
-                  "HK": "HollandseeKust", "HB": "HelgoländerBucht", "NS": "Nordsøen",
-                  "UN": "UtsiraNord", "SN1": "SørligeNordsjøI", "SN2": "SørligeNordsjøII",
-                  "EHGB":"Energyhub Great Britain", "EHNO": "Energyhub Norway",
-                  "EHEU": "Energyhub EU"}
+dict_countries = DICT_COUNTRIES
 offshoreNodesList = ["Energyhub Great Britain", "Energyhub Norway", "Energyhub EU"]
 windfarmNodes = ["Moray Firth","Firth of Forth","Dogger Bank","Hornsea","Outer Dowsing","Norfolk","East Anglia","Borssele","Hollandsee Kust","Helgoländer Bucht","Nordsøen","Utsira Nord","Sørlige Nordsjø I","Sørlige Nordsjø II"]
 
@@ -110,7 +95,7 @@ if scenariogeneration:
     hour=datetime.now().strftime("%H"), minute=datetime.now().strftime("%M"), second=datetime.now().strftime("%S")) + str(tock - tick))
 
 generate_tab_files(filepath = workbook_path, tab_file_path = tab_file_path,
-                   HEATMODULE=HEATMODULE, hydrogen = hydrogen)
+                   HEATMODULE=HEATMODULE, hydrogen = hydrogen, store = TAB_STORE)
 
 run_empire(name = name,
            tab_file_path = tab_file_path,
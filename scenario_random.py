@@ -1,6 +1,11 @@
 import pandas as pd
 import numpy as np
 import os
+import json
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+from reader import save_tab, append_tab, TabWriter, expand_blocks
 
 def gather_season(data, season):
     if season=="winter":
@@ -53,106 +58,547 @@ def make_datetime(data, time_format):
     data['dayofweek'] = data['time'].dt.dayofweek
     return data
 
+TIMESERIES_CACHE = "timeseries_cache"
+TIMESERIES_FORMAT_VERSION = 1
+TIME_COLUMNS = ['time', 'year', 'month', 'dayofweek', 'hour']
+# Rows of the raw time series parsed, converted or copied at a time (one year)
+TIMESERIES_CHUNK_ROWS = 24 * 366
+
+def timeseries_cache_path(filepath, name):
+    # Function description: folder of the parsed cache of the raw time series filepath/name (e.g. "solar.csv"
+    # or "HeatModule/heatload.csv")
+    return filepath + "/" + TIMESERIES_CACHE + "/" + os.path.splitext(name)[0]
+
+def source_stamp(path, time_format):
+    stat = os.stat(path)
+    return {'version': TIMESERIES_FORMAT_VERSION, 'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns, 'time_format': time_format}
+
+def write_json(path, meta):
+    # Function description: write the stamp of a cache through a temporary file, so it is never seen half written
+    tmp_path = path + '.' + str(os.getpid()) + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, path)
+
+def write_npy(path, raw_path, raw_dtype, dtype, shape):
+    # Function description: save the array of the given shape in the raw file (written chunk by chunk) as
+    # .npy-file with the given dtype, converting one block of rows at a time
+    block = max(1, TIMESERIES_CHUNK_ROWS * int(np.prod(shape[1:])))
+    size = int(np.prod(shape))
+    tmp_path = path + '.' + str(os.getpid()) + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.lib.format.write_array_header_1_0(f, {'descr': np.lib.format.dtype_to_descr(np.dtype(dtype)),
+                                                 'fortran_order': False, 'shape': shape})
+        for start in range(0, size, block):
+            values = np.fromfile(raw_path, dtype=raw_dtype, count=min(block, size - start),
+                                 offset=start * np.dtype(raw_dtype).itemsize)
+            f.write(values.astype(dtype).tobytes())
+    os.replace(tmp_path, path)
+
+def save_timeseries_cache(path, time_format, cache, stamp):
+    # Function description: parse the csv-file at path with make_datetime in chunks of rows and save it as
+    # arrays that np.load can memory-map: time (datetime64), calendar (year, month, hour and dayofweek as int16)
+    # and the country columns as float32, or int32 if all of them are integers. Only one chunk is in memory
+    # at a time, so series of many weather years can be cached.
+    # The raw and temporary files are named by process, so runs building the same cache do not overwrite or
+    # remove each other's files, and the arrays are moved in place whole.
+    os.makedirs(cache, exist_ok=True)
+    names = ['time', 'calendar', 'values']
+    raw_path = {n: cache + "/" + n + "." + str(os.getpid()) + ".raw" for n in names}
+    raw = {n: open(raw_path[n], 'wb') for n in names}
+    try:
+        rows = 0
+        columns = None
+        integer = True
+        for data in pd.read_csv(path, chunksize=TIMESERIES_CHUNK_ROWS):
+            data = make_datetime(data, time_format)
+            if columns is None:
+                columns = [c for c in data.columns if c not in TIME_COLUMNS]
+            integer = integer and all(data[c].dtype.kind in 'iu' for c in columns)
+            raw['time'].write(data['time'].to_numpy(dtype='datetime64[s]').tobytes())
+            raw['calendar'].write(data[['year', 'month', 'hour', 'dayofweek']].to_numpy(dtype=np.int16).tobytes())
+            raw['values'].write(data[columns].to_numpy(dtype=np.float64).tobytes())
+            rows += len(data)
+        for f in raw.values():
+            f.close()
+        write_npy(cache + "/time.npy", raw_path['time'], 'datetime64[s]', 'datetime64[s]', (rows,))
+        write_npy(cache + "/calendar.npy", raw_path['calendar'], np.int16, np.int16, (rows, 4))
+        write_npy(cache + "/values.npy", raw_path['values'], np.float64,
+                  np.int32 if integer else np.float32, (rows, len(columns)))
+    finally:
+        for n in names:
+            raw[n].close()
+            if os.path.exists(raw_path[n]):
+                os.remove(raw_path[n])
+    # The stamp is written last, an interrupted save is rebuilt on the next run
+    write_json(cache + "/columns.json", dict(stamp, columns=columns))
+
+def read_timeseries_cache(cache, stamp):
+    # Function description: open a cache saved by save_timeseries_cache if it was made from the same source file
+    # Output: frame laid out like the output of make_datetime, or None if there is no up-to-date or readable cache
+    try:
+        with open(cache + "/columns.json") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    columns = meta.pop('columns')
+    if meta != stamp:
+        return None
+    try:
+        values = np.load(cache + "/values.npy", mmap_mode='r')
+        calendar = np.load(cache + "/calendar.npy", mmap_mode='r')
+        time = np.load(cache + "/time.npy", mmap_mode='r')
+    except (OSError, ValueError):
+        return None
+    if values.shape != (len(time), len(columns)) or calendar.shape != (len(time), 4):
+        return None
+    data = pd.DataFrame(values, columns=columns, copy=False)
+    data.insert(0, 'time', time)
+    for ind, c in enumerate(['year', 'month', 'hour', 'dayofweek']):
+        data[c] = calendar[:, ind]
+    return data
+
+def load_timeseries(filepath, name, time_format):
+    # Function description: raw time series filepath/name with the year, month, hour and dayofweek columns of
+    # make_datetime. The first run parses the csv-file and saves the result in the timeseries_cache folder,
+    # later runs memory-map the cache as long as the csv-file is unchanged. A folder that cannot be written
+    # to is parsed every time.
+    path = filepath + "/" + name
+    cache = timeseries_cache_path(filepath, name)
+    stamp = source_stamp(path, time_format)
+    data = read_timeseries_cache(cache, stamp)
+    if data is not None:
+        return data
+    try:
+        save_timeseries_cache(path, time_format, cache, stamp)
+    except OSError as e:
+        print("Could not cache " + path + ": " + str(e))
+        return make_datetime(pd.read_csv(path), time_format)
+    data = read_timeseries_cache(cache, stamp)
+    if data is None:
+        # replaced in the meantime by a run that read another version of the csv-file
+        return make_datetime(pd.read_csv(path), time_format)
+    return data
+
+def row_index(keys):
+    # Function description: rows of every key, in the order they have in the data
+    # Output: dict key -> array of row numbers
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+    starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+    stops = np.r_[starts[1:], len(keys)]
+    return {int(k): order[a:b] for k, a, b in zip(sorted_keys[starts], starts, stops)}
+
+class TimeCube:
+    # The raw time series of all datasets (see load_timeseries) aligned on their common hourly timeline in one
+    # time x dataset x country array, with the rows of every (year, month) and every year computed once. A
+    # sample window is cut out once for all datasets (see window) and every dataset takes its countries
+    # from it (see TimeSeries).
+    # With a cache folder the array is built there one chunk of rows at a time and memory-mapped, so only the
+    # windows that are sampled are read; it is reused as long as the stamp of the raw series is unchanged.
+
+    def __init__(self, data, cache=None, stamp=None):
+        # Input: data: dict dataset -> raw time series, all with the same timestamps
+        self.names = list(data)
+        first = self.names[0]
+        self.columns = {name: [c for c in data[name].columns if c not in TIME_COLUMNS] for name in self.names}
+        self.countries = []
+        for name in self.names:
+            self.countries += [c for c in self.columns[name] if c not in self.countries]
+        # float32 holds the integer series (loads) exactly as well, every dataset is taken in its own dtype
+        self.dtypes = {name: np.result_type(*data[name].dtypes[self.columns[name]]) for name in self.names}
+
+        self.hour = data[first]['hour'].to_numpy()
+        self.dayofweek = data[first]['dayofweek'].to_numpy()
+        year = data[first]['year'].to_numpy().astype(np.int64)
+        month = data[first]['month'].to_numpy().astype(np.int64)
+        self.months = row_index(year * 100 + month)
+        self.years = row_index(year)
+        # The years the samples are drawn from: those with a complete year of hours
+        self.sample_years = [y for y, rows in sorted(self.years.items()) if len(rows) >= 8760]
+        # Windows cut out for all datasets (see window), the last regular one and the peak ones
+        self.windows = {}
+
+        meta = {'stamp': stamp, 'columns': self.columns}
+        if cache is not None and self.read_cache(cache, meta):
+            return
+        self.check_alignment(data)
+        shape = (len(self.hour), len(self.names), len(self.countries))
+        if cache is not None:
+            try:
+                os.makedirs(cache, exist_ok=True)
+                tmp_path = cache + "/values." + str(os.getpid()) + ".tmp"
+                values = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.float32, shape=shape)
+                self.fill(values, data)
+                values.flush()
+                del values
+                os.replace(tmp_path, cache + "/values.npy")
+                # The stamp is written last, an interrupted build is redone on the next run
+                write_json(cache + "/cube.json", meta)
+                self.read_cache(cache, meta)
+                return
+            except OSError as e:
+                print("Could not cache the aligned time series in " + cache + ": " + str(e))
+        self.values = np.empty(shape, dtype=np.float32)
+        self.fill(self.values, data)
+
+    def check_alignment(self, data):
+        first = self.names[0]
+        time = data[first]['time'].to_numpy()
+        for name in self.names[1:]:
+            other = data[name]['time'].to_numpy()
+            if len(other) != len(time) or not np.array_equal(other, time):
+                if len(other) != len(time):
+                    problem = "{} hours instead of {}".format(len(other), len(time))
+                else:
+                    problem = "first different timestamp " + str(other[np.flatnonzero(other != time)[0]])
+                raise ValueError("The time series " + name + " is not aligned with " + first + ": " + problem)
+
+    def fill(self, values, data):
+        # copy the datasets into values one chunk of rows at a time
+        for start in range(0, len(values), TIMESERIES_CHUNK_ROWS):
+            stop = min(start + TIMESERIES_CHUNK_ROWS, len(values))
+            block = np.full((stop - start,) + values.shape[1:], np.nan, dtype=np.float32)
+            for d, name in enumerate(self.names):
+                block[:, d, [self.countries.index(c) for c in self.columns[name]]] = \
+                    data[name].iloc[start:stop][self.columns[name]].to_numpy()
+            values[start:stop] = block
+
+    def read_cache(self, cache, meta):
+        try:
+            with open(cache + "/cube.json") as f:
+                if json.load(f) != json.loads(json.dumps(meta)):
+                    return False
+            self.values = np.load(cache + "/values.npy", mmap_mode='r')
+        except (OSError, ValueError):
+            return False
+        return True
+
+    def window(self, key, rows):
+        # Function description: values of the given rows for all datasets, kept under key (the last regular
+        # window, and every peak window) so that the datasets sampled from it are cut out once
+        if key not in self.windows:
+            if key[0] == 'regular':
+                self.windows = {k: v for k, v in self.windows.items() if k[0] != 'regular'}
+            self.windows[key] = self.values[rows]
+        return self.windows[key]
+
+class TimeSeries:
+    # One dataset of a TimeCube: its country columns, the timeline and row index of the cube and the
+    # peak hours of every sample year (see peak_samples)
+
+    def __init__(self, cube, name):
+        self.cube = cube
+        self.name = name
+        self.columns = cube.columns[name]
+        self.index = (cube.names.index(name), np.array([cube.countries.index(c) for c in self.columns]))
+        self.dtype = cube.dtypes[name]
+        self.hour = cube.hour
+        self.dayofweek = cube.dayofweek
+        self.months = cube.months
+        self.years = cube.years
+        self.sample_years = cube.sample_years
+        self.peaks = {}
+
+    def take(self, window):
+        # Function description: the countries of this dataset from values of the cube (e.g. a window)
+        return window[:, self.index[0], self.index[1]].astype(self.dtype, copy=False)
+
+    def moments(self):
+        # Function description: mean and standard deviation of every country column, read one chunk of rows at
+        # a time and combined (Chan et al.)
+        # Output: [mean, std]
+        n = 0
+        mean = np.zeros(len(self.columns))
+        m2 = np.zeros(len(self.columns))
+        for start in range(0, len(self.hour), TIMESERIES_CHUNK_ROWS):
+            values = self.take(self.cube.values[start:start + TIMESERIES_CHUNK_ROWS]).astype(np.float64)
+            k = len(values)
+            chunk_mean = values.mean(axis=0)
+            delta = chunk_mean - mean
+            m2 += ((values - chunk_mean) ** 2).sum(axis=0) + delta ** 2 * n * k / (n + k)
+            mean += delta * k / (n + k)
+            n += k
+        return [mean, np.sqrt(m2 / n)]
+
+    def month_rows(self, year, month):
+        return self.months.get(int(year) * 100 + int(month), np.empty(0, dtype=np.int64))
+
+    def year_rows(self, year):
+        return self.years.get(int(year), np.empty(0, dtype=np.int64))
+
+def regular_window(sample_year, sample_month, sample_hour, regularSeasonHours):
+    # Function description: key of the cube window of a regular season sample (see TimeCube.window)
+    return ('regular', int(sample_year), int(sample_month), int(sample_hour), regularSeasonHours)
+
+def peak_window(sample_year, country_sample, overall_sample, peakSeasonHours):
+    # Function description: key of the two cube windows of the peak seasons of a sample year, with 'country' or
+    # 'overall' added (see TimeCube.window)
+    return ('peak', int(sample_year), country_sample, overall_sample, peakSeasonHours)
+
+def sample_block(data, window, startNOnode=None):
+    # Function description: key of the values a sample of data from the given cube window adds to a
+    # ScenarioTable. The values do not depend on the period, scenario or season the window is sampled for, so
+    # they are stored once per key (see ScenarioTable.add).
+    return (data.name, startNOnode) + window
+
 def gather_regular_sample(data, season, seasons, regularSeasonHours,
-                          sample_hour):
-    # data = gather_season(data=data, season=season)
-    data = data.reset_index(drop=True)
-    sample_data = data.iloc[sample_hour:sample_hour + regularSeasonHours,:]
-    
-    # Sort sample_data to start on midnight monday
-    sample_data = sample_data.sort_values(by=['dayofweek','hour'])
-    
-    # Drop non-country columns
-    sample_data = remove_time_index(sample_data)
+                          sample_year, sample_month, sample_hour):
+    key = regular_window(sample_year, sample_month, sample_hour, regularSeasonHours)
+    if key in data.cube.windows:
+        sample_data = data.take(data.cube.windows[key])
+    else:
+        # Rows sample_hour, sample_hour + 1, ... of the sample month
+        rows = data.month_rows(sample_year, sample_month)
+        rows = rows[sample_hour:sample_hour + regularSeasonHours]
+
+        # Sort sample_data to start on midnight monday
+        rows = rows[np.lexsort((data.hour[rows], data.dayofweek[rows]))]
+        sample_data = data.take(data.cube.window(key, rows))
     
     hours = list(range(1 + regularSeasonHours * seasons.index(season),
                        regularSeasonHours * (seasons.index(season) + 1) + 1))
     return [sample_data, hours]
 
-def sample_generator(data, regularSeasonHours, scenario, season, seasons,
-                     period, generator, sample_hour):
+def column_nodes(columns, startNOnode=None):
+    # Function description: nodes a sample of the given country columns is written for. With startNOnode
+    # the NO column is repeated for the price zones NO<startNOnode>..NO5.
+    # Output: [nodes, index of the country column of every node]
+    nodes = []
+    index = []
+    for j, c in enumerate(columns):
+        if c == "NO" and startNOnode is not None:
+            zones = [c + str(i) for i in range(startNOnode, 6)]
+        else:
+            zones = [c]
+        nodes += zones
+        index += [j] * len(zones)
+    return [nodes, index]
+
+def stack_columns(samples, columns, startNOnode=None):
+    # Function description: reshape samples of the same country columns (each an array of hours x countries
+    # and the operational hours it is assigned to) to long format in one go, country by country and
+    # within a country sample by sample
+    # Output: [node, hour, value] columns of the long-format table, node as categorical
+    [nodes, index] = column_nodes(columns, startNOnode)
+    hours = np.concatenate([np.asarray(h, dtype=np.int16) for sample, h in samples])
+    values = np.concatenate([sample[:, index] for sample, h in samples], axis=0)
+    return [pd.Categorical.from_codes(np.repeat(np.arange(len(nodes), dtype=np.int16), len(hours)), nodes),
+            np.tile(hours, len(nodes)),
+            values.T.ravel()]
+
+class ScenarioTable:
+    # Preallocated columns of one stochastic .tab-file for all periods, scenarios and seasons. The samplers
+    # write every sample into the next rows and the long-format table is built once by frame(), so adding
+    # a sample does not copy the samples added before it.
+    # Text columns (nodes, generators, scenarios, seasons) are kept as int16 codes of their categories and
+    # the integer key columns (hours, periods) as int16 where they fit; the values keep their dtype.
+    # The values (last column) of a sample are stored once per block key (see sample_block): a window sampled
+    # again for another period, scenario or season only adds its key columns and refers to the stored values.
+
+    def __init__(self, columns, rows):
+        self.columns = columns
+        self.rows = rows
+        self.size = 0
+        self.data = {}
+        self.categories = {}
+        self.stored = 0  # values stored in the value column
+        self.blocks = {}  # block key -> offset of its values in the value column
+        self.segments = []  # per sample added: [block key, offset, length] of its values
+
+    def category_codes(self, c, values):
+        # codes of text values (a str, array or Categorical) in the categories of column c, adding new ones
+        categories = self.categories.setdefault(c, {})
+        if isinstance(values, str):
+            return categories.setdefault(values, len(categories))
+        if not isinstance(values, pd.Categorical):
+            values = pd.Categorical(values)
+        codes = np.array([categories.setdefault(v, len(categories)) for v in values.categories], dtype=np.int16)
+        if len(categories) > np.iinfo(np.int16).max:
+            raise ValueError("Too many categories in column " + c)
+        return codes[values.codes]
+
+    def add(self, block=None, **values):
+        # block: key of the values, values added before under the same key are not stored again
+        n = max(len(v) for v in values.values() if isinstance(v, (np.ndarray, pd.Categorical)))
+        if self.size + n > self.rows:
+            raise ValueError("More rows sampled than the {} allocated".format(self.rows))
+        offset = self.blocks.get(block) if block is not None else None
+        for c, v in values.items():
+            if c == self.columns[-1]:
+                if offset is not None:
+                    continue
+                row = self.stored
+            else:
+                row = self.size
+            dtype = v.dtype if isinstance(v, (np.ndarray, pd.Categorical)) else np.asarray(v).dtype
+            if isinstance(v, pd.Categorical) or dtype.kind in 'OUS':
+                v = self.category_codes(c, v)
+                dtype = np.dtype(np.int16)
+            elif dtype.kind in 'iu' and c != self.columns[-1]:
+                v = np.asarray(v)
+                if np.iinfo(np.int16).min <= v.min() and v.max() <= np.iinfo(np.int16).max:
+                    dtype = np.dtype(np.int16)
+            column = self.data.get(c)
+            if column is None:
+                column = self.data[c] = np.empty(self.rows, dtype=dtype)
+            elif np.result_type(column.dtype, dtype) != column.dtype:
+                # e.g. a float sample after integer ones, as pd.concat would upcast the column
+                column = self.data[c] = column.astype(np.result_type(column.dtype, dtype))
+            column[row:row + n] = v
+        if offset is None:
+            offset = self.stored
+            self.stored += n
+            if block is not None:
+                self.blocks[block] = offset
+        self.segments.append([block, offset, n])
+        self.size += n
+
+    def column(self, c, rename=None):
+        # column c of the rows added, text columns as categorical with the categories renamed by rename
+        if c == self.columns[-1]:
+            return expand_blocks(self.data[c], np.array([[offset, n] for block, offset, n in self.segments],
+                                                        dtype=np.int64))
+        values = self.data[c][:self.size]
+        if c not in self.categories:
+            return values
+        categories = list(self.categories[c])
+        if rename is not None:
+            categories = [rename.get(category, category) for category in categories]
+        # renaming may map several categories to the same name
+        [names, codes] = np.unique(np.array(categories, dtype=object), return_inverse=True)
+        return pd.Categorical.from_codes(codes.astype(np.int16)[values], names)
+
+    def value_blocks(self):
+        # Function description: the values of the rows added as (block key, values) per sample, for
+        # reader.save_tab and reader.TabWriter to store the values of a block once
+        return [(block, self.data[self.columns[-1]][offset:offset + n]) for block, offset, n in self.segments]
+
+    def append(self, other):
+        # Function description: add the rows of another ScenarioTable, e.g. one sampled in a worker process,
+        # keeping its blocks
+        columns = {c: other.column(c) for c in other.data if c != other.columns[-1]}
+        row = 0
+        for block, offset, n in other.segments:
+            values = {c: v[row:row + n] for c, v in columns.items()}
+            values[other.columns[-1]] = other.data[other.columns[-1]][offset:offset + n]
+            self.add(block, **values)
+            row += n
+
+    def frame(self, renames=None):
+        # Function description: the long-format table of the rows added
+        # Input: renames: column -> dict of category names to replace, e.g. {"Node": dict_countries}
+        if renames is None:
+            renames = {}
+        return pd.DataFrame({c: self.column(c, renames.get(c)) if c in self.data else np.empty(0, dtype=object)
+                             for c in self.columns})
+
+def sample_rows(data, hours, startNOnode=None):
+    # Function description: rows the samples of data take in a ScenarioTable, for the given number of hours
+    columns = [c for c in data.columns if c not in TIME_COLUMNS]
+    return hours * len(column_nodes(columns, startNOnode)[0])
+
+def join_sampling_key(sampling_key, Periods, scenarios, seasons):
+    # Function description: join the sampling key once with every (period, scenario, season) of the run, the
+    # peak seasons included as season 'peak'
+    # Output: dict (period, scenario, season) -> [year, month, hour]
+    duplicated = sampling_key[sampling_key.duplicated(['Period', 'Scenario', 'Season'], keep=False)]
+    if not duplicated.empty:
+        keys = duplicated[['Period', 'Scenario', 'Season']].drop_duplicates().itertuples(index=False, name=None)
+        # rows numbered as in the csv-file, the header being row 1
+        raise ValueError("sampling_key.csv has more than one sample for (Period, Scenario, Season) " +
+                         ", ".join(str(k) for k in keys) +
+                         " (rows " + ", ".join(str(r + 2) for r in duplicated.index) + ")")
+    samples = pd.MultiIndex.from_product(
+        [range(1, Periods + 1), range(1, scenarios + 1), list(seasons) + ['peak']],
+        names=['Period', 'Scenario', 'Season']).to_frame(index=False)
+    samples = samples.merge(sampling_key, on=['Period', 'Scenario', 'Season'], how='left',
+                            validate='one_to_one')
+    missing = samples[samples['Year'].isna()]
+    if not missing.empty:
+        raise ValueError("sampling_key.csv has no sample for (Period, Scenario, Season) " +
+                         ", ".join(str(k) for k in missing[['Period', 'Scenario', 'Season']].itertuples(index=False, name=None)))
+    return dict(zip(zip(samples['Period'], samples['Scenario'], samples['Season']),
+                    samples[['Year', 'Month', 'Hour']].astype(int).values.tolist()))
+
+def sample_generator(table, data, regularSeasonHours, scenario, season, seasons,
+                     period, generator, sample_year, sample_month, sample_hour):
     [sample_data, hours] = gather_regular_sample(data, season, seasons,
                                                  regularSeasonHours,
+                                                 sample_year, sample_month,
                                                  sample_hour)
-    generator_data = pd.DataFrame()
     if generator=='Windoffshoregrounded' or generator=='Windoffshorefloating':
         startNOnode = 2
     else:
         startNOnode = 1
-    for c in sample_data.columns:
-        if c == "NO":
-            for i in range(startNOnode, 6):
-                c_no = c + str(i)
-                df = pd.DataFrame(
-                    data={'Node': c_no, "IntermitentGenerators": generator,
-                          "Operationalhour": hours,
-                          "Scenario": "scenario" + str(scenario),
-                          "Period": period,
-                          "GeneratorStochasticAvailabilityRaw": 
-                              sample_data[c].values})
-                generator_data = pd.concat([generator_data,df], ignore_index=True)
-        else:
-            df = pd.DataFrame(
-                data={'Node': c, "IntermitentGenerators": generator,
-                      "Operationalhour": hours,
-                      "Scenario": "scenario" + str(scenario),
-                      "Period": period,
-                      "GeneratorStochasticAvailabilityRaw": 
-                          sample_data[c].values})
-            generator_data = pd.concat([generator_data,df], ignore_index=True)
-    return generator_data
-
-def sample_hydro(data, regularSeasonHours, scenario, season,
-                 seasons, period, sample_hour):
+    [node, hour, value] = stack_columns([(sample_data, hours)],
+                                        data.columns, startNOnode)
+    block = sample_block(data, regular_window(sample_year, sample_month, sample_hour, regularSeasonHours),
+                         startNOnode)
+    table.add(block, Node=node, IntermitentGenerators=generator,
+              Operationalhour=hour,
+              Scenario="scenario" + str(scenario),
+              Period=period,
+              GeneratorStochasticAvailabilityRaw=value)
+
+def sample_hydro(table, data, regularSeasonHours, scenario, season,
+                 seasons, period, sample_year, sample_month, sample_hour):
     [sample_data, hours] = gather_regular_sample(data, season, seasons,
                                                  regularSeasonHours,
+                                                 sample_year, sample_month,
                                                  sample_hour)
-    hydro_data = pd.DataFrame()
-    for c in sample_data.columns:
-        if c != 'time':
-            df = pd.DataFrame(
-                data={'Node': c, "Period": period, "Season": season,
-                      "Operationalhour": hours, 
-                      "Scenario": "scenario" + str(scenario),
-                      "HydroGeneratorMaxSeasonalProduction": 
-                          sample_data[c].values})
-            hydro_data = pd.concat([hydro_data,df], ignore_index=True)
-    return hydro_data
-
-def sample_load(data, regularSeasonHours, scenario, season, seasons,
-                period, sample_hour):
+    [node, hour, value] = stack_columns([(sample_data, hours)],
+                                        data.columns)
+    block = sample_block(data, regular_window(sample_year, sample_month, sample_hour, regularSeasonHours))
+    table.add(block, Node=node, Period=period, Season=season,
+              Operationalhour=hour,
+              Scenario="scenario" + str(scenario),
+              HydroGeneratorMaxSeasonalProduction=value)
+
+def sample_load(table, data, regularSeasonHours, scenario, season, seasons,
+                period, sample_year, sample_month, sample_hour):
     [sample_data, hours] = gather_regular_sample(data, season, seasons,
                                                  regularSeasonHours,
+                                                 sample_year, sample_month,
                                                  sample_hour)
-    load = pd.DataFrame()
-    for c in sample_data.columns:
-        if c != 'time':
-            df = pd.DataFrame(
-                data={'Node': c, "Period": period, "Operationalhour": hours,
-                      "Scenario": "scenario" + str(scenario),
-                      "ElectricLoadRaw_in_MW": sample_data[c].values})
-            load = pd.concat([load,df], ignore_index=True)
-    return load
+    [node, hour, value] = stack_columns([(sample_data, hours)],
+                                        data.columns)
+    block = sample_block(data, regular_window(sample_year, sample_month, sample_hour, regularSeasonHours))
+    table.add(block, Node=node, Period=period, Operationalhour=hour,
+              Scenario="scenario" + str(scenario),
+              ElectricLoadRaw_in_MW=value)
+
+def peak_samples(data, sample_year):
+    # Function description: peak hours of the electric load in the sample year, as positions within that year
+    # Output: [overall_sample, country_sample]
+    if sample_year not in data.peaks:
+        load = data.take(data.cube.values[data.year_rows(sample_year)])
+        #Peak1: The highest load when all loads are summed together
+        overall_sample = int(np.argmax(load.sum(axis=1)))
+        #Peak2: The highest load of a single country
+        max_load_country = int(np.argmax(load.max(axis=0)))
+        country_sample = int(np.argmax(load[:, max_load_country]))
+        data.peaks[sample_year] = [overall_sample, country_sample]
+    return data.peaks[sample_year]
 
 def gather_peak_sample(data, seasons, regularSeasonHours, peakSeasonHours,
-                       country_sample, overall_sample):
-    data = data.reset_index(drop=True)
-    country_peak = data.iloc[
-        int(country_sample - (peakSeasonHours/2)):int(
-            country_sample + (peakSeasonHours/2)),
-        :]
-    overall_peak = data.iloc[
-        int(overall_sample - (peakSeasonHours/2)):int(
-            overall_sample + (peakSeasonHours/2)),
-        :]
-    
-    # Sort data to start on midnight 
-    country_peak = country_peak.sort_values(by=['hour'])
-    overall_peak = overall_peak.sort_values(by=['hour'])
-    
-    # Drop non-country columns
-    country_peak = remove_time_index(country_peak)
-    overall_peak = remove_time_index(overall_peak)
+                       country_sample, overall_sample, sample_year):
+    window = peak_window(sample_year, country_sample, overall_sample, peakSeasonHours)
+    if window + ('country',) not in data.cube.windows:
+        rows = data.year_rows(sample_year)
+        country_peak = rows[
+            int(country_sample - (peakSeasonHours/2)):int(
+                country_sample + (peakSeasonHours/2))]
+        overall_peak = rows[
+            int(overall_sample - (peakSeasonHours/2)):int(
+                overall_sample + (peakSeasonHours/2))]
+
+        # Sort data to start on midnight
+        data.cube.window(window + ('country',), country_peak[np.argsort(data.hour[country_peak], kind='quicksort')])
+        data.cube.window(window + ('overall',), overall_peak[np.argsort(data.hour[overall_peak], kind='quicksort')])
+    country_peak = data.take(data.cube.windows[window + ('country',)])
+    overall_peak = data.take(data.cube.windows[window + ('overall',)])
     
     country_hours = list(
         range(1 + regularSeasonHours * len(seasons),
@@ -164,457 +610,755 @@ def gather_peak_sample(data, seasons, regularSeasonHours, peakSeasonHours,
         )
     return [country_peak, overall_peak, country_hours, overall_hours]
 
-def sample_hydro_peak(data, seasons, scenario, period, regularSeasonHours,
-                      peakSeasonHours, overall_sample, country_sample):
-    peak_data = pd.DataFrame()
+def sample_hydro_peak(table, data, seasons, scenario, period, regularSeasonHours,
+                      peakSeasonHours, overall_sample, country_sample, sample_year):
     [country_peak, overall_peak,
      country_hours, overall_hours] = gather_peak_sample(data, seasons,
                                                         regularSeasonHours,
                                                         peakSeasonHours,
                                                         country_sample,
-                                                        overall_sample)
-    for c in country_peak.columns:
-        df = pd.DataFrame(
-            data={'Node': c, "Period": period, "Season": "peak1",
-                  "Operationalhour": country_hours,
-                  "Scenario": "scenario" + str(scenario),
-                  "HydroGeneratorMaxSeasonalProduction": 
-                      country_peak[c].values})
-        peak_data = pd.concat([peak_data,df], ignore_index=True)
-        df = pd.DataFrame(
-            data={'Node': c, "Period": period, "Season": "peak2",
-                  "Operationalhour": overall_hours,
-                  "Scenario": "scenario" + str(scenario),
-                  "HydroGeneratorMaxSeasonalProduction": 
-                      overall_peak[c].values})
-        peak_data = pd.concat([peak_data,df], ignore_index=True)
-    return peak_data
-
-def sample_load_peak(data, seasons, scenario, period, regularSeasonHours,
-                     peakSeasonHours, overall_sample, country_sample):
-    peak_data = pd.DataFrame()
+                                                        overall_sample,
+                                                        sample_year)
+    [node, hour, value] = stack_columns([(country_peak, country_hours),
+                                         (overall_peak, overall_hours)],
+                                        data.columns)
+    season = pd.Categorical.from_codes(np.tile(np.repeat(np.array([0, 1], dtype=np.int16),
+                                                         [len(country_hours), len(overall_hours)]),
+                                               len(data.columns)), ["peak1", "peak2"])
+    block = sample_block(data, peak_window(sample_year, country_sample, overall_sample, peakSeasonHours))
+    table.add(block, Node=node, Period=period, Season=season,
+              Operationalhour=hour,
+              Scenario="scenario" + str(scenario),
+              HydroGeneratorMaxSeasonalProduction=value)
+
+def sample_load_peak(table, data, seasons, scenario, period, regularSeasonHours,
+                     peakSeasonHours, overall_sample, country_sample, sample_year):
     [country_peak, overall_peak,
      country_hours, overall_hours] = gather_peak_sample(data, seasons,
                                                         regularSeasonHours, 
                                                         peakSeasonHours, 
                                                         country_sample,
-                                                        overall_sample)
-    for c in country_peak.columns:
-        df = pd.DataFrame(
-            data={'Node': c, "Period": period, 
-                  "Operationalhour": country_hours,
-                  "Scenario": "scenario" + str(scenario),
-                  "ElectricLoadRaw_in_MW": country_peak[c].values})
-        peak_data = pd.concat([peak_data,df], ignore_index=True)
-        df = pd.DataFrame(
-            data={'Node': c, "Period": period, 
-                  "Operationalhour": overall_hours,
-                  "Scenario": "scenario" + str(scenario),
-                  "ElectricLoadRaw_in_MW": overall_peak[c].values})
-        peak_data = pd.concat([peak_data,df], ignore_index=True)
-    return peak_data
-
-def sample_generator_peak(data, seasons, g, scenario,
+                                                        overall_sample,
+                                                        sample_year)
+    [node, hour, value] = stack_columns([(country_peak, country_hours),
+                                         (overall_peak, overall_hours)],
+                                        data.columns)
+    block = sample_block(data, peak_window(sample_year, country_sample, overall_sample, peakSeasonHours))
+    table.add(block, Node=node, Period=period, 
+              Operationalhour=hour,
+              Scenario="scenario" + str(scenario),
+              ElectricLoadRaw_in_MW=value)
+
+def sample_generator_peak(table, data, seasons, g, scenario,
                           period, regularSeasonHours, peakSeasonHours,
-                          overall_sample, country_sample):
-    peak_data = pd.DataFrame()
+                          overall_sample, country_sample, sample_year):
     [country_peak, overall_peak,
      country_hours, overall_hours] = gather_peak_sample(data, seasons,
                                                         regularSeasonHours,
                                                         peakSeasonHours, 
                                                         country_sample, 
-                                                        overall_sample)
+                                                        overall_sample,
+                                                        sample_year)
     if g=='Windoffshoregrounded' or g=='Windoffshorefloating':
         startNOnode = 2
     else:
         startNOnode = 1
-    for c in country_peak.columns:
-        if c == "NO":
-            for i in range(startNOnode, 6):
-                c_no = c + str(i)
-                df = pd.DataFrame(
-                data={'Node': c_no, "IntermitentGenerators": g,
-                      "Operationalhour": country_hours,
-                      "Scenario": "scenario" + str(scenario),
-                      "Period": period, 
-                      "GeneratorStochasticAvailabilityRaw": 
-                          country_peak[c].values})
-                peak_data = pd.concat([peak_data,df], ignore_index=True)
-                df = pd.DataFrame(
-                data={'Node': c_no, "IntermitentGenerators": g, 
-                      "Operationalhour": overall_hours, 
-                      "Scenario": "scenario" + str(scenario),
-                      "Period": period, 
-                      "GeneratorStochasticAvailabilityRaw": 
-                          overall_peak[c].values})
-                peak_data = pd.concat([peak_data,df], ignore_index=True)
-        else:
-            df = pd.DataFrame(
-            data={'Node': c, "IntermitentGenerators": g, 
-                  "Operationalhour": country_hours, 
-                  "Scenario": "scenario" + str(scenario),
-                  "Period": period,
-                  "GeneratorStochasticAvailabilityRaw": 
-                      country_peak[c].values})
-            peak_data = pd.concat([peak_data,df], ignore_index=True)
-            df = pd.DataFrame(
-            data={'Node': c, "IntermitentGenerators": g, 
-                  "Operationalhour": overall_hours,
-                  "Scenario": "scenario" + str(scenario),
-                  "Period": period,
-                 "GeneratorStochasticAvailabilityRaw": 
-                     overall_peak[c].values})
-            peak_data = pd.concat([peak_data,df], ignore_index=True)
-    return peak_data
-
-def generate_random_scenario(filepath, tab_file_path, scenarios, seasons,
-                             Periods, regularSeasonHours, peakSeasonHours, 
-                             dict_countries,HEATMODULE=False,
-                             fix_sample=False):
-    
-    if fix_sample:
-        print("Generating scenarios according to key...")
-    else:
-        print("Generating random scenarios...")
+    [node, hour, value] = stack_columns([(country_peak, country_hours),
+                                         (overall_peak, overall_hours)],
+                                        data.columns, startNOnode)
+    block = sample_block(data, peak_window(sample_year, country_sample, overall_sample, peakSeasonHours),
+                         startNOnode)
+    table.add(block, Node=node, IntermitentGenerators=g, 
+              Operationalhour=hour, 
+              Scenario="scenario" + str(scenario),
+              Period=period,
+              GeneratorStochasticAvailabilityRaw=value)
 
-    # Generate dataframes to print as stochastic-files
-    genAvail = pd.DataFrame()
-    elecLoad = pd.DataFrame()
-    hydroSeasonal = pd.DataFrame()
+def load_scenario_data(filepath, HEATMODULE=False):
+    # Function description: load all the raw scenario data (parsed once and cached, see load_timeseries) and
+    # align them on one timeline (see TimeCube)
+    # Output: dict dataset -> TimeSeries
+    sources = {'solar': ["solar.csv", "%d/%m/%Y %H:%M"],
+               'windonshore': ["windonshore.csv", "%d/%m/%Y %H:%M"],
+               'windoffshore': ["windoffshore.csv", "%d/%m/%Y %H:%M"],
+               'hydroror': ["hydroror.csv", "%Y-%m-%d %H:%M"],
+               'hydroseasonal': ["hydroseasonal.csv", "%Y-%m-%d %H:%M"],
+               'electricload': ["electricload.csv", "%d/%m/%Y %H:%M"]}
 
     if HEATMODULE:
-        heatLoad = pd.DataFrame()
-        cop = pd.DataFrame()
-    
-    # Load all the raw scenario data
-    solar_data = pd.read_csv(filepath + "/solar.csv")
-    windonshore_data = pd.read_csv(filepath + "/windonshore.csv")
-    windoffshore_data = pd.read_csv(filepath + "/windoffshore.csv")
-    hydrorunoftheriver_data = pd.read_csv(filepath + "/hydroror.csv")
-    hydroseasonal_data = pd.read_csv(filepath + "/hydroseasonal.csv")
-    electricload_data = pd.read_csv(filepath + "/electricload.csv")
+        sources['heatload'] = ["HeatModule/heatload.csv", "%Y-%m-%d %H:%M"]
+        sources['cop'] = ["HeatModule/cop_ashp.csv", "%Y-%m-%d %H:%M"]
 
-    if HEATMODULE:
-        heatload_data = pd.read_csv(filepath + "/HeatModule/heatload.csv")
-        cop_data = pd.read_csv(filepath + "/HeatModule/cop_ashp.csv")
+    data = {name: load_timeseries(filepath, source, time_format) for name, [source, time_format] in sources.items()}
+
+    # The aligned time series are cached for this selection of datasets
+    stamp = {name: source_stamp(filepath + "/" + source, time_format) for name, [source, time_format] in sources.items()}
+    cube = TimeCube(data, timeseries_cache_path(filepath, "cube_" + "_".join(sources)), stamp)
+    return {name: TimeSeries(cube, name) for name in data}
+
+# Node names of the country columns of the raw time series in the full dataset (the dict_countries of
+# generate_random_scenario)
+DICT_COUNTRIES = {"AT": "Austria", "BA": "BosniaH", "BE": "Belgium",
+                 "BG": "Bulgaria", "CH": "Switzerland", "CZ": "CzechR",
+                 "DE": "Germany", "DK": "Denmark", "EE": "Estonia",
+                 "ES": "Spain", "FI": "Finland", "FR": "France",
+                 "GB": "GreatBrit.", "GR": "Greece", "HR": "Croatia",
+                 "HU": "Hungary", "IE": "Ireland", "IT": "Italy",
+                 "LT": "Lithuania", "LU": "Luxemb.", "LV": "Latvia",
+                 "MK": "Macedonia", "NL": "Netherlands", "NO": "Norway",
+                 "PL": "Poland", "PT": "Portugal", "RO": "Romania",
+                 "RS": "Serbia", "SE": "Sweden", "SI": "Slovenia",
+                 "SK": "Slovakia", "MF": "MorayFirth", "FF": "FirthofForth",
+                 "DB": "DoggerBank", "HS": "Hornsea", "OD": "OuterDowsing",
+                 "NF": "Norfolk", "EA": "EastAnglia", "BS": "Borssele",
+                 "HK": "HollandseeKust", "HB": "HelgoländerBucht", "NS": "Nordsøen",
+                 "UN": "UtsiraNord", "SN1": "SørligeNordsjøI", "SN2": "SørligeNordsjøII",
+                 "EHGB":"Energyhub Great Britain", "EHNO": "Energyhub Norway",
+                 "EHEU": "Energyhub EU"}
+
+# Stochastic-files written by generate_random_scenario, with their header
+STOCHASTIC_FILES = {'genAvail': "Stochastic_StochasticAvailability.tab",
+                    'elecLoad': "Stochastic_ElectricLoadRaw.tab",
+                    'hydroSeasonal': "Stochastic_HydroGenMaxSeasonalProduction.tab",
+                    'heatLoad': "HeatModule/HeatModuleStochastic_HeatLoadRaw.tab",
+                    'cop': "HeatModule/HeatModuleStochastic_ConverterAvail.tab"}
+STOCHASTIC_COLUMNS = {'genAvail': ["Node", "IntermitentGenerators", "Operationalhour",
+                                   "Scenario", "Period", "GeneratorStochasticAvailabilityRaw"],
+                      'elecLoad': ["Node", "Operationalhour", "Scenario", "Period",
+                                   "ElectricLoadRaw_in_MW"],
+                      'hydroSeasonal': ["Node", "Period", "Season", "Operationalhour",
+                                        "Scenario", "HydroGeneratorMaxSeasonalProduction"],
+                      'heatLoad': ["Node", "Operationalhour", "Scenario", "Period",
+                                   "ElectricLoadRaw_in_MW"],
+                      'cop': ["Node", "IntermitentGenerators", "Operationalhour",
+                              "Scenario", "Period", "GeneratorStochasticAvailabilityRaw"]}
 
-    solar_data = make_datetime(solar_data, "%d/%m/%Y %H:%M")
-    windonshore_data = make_datetime(windonshore_data, "%d/%m/%Y %H:%M")
-    windoffshore_data = make_datetime(windoffshore_data, "%d/%m/%Y %H:%M")
-    hydroror_data = make_datetime(hydrorunoftheriver_data, "%Y-%m-%d %H:%M")
-    hydroseasonal_data = make_datetime(hydroseasonal_data, "%Y-%m-%d %H:%M")
-    electricload_data = make_datetime(electricload_data, "%d/%m/%Y %H:%M")
+def scenario_tables(data, hours, HEATMODULE=False):
+    # Function description: allocate the stochastic-files for the given number of sampled hours
+    # Output: dict table name -> ScenarioTable
+    tables = {'genAvail': ScenarioTable(STOCHASTIC_COLUMNS['genAvail'],
+                                        sample_rows(data['solar'], hours, 1) +
+                                        sample_rows(data['windonshore'], hours, 1) +
+                                        2 * sample_rows(data['windoffshore'], hours, 2) +
+                                        sample_rows(data['hydroror'], hours, 1)),
+              'elecLoad': ScenarioTable(STOCHASTIC_COLUMNS['elecLoad'],
+                                        sample_rows(data['electricload'], hours)),
+              'hydroSeasonal': ScenarioTable(STOCHASTIC_COLUMNS['hydroSeasonal'],
+                                             sample_rows(data['hydroseasonal'], hours))}
 
     if HEATMODULE:
-        heatload_data = make_datetime(heatload_data, "%Y-%m-%d %H:%M")
-        cop_data = make_datetime(cop_data, "%Y-%m-%d %H:%M")
+        tables['heatLoad'] = ScenarioTable(STOCHASTIC_COLUMNS['heatLoad'],
+                                           sample_rows(data['heatload'], hours))
+        tables['cop'] = ScenarioTable(STOCHASTIC_COLUMNS['cop'],
+                                      sample_rows(data['cop'], hours, 1))
+    return tables
 
-    if fix_sample:
-        sampling_key = pd.read_csv(filepath + "/sampling_key.csv")
-        sampling_key = sampling_key.set_index(['Period','Scenario','Season'])
-    else:
-        sampling_key = pd.DataFrame(columns=['Period','Scenario','Season','Year','Month','Hour'])
+def scenario_rng(seed, period, scenario):
+    # Function description: random generator of one period and scenario, derived from the master seed and
+    # (period, scenario) only, so a sample does not depend on the order the samples are drawn in or on the
+    # number of workers
+    return np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(period, scenario)))
+
+def random_key(data, i, scenario, seasons, regularSeasonHours, seed):
+    # Function description: draw the random samples of period i and one scenario with its own generator
+    # Output: dict (period, scenario, season) -> [year, month, hour], as join_sampling_key
+    rng = scenario_rng(seed, i, scenario)
+    key = {}
+    for s in seasons:
+        # Get sample year (the complete years of the data, 2015-2019) and month for each season/scenario
+        sample_year = rng.choice(data['solar'].sample_years)
+        sample_month = rng.choice(season_month(s))
+        sample_hour = rng.integers(0, len(data['solar'].month_rows(sample_year, sample_month)) - regularSeasonHours - 1)
+        key[(i, scenario, s)] = [sample_year, sample_month, sample_hour]
 
+    # Get peak sample year
+    key[(i, scenario, 'peak')] = [rng.choice(data['solar'].sample_years), 0, 0]
+    return key
+
+def key_rows(key):
+    # Function description: rows of sampling_key.csv of the samples in key
+    return [{'Period': i, 'Scenario': scenario, 'Season': s,
+             'Year': sample_year, 'Month': sample_month, 'Hour': sample_hour}
+            for (i, scenario, s), [sample_year, sample_month, sample_hour] in key.items()]
+
+def sliced_latin_hypercube(rng, Periods, scenarios):
+    # Function description: one dimension of a sliced Latin hypercube: the Periods x scenarios draws fall in
+    # different strata of [0, 1), and the scenarios of every period also each fall in a different one of
+    # scenarios coarser strata
+    # Output: array of draws in [0, 1), row i - 1 holding the scenarios of period i
+    fine = [rng.permutation(Periods) for c in range(scenarios)]
+    strata = np.empty((Periods, scenarios))
+    for i in range(Periods):
+        for j, c in enumerate(rng.permutation(scenarios)):
+            strata[i, j] = c * Periods + fine[c][i]
+    return (strata + rng.random((Periods, scenarios))) / (Periods * scenarios)
+
+def stratified_key(data, Periods, scenarios, seasons, regularSeasonHours, seed):
+    # Function description: sampling key with the sample years, months and hours of every season spread over
+    # all periods and scenarios, and over the scenarios of each period, by sliced Latin hypercube sampling
+    # instead of independent draws. The hour is drawn as a fraction of the possible window starts of the month.
+    # Output: dict (period, scenario, season) -> [year, month, hour], as join_sampling_key
+    years = data['solar'].sample_years
+    samples = {}
+    for s in list(seasons) + ['peak']:
+        # period 0 is not sampled, so these generators are independent of those of the scenarios
+        rng = scenario_rng(seed, 0, (list(seasons) + ['peak']).index(s))
+        year = sliced_latin_hypercube(rng, Periods, scenarios)
+        if s == 'peak':
+            samples[s] = [[[years[int(year[i, j] * len(years))], 0, 0] for j in range(scenarios)]
+                          for i in range(Periods)]
+            continue
+        month = sliced_latin_hypercube(rng, Periods, scenarios)
+        hour = sliced_latin_hypercube(rng, Periods, scenarios)
+        samples[s] = []
+        for i in range(Periods):
+            samples[s].append([])
+            for j in range(scenarios):
+                sample_year = years[int(year[i, j] * len(years))]
+                sample_month = season_month(s)[int(month[i, j] * len(season_month(s)))]
+                windows = len(data['solar'].month_rows(sample_year, sample_month)) - regularSeasonHours - 1
+                samples[s][i].append([sample_year, sample_month, int(hour[i, j] * windows)])
+    key = {}
     for i in range(1,Periods+1):
         for scenario in range(1,scenarios+1):
-            for s in seasons:
-                ###################
-                ##REGULAR SEASONS##
-                ###################
-
-                if fix_sample:
-                    sample_year = sampling_key.loc[(i,scenario,s),'Year']
-                    sample_month = sampling_key.loc[(i,scenario,s),'Month']
-                else:
-                     # Get sample year (2015-2019) and month for each season/scenario
-                    sample_year = np.random.choice(list(range(2015,2020)))
-                    sample_month = np.random.choice(season_month(s))
-
-                # Filter out the hours within the sample year
-
-                solar_month = year_month_filter(solar_data,
-                                                        sample_year,
-                                                        sample_month)
-                windonshore_month = year_month_filter(windonshore_data,
-                                                      sample_year,
-                                                      sample_month)
-                windoffshore_month = year_month_filter(windoffshore_data,
-                                                       sample_year,
-                                                       sample_month)
-                hydroror_month = year_month_filter(hydroror_data,
-                                                   sample_year,
-                                                   sample_month)
-                hydroseasonal_month = year_month_filter(hydroseasonal_data,
-                                                        sample_year,
-                                                        sample_month)
-                electricload_month = year_month_filter(electricload_data,
-                                                       sample_year,
-                                                       sample_month)
-
-                if HEATMODULE:
-                    heatload_month = year_month_filter(heatload_data,
-                                                      sample_year,
-                                                      sample_month)
-                    cop_month = year_month_filter(cop_data,
-                                                  sample_year,
-                                                  sample_month)
-                if fix_sample:
-                    sample_hour = sampling_key.loc[(i,scenario,s),'Hour']
-                else:
-                    sample_hour = np.random.randint(0, solar_month.shape[0] - regularSeasonHours - 1)
-                    sampling_key = pd.concat([sampling_key, pd.Series({'Period': i,
-                                                        'Scenario': scenario,
-                                                        'Season': s,
-                                                        'Year': sample_year,
-                                                        'Month': sample_month,
-                                                        'Hour': sample_hour}).to_frame().T],ignore_index=True)
-
-                    # Sample generator availability for regular seasons
-                genAvail = pd.concat([genAvail,
-                                  sample_generator(data=solar_month,
-                                 regularSeasonHours=regularSeasonHours,
-                                 scenario=scenario, season=s,
-                                 seasons=seasons, period=i,
-                                 generator="Solar",
-                                 sample_hour=sample_hour)],ignore_index=True)
-                genAvail = pd.concat([genAvail,
-                                  sample_generator(data=windonshore_month,
-                                 regularSeasonHours=regularSeasonHours,
-                                 scenario=scenario, season=s,
-                                 seasons=seasons, period=i,
-                                 generator="Windonshore",
-                                 sample_hour=sample_hour)],ignore_index=True)
-                genAvail = pd.concat([genAvail,
-                                  sample_generator(data=windoffshore_month,
-                                 regularSeasonHours=regularSeasonHours,
-                                 scenario=scenario, season=s,
-                                 seasons=seasons, period=i,
-                                 generator="Windoffshoregrounded",
-                                 sample_hour=sample_hour)],ignore_index=True)
-                genAvail = pd.concat([genAvail,
-                    sample_generator(data=windoffshore_month,
-                                     regularSeasonHours=regularSeasonHours,
-                                     scenario=scenario, season=s,
-                                     seasons=seasons, period=i,
-                                     generator="Windoffshorefloating",
-                                     sample_hour=sample_hour)],ignore_index=True)
-                genAvail = pd.concat([genAvail,
-                                      sample_generator(data=hydroror_month,
-                                     regularSeasonHours=regularSeasonHours,
-                                     scenario=scenario, season=s,
-                                     seasons=seasons, period=i,
-                                     generator="Hydrorun-of-the-river",
-                                     sample_hour=sample_hour)],ignore_index=True)
-
-                # Sample electric load for regular seasons
-                elecLoad = pd.concat([elecLoad,
-                sample_load(data=electricload_month,
+            for s in list(seasons) + ['peak']:
+                key[(i, scenario, s)] = samples[s][i - 1][scenario - 1]
+    return key
+
+def kmedoids(distances, k, rng, max_iter=100):
+    # Function description: k-medoids clustering of the points with the given pairwise distances, started with
+    # k-medoids++ and improved by alternating between assigning the points and moving every medoid to the
+    # member of its cluster with the least total distance to the other members
+    # Output: [medoids, labels], labels the cluster (position in medoids) of every point
+    n = len(distances)
+    medoids = [int(rng.integers(n))]
+    for _ in range(1, k):
+        weight = distances[:, medoids].min(axis=1) ** 2
+        if weight.sum() > 0:
+            medoids.append(int(rng.choice(n, p=weight / weight.sum())))
+        else:
+            # all points coincide with a medoid
+            medoids.append(int(rng.choice(np.setdiff1d(np.arange(n), medoids))))
+    medoids = np.array(medoids)
+    for _ in range(max_iter):
+        labels = distances[:, medoids].argmin(axis=1)
+        new_medoids = medoids.copy()
+        for j in range(k):
+            members = np.flatnonzero(labels == j)
+            if len(members) > 0:
+                new_medoids[j] = members[distances[np.ix_(members, members)].sum(axis=0).argmin()]
+        if np.array_equal(new_medoids, medoids):
+            break
+        medoids = new_medoids
+    return [medoids, distances[:, medoids].argmin(axis=1)]
+
+def candidate_scenarios(data, Periods, pool, seasons, regularSeasonHours, seed):
+    # Function description: sample a pool of random scenarios (candidate c is drawn as random scenario c,
+    # see random_key) and compare them by the daily means of their regular seasons in all periods, for all
+    # datasets and countries, every column standardized and every dataset weighted equally. The peak seasons
+    # are not compared.
+    # Output: [keys, distances]: the key of every candidate (as join_sampling_key, with scenario c + 1) and
+    # the pairwise distances of the candidates
+    keys = []
+    for c in range(1, pool + 1):
+        key = {}
+        for i in range(1,Periods+1):
+            key.update(random_key(data, i, c, seasons, regularSeasonHours, seed))
+        keys.append(key)
+
+    days = np.arange(0, regularSeasonHours, 24)
+    lengths = np.diff(np.append(days, regularSeasonHours))[:, None]
+    features = []
+    for series in data.values():
+        [mean, scale] = series.moments()
+        scale[scale == 0] = 1
+        profiles = np.stack([np.concatenate([np.add.reduceat(
+            gather_regular_sample(series, s, seasons, regularSeasonHours, *key[(i, c + 1, s)])[0], days, axis=0) / lengths
+            for i in range(1,Periods+1) for s in seasons]) for c, key in enumerate(keys)])
+        profiles = (profiles - mean) / scale
+        features.append(profiles.reshape(pool, -1) / np.sqrt(profiles[0].size))
+    features = np.hstack(features)
+    squares = (features ** 2).sum(axis=1)
+    distances = np.sqrt(np.maximum(squares[:, None] + squares[None, :] - 2 * features @ features.T, 0))
+    return [keys, distances]
+
+def selected_key(keys, selected, Periods, seasons):
+    # Function description: sampling key of the selected candidates (see candidate_scenarios), candidate
+    # selected[j - 1] becoming scenario j
+    key = {}
+    for i in range(1,Periods+1):
+        for scenario, c in enumerate(selected, start=1):
+            for s in list(seasons) + ['peak']:
+                key[(i, scenario, s)] = keys[c][(i, c + 1, s)]
+    return key
+
+def cluster_selection(distances, n, rng):
+    # Function description: cluster the equally likely candidate scenarios with the given pairwise distances
+    # into n clusters with k-medoids and select the medoids, each with the share of the candidates in its
+    # cluster as probability
+    # Output: [selected, probabilities], the medoid of the largest cluster first
+    [medoids, labels] = kmedoids(distances, n, rng)
+    sizes = np.bincount(labels, minlength=n)
+    order = np.argsort(-sizes, kind='stable')
+    return [medoids[order].tolist(), sizes[order] / len(distances)]
+
+def representative_key(data, Periods, scenarios, pool, seasons, regularSeasonHours, seed):
+    # Function description: sample a pool of random scenarios (see candidate_scenarios), cluster them into
+    # the given number of scenarios and take the medoid of every cluster, with all its periods and seasons,
+    # as representative scenario (see cluster_selection)
+    # Output: [key, probabilities], key as join_sampling_key for scenarios 1..scenarios and the probability
+    # of each of them, the share of the pool in its cluster
+    if pool < scenarios:
+        raise ValueError("Cannot cluster a pool of " + str(pool) + " scenarios into " + str(scenarios))
+    [keys, distances] = candidate_scenarios(data, Periods, pool, seasons, regularSeasonHours, seed)
+    # period 0 is not sampled, so this generator is independent of those of the candidates
+    [selected, probabilities] = cluster_selection(distances, scenarios, scenario_rng(seed, 0, 0))
+    print("Representative scenarios " + ", ".join(str(c + 1) for c in selected) + " of a pool of " + str(pool) +
+          " with probabilities " + ", ".join("{:.3f}".format(p) for p in probabilities))
+    return [selected_key(keys, selected, Periods, seasons), probabilities]
+
+def forward_selection(distances, n):
+    # Function description: fast forward selection of n out of the equally likely candidate scenarios with the
+    # given pairwise distances: add one at a time the candidate that most reduces the probability-weighted
+    # distance of all candidates to their nearest selected one, then give every candidate's probability to
+    # the nearest selected one
+    # Output: [selected, probabilities], in order of selection
+    probability = np.full(len(distances), 1 / len(distances))
+    nearest = np.full(len(distances), np.inf)
+    selected = []
+    for _ in range(n):
+        cost = (probability[:, None] * np.minimum(nearest[:, None], distances)).sum(axis=0)
+        cost[selected] = np.inf
+        candidate = int(cost.argmin())
+        selected.append(candidate)
+        nearest = np.minimum(nearest, distances[:, candidate])
+    labels = distances[:, selected].argmin(axis=1)
+    return [selected, np.bincount(labels, weights=probability, minlength=n)]
+
+def reduce_scenarios(data, Periods, scenarios, pool, seasons, regularSeasonHours, seed):
+    # Function description: sample a pool of random scenarios (see candidate_scenarios) and reduce it to the
+    # given number of scenarios by forward selection
+    # Output: [key, probabilities], key as join_sampling_key for scenarios 1..scenarios and the probability
+    # of each of them
+    if pool < scenarios:
+        raise ValueError("Cannot reduce a pool of " + str(pool) + " scenarios to " + str(scenarios))
+    [keys, distances] = candidate_scenarios(data, Periods, pool, seasons, regularSeasonHours, seed)
+    [selected, probabilities] = forward_selection(distances, scenarios)
+    print("Selected scenarios " + ", ".join(str(c + 1) for c in selected) + " of a pool of " + str(pool) +
+          " with probabilities " + ", ".join("{:.3f}".format(p) for p in probabilities))
+    return [selected_key(keys, selected, Periods, seasons), probabilities]
+
+def sample_scenario(data, tables, i, scenario, seasons, regularSeasonHours,
+                    peakSeasonHours, key, HEATMODULE=False):
+    # Function description: sample the regular and peak seasons of period i and one scenario into tables,
+    # taking the sample year, month and hour from key (see random_key and join_sampling_key)
+    solar_data = data['solar']
+    windonshore_data = data['windonshore']
+    windoffshore_data = data['windoffshore']
+    hydroror_data = data['hydroror']
+    hydroseasonal_data = data['hydroseasonal']
+    electricload_data = data['electricload']
+    genAvail = tables['genAvail']
+    elecLoad = tables['elecLoad']
+    hydroSeasonal = tables['hydroSeasonal']
+
+    if HEATMODULE:
+        heatload_data = data['heatload']
+        cop_data = data['cop']
+        heatLoad = tables['heatLoad']
+        cop = tables['cop']
+
+    for s in seasons:
+        ###################
+        ##REGULAR SEASONS##
+        ###################
+
+        [sample_year, sample_month, sample_hour] = key[(i,scenario,s)]
+
+        # Sample generator availability for regular seasons
+        sample_generator(genAvail, data=solar_data,
+                         regularSeasonHours=regularSeasonHours,
+                         scenario=scenario, season=s,
+                         seasons=seasons, period=i,
+                         generator="Solar",
+                         sample_year=sample_year,
+                         sample_month=sample_month,
+                         sample_hour=sample_hour)
+        sample_generator(genAvail, data=windonshore_data,
+                         regularSeasonHours=regularSeasonHours,
+                         scenario=scenario, season=s,
+                         seasons=seasons, period=i,
+                         generator="Windonshore",
+                         sample_year=sample_year,
+                         sample_month=sample_month,
+                         sample_hour=sample_hour)
+        sample_generator(genAvail, data=windoffshore_data,
+                         regularSeasonHours=regularSeasonHours,
+                         scenario=scenario, season=s,
+                         seasons=seasons, period=i,
+                         generator="Windoffshoregrounded",
+                         sample_year=sample_year,
+                         sample_month=sample_month,
+                         sample_hour=sample_hour)
+        sample_generator(genAvail, data=windoffshore_data,
+                             regularSeasonHours=regularSeasonHours,
+                             scenario=scenario, season=s,
+                             seasons=seasons, period=i,
+                             generator="Windoffshorefloating",
+                             sample_year=sample_year,
+                             sample_month=sample_month,
+                             sample_hour=sample_hour)
+        sample_generator(genAvail, data=hydroror_data,
+                             regularSeasonHours=regularSeasonHours,
+                             scenario=scenario, season=s,
+                             seasons=seasons, period=i,
+                             generator="Hydrorun-of-the-river",
+                             sample_year=sample_year,
+                             sample_month=sample_month,
+                             sample_hour=sample_hour)
+
+        # Sample electric load for regular seasons
+        sample_load(elecLoad, data=electricload_data,
+                    regularSeasonHours=regularSeasonHours,
+                    scenario=scenario, season=s,
+                    seasons=seasons, period=i,
+                    sample_year=sample_year,
+                    sample_month=sample_month,
+                    sample_hour=sample_hour)
+
+        # Sample seasonal hydro limit for regular seasons
+        sample_hydro(hydroSeasonal, data=hydroseasonal_data,
+                     regularSeasonHours=regularSeasonHours,
+                     scenario=scenario, season=s,
+                     seasons=seasons, period=i,
+                     sample_year=sample_year,
+                     sample_month=sample_month,
+                     sample_hour=sample_hour)
+
+        # Sample HEATMODULE profiles
+        if HEATMODULE:
+            sample_load(heatLoad, data=heatload_data,
                             regularSeasonHours=regularSeasonHours,
                             scenario=scenario, season=s,
                             seasons=seasons, period=i,
-                            sample_hour=sample_hour)],ignore_index=True)
+                            sample_year=sample_year,
+                            sample_month=sample_month,
+                            sample_hour=sample_hour)
+
+            sample_generator(cop, data=cop_data,
+                                regularSeasonHours=regularSeasonHours,
+                                scenario=scenario, season=s,
+                                seasons=seasons, period=i,
+                                generator="HeatPumpAir",
+                                sample_year=sample_year,
+                                sample_month=sample_month,
+                                sample_hour=sample_hour)
+
+    ################
+    ##PEAK SEASONS##
+    ################
+
+    sample_year = key[(i,scenario,'peak')][0]
+
+    [overall_sample, country_sample] = peak_samples(electricload_data, sample_year)
 
-                # Sample seasonal hydro limit for regular seasons
-                hydroSeasonal = pd.concat([hydroSeasonal,
-                                       sample_hydro(data=hydroseasonal_month,
+    #Sample generator availability for peak seasons
+    sample_generator_peak(genAvail, data=solar_data,
+                              seasons=seasons,
+                              g="Solar", scenario=scenario, period=i,
+                              regularSeasonHours=regularSeasonHours,
+                              peakSeasonHours=peakSeasonHours,
+                              overall_sample=overall_sample,
+                              country_sample=country_sample,
+                              sample_year=sample_year)
+    sample_generator_peak(genAvail, data=windonshore_data,
+                              seasons=seasons, 
+                              g="Windonshore", scenario=scenario, 
+                              period=i, 
+                              regularSeasonHours=regularSeasonHours,
+                              peakSeasonHours=peakSeasonHours,
+                              overall_sample=overall_sample, 
+                              country_sample=country_sample,
+                              sample_year=sample_year)
+    sample_generator_peak(genAvail, data=windoffshore_data,
+                              seasons=seasons, 
+                              g="Windoffshoregrounded", scenario=scenario,
+                              period=i, 
+                              regularSeasonHours=regularSeasonHours, 
+                              peakSeasonHours=peakSeasonHours, 
+                              overall_sample=overall_sample, 
+                              country_sample=country_sample,
+                              sample_year=sample_year)
+    sample_generator_peak(genAvail, data=windoffshore_data,
+                              seasons=seasons, 
+                              g="Windoffshorefloating", scenario=scenario,
+                              period=i, 
+                              regularSeasonHours=regularSeasonHours, 
+                              peakSeasonHours=peakSeasonHours, 
+                              overall_sample=overall_sample, 
+                              country_sample=country_sample,
+                              sample_year=sample_year)
+    sample_generator_peak(genAvail, data=hydroror_data,
+                              seasons=seasons, 
+                              g="Hydrorun-of-the-river",
+                              scenario=scenario, period=i, 
+                              regularSeasonHours=regularSeasonHours,
+                              peakSeasonHours=peakSeasonHours,
+                              overall_sample=overall_sample, 
+                              country_sample=country_sample,
+                              sample_year=sample_year)
+
+    #Sample electric load for peak seasons
+    sample_load_peak(elecLoad, data=electricload_data,
+                         seasons=seasons,
+                         scenario=scenario, period=i, 
+                         regularSeasonHours=regularSeasonHours, 
+                         peakSeasonHours=peakSeasonHours,
+                         overall_sample=overall_sample, 
+                         country_sample=country_sample,
+                         sample_year=sample_year)
+
+    #Sample seasonal hydro limit for peak seasons
+    sample_hydro_peak(hydroSeasonal, data=hydroseasonal_data,
+                          seasons=seasons,
+                          scenario=scenario, period=i, 
+                          regularSeasonHours=regularSeasonHours, 
+                          peakSeasonHours=peakSeasonHours,
+                          overall_sample=overall_sample, 
+                          country_sample=country_sample,
+                          sample_year=sample_year)
+
+    # Sample HEATMODULE profiles
+    if HEATMODULE:
+        sample_load_peak(heatLoad, data=heatload_data,
+                             seasons=seasons,
+                             scenario=scenario, period=i,
                              regularSeasonHours=regularSeasonHours,
-                             scenario=scenario, season=s,
-                             seasons=seasons, period=i,
-                             sample_hour=sample_hour)],ignore_index=True)
-
-                # Sample HEATMODULE profiles
-                if HEATMODULE:
-                    heatLoad = pd.concat([heatLoad,
-                        sample_load(data=heatload_month,
-                                    regularSeasonHours=regularSeasonHours,
-                                    scenario=scenario, season=s,
-                                    seasons=seasons, period=i,
-                                    sample_hour=sample_hour)],ignore_index=True)
-
-                    cop = pd.concat([cop,
-                        sample_generator(data=cop_month,
-                                        regularSeasonHours=regularSeasonHours,
-                                        scenario=scenario, season=s,
-                                        seasons=seasons, period=i,
-                                        generator="HeatPumpAir",
-                                        sample_hour=sample_hour)],ignore_index=True)
-            
-            ################
-            ##PEAK SEASONS##
-            ################
-
-            # Get peak sample year (2015-2019)
-            sample_year = np.random.choice(list(range(2015,2020)))
-
-            if fix_sample:
-                sample_year = sampling_key.loc[(i,scenario,'peak'),'Year']
-            else:
-                sampling_key = pd.concat([sampling_key,pd.Series({'Period': i,
-                                                    'Scenario': scenario,
-                                                    'Season': 'peak',
-                                                    'Year': sample_year,
-                                                    'Month': 0,
-                                                    'Hour': 0}).to_frame().T],
-                                                    ignore_index=True)
-
-            solar_data_year = solar_data.loc[solar_data.year.isin([sample_year]), :]
-            windonshore_data_year = windonshore_data.loc[windonshore_data.year.isin([sample_year]), :]
-            windoffshore_data_year = windoffshore_data.loc[windoffshore_data.year.isin([sample_year]), :]
-            hydroror_data_year = hydroror_data.loc[hydroror_data.year.isin([sample_year]), :]
-            hydroseasonal_data_year = hydroseasonal_data.loc[hydroseasonal_data.year.isin([sample_year]), :]
-            electricload_data_year = electricload_data.loc[electricload_data.year.isin([sample_year]), :]
-
-            if HEATMODULE:
-                heatload_year = heatload_data.loc[heatload_data.year.isin([sample_year])]
-                cop_year = cop_data.loc[cop_data.year.isin([sample_year])]
-            
-            #Peak1: The highest load when all loads are summed together
-            electricload_data_year_notime = remove_time_index(electricload_data_year)
-            overall_sample = electricload_data_year_notime.sum(axis=1).idxmax()
-            #Peak2: The highest load of a single country
-            max_load_country = electricload_data_year_notime.max().idxmax()
-            country_sample = electricload_data_year_notime[max_load_country].idxmax()
-
-            #Sample generator availability for peak seasons
-            genAvail = pd.concat([genAvail,
-                sample_generator_peak(data=solar_data_year,
-                                      seasons=seasons,
-                                      g="Solar", scenario=scenario, period=i,
-                                      regularSeasonHours=regularSeasonHours,
-                                      peakSeasonHours=peakSeasonHours,
-                                      overall_sample=overall_sample,
-                                      country_sample=country_sample)],ignore_index=True)
-            genAvail = pd.concat([genAvail,
-                sample_generator_peak(data=windonshore_data_year,
-                                      seasons=seasons, 
-                                      g="Windonshore", scenario=scenario, 
-                                      period=i, 
-                                      regularSeasonHours=regularSeasonHours,
-                                      peakSeasonHours=peakSeasonHours,
-                                      overall_sample=overall_sample, 
-                                      country_sample=country_sample)],ignore_index=True)
-            genAvail = pd.concat([genAvail,
-                sample_generator_peak(data=windoffshore_data_year,
-                                      seasons=seasons, 
-                                      g="Windoffshoregrounded", scenario=scenario,
-                                      period=i, 
-                                      regularSeasonHours=regularSeasonHours, 
-                                      peakSeasonHours=peakSeasonHours, 
-                                      overall_sample=overall_sample, 
-                                      country_sample=country_sample)],ignore_index=True)
-            genAvail = pd.concat([genAvail,
-                sample_generator_peak(data=windoffshore_data_year,
-                                      seasons=seasons, 
-                                      g="Windoffshorefloating", scenario=scenario,
-                                      period=i, 
-                                      regularSeasonHours=regularSeasonHours, 
-                                      peakSeasonHours=peakSeasonHours, 
-                                      overall_sample=overall_sample, 
-                                      country_sample=country_sample)],ignore_index=True)
-            genAvail = pd.concat([genAvail,
-                sample_generator_peak(data=hydroror_data_year,
-                                      seasons=seasons, 
-                                      g="Hydrorun-of-the-river",
-                                      scenario=scenario, period=i, 
-                                      regularSeasonHours=regularSeasonHours,
-                                      peakSeasonHours=peakSeasonHours,
-                                      overall_sample=overall_sample, 
-                                      country_sample=country_sample)],ignore_index=True)
-            
-            #Sample electric load for peak seasons
-            elecLoad = pd.concat([elecLoad,
-                sample_load_peak(data=electricload_data_year,
-                                 seasons=seasons,
-                                 scenario=scenario, period=i, 
-                                 regularSeasonHours=regularSeasonHours, 
-                                 peakSeasonHours=peakSeasonHours,
-                                 overall_sample=overall_sample, 
-                                 country_sample=country_sample)],ignore_index=True)
-            
-            #Sample seasonal hydro limit for peak seasons
-            hydroSeasonal = pd.concat([hydroSeasonal,
-                sample_hydro_peak(data=hydroseasonal_data_year,
+                             peakSeasonHours=peakSeasonHours,
+                             overall_sample=overall_sample,
+                             country_sample=country_sample,
+                             sample_year=sample_year)
+
+        sample_generator_peak(cop, data=cop_data,
                                   seasons=seasons,
-                                  scenario=scenario, period=i, 
-                                  regularSeasonHours=regularSeasonHours, 
+                                  g="HeatPumpAir",
+                                  scenario=scenario, period=i,
+                                  regularSeasonHours=regularSeasonHours,
                                   peakSeasonHours=peakSeasonHours,
-                                  overall_sample=overall_sample, 
-                                  country_sample=country_sample)],ignore_index=True)
-
-            # Sample HEATMODULE profiles
-            if HEATMODULE:
-                heatLoad = pd.concat([heatLoad,
-                    sample_load_peak(data=heatload_year,
-                                     seasons=seasons,
-                                     scenario=scenario, period=i,
-                                     regularSeasonHours=regularSeasonHours,
-                                     peakSeasonHours=peakSeasonHours,
-                                     overall_sample=overall_sample,
-                                     country_sample=country_sample)],ignore_index=True)
-
-                cop = pd.concat([cop,
-                    sample_generator_peak(data=cop_year,
-                                          seasons=seasons,
-                                          g="HeatPumpAir",
-                                          scenario=scenario, period=i,
-                                          regularSeasonHours=regularSeasonHours,
-                                          peakSeasonHours=peakSeasonHours,
-                                          overall_sample=overall_sample,
-                                          country_sample=country_sample)],ignore_index=True)
-
-    #Replace country codes with country names
-    genAvail = genAvail.replace({"Node": dict_countries})
-    elecLoad = elecLoad.replace({"Node": dict_countries})
-    hydroSeasonal = hydroSeasonal.replace({"Node": dict_countries})
+                                  overall_sample=overall_sample,
+                                  country_sample=country_sample,
+                                  sample_year=sample_year)
 
-    if HEATMODULE:
-        heatLoad = heatLoad.replace({"Node": dict_countries})
-        cop = cop.replace({"Node": dict_countries})
-
-    #Make header for .tab-file
-    genAvail = genAvail[["Node", "IntermitentGenerators", "Operationalhour",
-                         "Scenario", "Period",
-                         "GeneratorStochasticAvailabilityRaw"]]
-    elecLoad = elecLoad[["Node", "Operationalhour", "Scenario","Period", 
-                         'ElectricLoadRaw_in_MW']]
-    hydroSeasonal = hydroSeasonal[["Node", "Period", "Season", 
-                                   "Operationalhour", "Scenario",
-                                   "HydroGeneratorMaxSeasonalProduction"]]
+# Raw scenario data of a worker process, loaded once by init_scenario_worker
+_worker_data = None
 
-    if HEATMODULE:
-        heatLoad = heatLoad[["Node", "Operationalhour", "Scenario","Period",
-                             'ElectricLoadRaw_in_MW']]
-        cop = cop[["Node", "IntermitentGenerators", "Operationalhour",
-                   "Scenario", "Period", "GeneratorStochasticAvailabilityRaw"]]
+def init_scenario_worker(filepath, HEATMODULE):
+    global _worker_data
+    _worker_data = load_scenario_data(filepath, HEATMODULE)
+
+def scenario_task(data, i, scenario, seasons, regularSeasonHours, peakSeasonHours,
+                  HEATMODULE=False, seed=None, key=None):
+    # Function description: sample period i and one scenario into tables of their own. In a worker process
+    # data is None and the data loaded by init_scenario_worker is used.
+    # Output: [tables, sampling key rows]
+    if data is None:
+        data = _worker_data
+    tables = scenario_tables(data, regularSeasonHours * len(seasons) + 2 * peakSeasonHours, HEATMODULE)
+    sampling_key = []
+    if key is None:
+        key = random_key(data, i, scenario, seasons, regularSeasonHours, seed)
+        sampling_key = key_rows(key)
+    sample_scenario(data, tables, i, scenario, seasons, regularSeasonHours,
+                    peakSeasonHours, key, HEATMODULE)
+    return [tables, sampling_key]
+
+def scenario_results(data, tasks, filepath, HEATMODULE=False, workers=1):
+    # Function description: run the sampling tasks (see scenario_task), with workers > 1 in a process pool
+    # Output: generator of the task results, in task order. At most two tasks per worker are sampled ahead
+    # of the results taken, so the results waiting in memory stay bounded.
+    if workers > 1 and len(tasks) > 1:
+        # The workers load the raw data from the time-series cache themselves instead of receiving it
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks)),
+                                 initializer=init_scenario_worker,
+                                 initargs=(filepath, HEATMODULE)) as pool:
+            futures = deque()
+            for task in tasks:
+                futures.append(pool.submit(scenario_task, None, **task))
+                if len(futures) >= 2 * workers:
+                    yield futures.popleft().result()
+            while futures:
+                yield futures.popleft().result()
+    else:
+        for task in tasks:
+            yield scenario_task(data, **task)
+
+def existing_scenarios(tab_file_path, Periods):
+    # Function description: sampling key of the scenarios generated before in tab_file_path, which must
+    # hold the same scenarios 1..n for every period
+    # Output: [sampling key, n], n = 0 if nothing was generated yet
+    if not os.path.exists(tab_file_path + "/sampling_key.csv"):
+        return [pd.DataFrame(columns=['Period','Scenario','Season','Year','Month','Hour']), 0]
+    sampling_key = pd.read_csv(tab_file_path + "/sampling_key.csv")
+    scenarios = sampling_key.groupby('Period')['Scenario'].unique()
+    n = int(sampling_key['Scenario'].max()) if len(sampling_key) else 0
+    if list(scenarios.index) != list(range(1, Periods + 1)) or \
+            any(sorted(s) != list(range(1, n + 1)) for s in scenarios):
+        raise ValueError("Cannot extend the scenarios in " + tab_file_path +
+                         ": sampling_key.csv does not hold scenarios 1-" + str(n) +
+                         " for periods 1-" + str(Periods))
+    return [sampling_key, n]
+
+def generate_random_scenario(filepath, tab_file_path, scenarios, seasons,
+                             Periods, regularSeasonHours, peakSeasonHours, 
+                             dict_countries,HEATMODULE=False,
+                             fix_sample=False, seed=None, workers=1,
+                             extend=False, sampler='random', pool=None, stream=False):
+    # Every period and scenario is sampled with its own random generator derived from seed (see
+    # scenario_rng); the seed is printed so a random run can be repeated. With workers > 1 the periods and
+    # scenarios are sampled in a process pool, with the same output as workers=1.
+    # With extend=True the scenarios already in tab_file_path (see existing_scenarios) are kept and only the
+    # scenarios after them are sampled and appended to the stochastic-files and the sampling key.
+    # With sampler='stratified' the regular seasons of the scenarios are spread over the sample years, months
+    # and hours (see stratified_key) instead of drawn independently. With sampler='kmedoids' or 'reduction' a
+    # pool of random scenarios (10 times the number of scenarios by default) is clustered into representative
+    # scenarios (see representative_key) or reduced to the number of scenarios (see reduce_scenarios). The
+    # probabilities of representative and of reduced scenarios are saved in Stochastic_ScenarioProbability.tab,
+    # which run_empire uses instead of equally likely scenarios, and in the sampling key.
+    # With stream=True the samples of every period and scenario are written to the stochastic-files as soon as
+    # they are sampled (see reader.TabWriter) instead of being collected for all of them first.
+
+    if sampler not in ['random', 'stratified', 'kmedoids', 'reduction']:
+        raise ValueError("Unknown scenario sampler " + str(sampler) +
+                         ", use 'random', 'stratified', 'kmedoids' or 'reduction'")
+    if extend and sampler != 'random' and not fix_sample:
+        raise ValueError("Scenarios selected by " + sampler + " depend on the number of scenarios and cannot be extended")
+    if extend and stream:
+        raise ValueError("Extending scenarios appends to the stochastic-files and cannot be combined with stream")
+    
+    if fix_sample:
+        print("Generating scenarios according to key...")
+    else:
+        if seed is None:
+            seed = np.random.SeedSequence().entropy
+        if sampler == 'stratified':
+            print("Generating stratified scenarios (seed " + str(seed) + ")...")
+        elif sampler in ['kmedoids', 'reduction']:
+            if pool is None:
+                pool = 10 * scenarios
+            if sampler == 'kmedoids':
+                print("Generating representative scenarios clustered from a pool of " + str(pool) +
+                      " (k-medoids, seed " + str(seed) + ")...")
+            else:
+                print("Generating scenarios reduced from a pool of " + str(pool) + " (seed " + str(seed) + ")...")
+        else:
+            print("Generating random scenarios (seed " + str(seed) + ")...")
+
+    firstScenario = 1
+    if extend:
+        [existing_key, existingScenarios] = existing_scenarios(tab_file_path, Periods)
+        if 'Probability' in existing_key.columns:
+            raise ValueError("The scenarios in " + tab_file_path + " have probabilities and cannot be extended")
+        if existingScenarios >= scenarios:
+            print("Scenarios 1-" + str(existingScenarios) + " already generated, nothing to extend")
+            return
+        firstScenario = existingScenarios + 1
+        print("Extending scenarios 1-" + str(existingScenarios) + " with scenarios " +
+              str(firstScenario) + "-" + str(scenarios))
+
+    data = load_scenario_data(filepath, HEATMODULE)
+
+    if fix_sample:
+        sampling_key = pd.read_csv(filepath + "/sampling_key.csv")
+        key = join_sampling_key(sampling_key, Periods, scenarios, seasons)
+        probabilities = None
+        if 'Probability' in sampling_key.columns:
+            probabilities = sampling_key.groupby('Scenario')['Probability'].first().reindex(range(1, scenarios + 1)).to_numpy()
+    elif sampler == 'stratified':
+        key = stratified_key(data, Periods, scenarios, seasons, regularSeasonHours, seed)
+        sampling_key = key_rows(key)
+        probabilities = None
+    elif sampler == 'kmedoids':
+        [key, probabilities] = representative_key(data, Periods, scenarios, pool, seasons, regularSeasonHours, seed)
+        sampling_key = key_rows(key)
+    elif sampler == 'reduction':
+        [key, probabilities] = reduce_scenarios(data, Periods, scenarios, pool, seasons, regularSeasonHours, seed)
+        sampling_key = key_rows(key)
+    else:
+        key = None
+        sampling_key = []
+        probabilities = None
+
+    tasks = []
+    for i in range(1,Periods+1):
+        for scenario in range(firstScenario,scenarios+1):
+            task_key = None
+            if key is not None:
+                task_key = {k: v for k, v in key.items() if k[:2] == (i, scenario)}
+            tasks.append(dict(i=i, scenario=scenario, seasons=seasons,
+                              regularSeasonHours=regularSeasonHours,
+                              peakSeasonHours=peakSeasonHours,
+                              HEATMODULE=HEATMODULE, seed=seed, key=task_key))
 
-    #Make filepath (if it does not exist) and print .tab-files
+    #Make filepath (if it does not exist)
     if not os.path.exists(tab_file_path):
         os.makedirs(tab_file_path)
+    if HEATMODULE and not os.path.exists(tab_file_path + "/HeatModule"):
+        os.makedirs(tab_file_path + "/HeatModule")
+
+    if stream:
+        # Write the samples of every period and scenario to the .tab-files as soon as they are sampled
+        with ExitStack() as stack:
+            writers = {name: stack.enter_context(TabWriter(tab_file_path + "/" + STOCHASTIC_FILES[name],
+                                                           STOCHASTIC_COLUMNS[name]))
+                       for name in STOCHASTIC_FILES if HEATMODULE or name not in ['heatLoad', 'cop']}
+            for task_tables, task_key in scenario_results(data, tasks, filepath, HEATMODULE, workers):
+                for name, table in task_tables.items():
+                    #Replace country codes with country names
+                    writers[name].write(table.frame({"Node": dict_countries}), table.value_blocks())
+                if not fix_sample:
+                    sampling_key += task_key
+    else:
+        # Allocate the stochastic-files for all samples: every period and (new) scenario samples the regular
+        # seasons and the two peak seasons, and collect the samples in period and scenario order
+        hours = len(tasks) * (regularSeasonHours * len(seasons) + 2 * peakSeasonHours)
+        tables = scenario_tables(data, hours, HEATMODULE)
+        for task_tables, task_key in scenario_results(data, tasks, filepath, HEATMODULE, workers):
+            for name, table in task_tables.items():
+                tables[name].append(table)
+            if not fix_sample:
+                sampling_key += task_key
+
+        if extend:
+            write_tab = append_tab
+        else:
+            write_tab = save_tab
+
+        for name, table in tables.items():
+            #Replace country codes with country names
+            write_tab(table.frame({"Node": dict_countries}), tab_file_path + "/" + STOCHASTIC_FILES[name],
+                      blocks=table.value_blocks())
 
     # Save sampling key
-    if fix_sample:
-        sampling_key = sampling_key.reset_index(level=['Period','Scenario','Season'])
+    if not fix_sample:
+        sampling_key = pd.DataFrame(sampling_key, columns=['Period','Scenario','Season','Year','Month','Hour'])
+        if probabilities is not None:
+            sampling_key['Probability'] = probabilities[sampling_key['Scenario'].to_numpy() - 1]
+        if extend:
+            sampling_key = pd.concat([existing_key, sampling_key], ignore_index=True)
+    else:
+        # only the samples of the generated scenarios, so the key written matches the stochastic-files
+        sampling_key = sampling_key[(sampling_key['Period'] <= Periods) & (sampling_key['Scenario'] <= scenarios)]
 
     sampling_key.to_csv(
         tab_file_path + "/sampling_key" + '.csv',
         header=True, index=None, mode='w')
 
-    genAvail.to_csv(
-        tab_file_path + "/Stochastic_StochasticAvailability" + '.tab',
-        header=True, index=None, sep='\t', mode='w')
-    elecLoad.to_csv(
-        tab_file_path + "/Stochastic_ElectricLoadRaw" + '.tab',
-        header=True, index=None, sep='\t', mode='w')
-    hydroSeasonal.to_csv(
-        tab_file_path + "/Stochastic_HydroGenMaxSeasonalProduction" + '.tab',
-        header=True, index=None, sep='\t', mode='w')
-
-    if HEATMODULE:
-        if not os.path.exists(tab_file_path + "/HeatModule"):
-            os.makedirs(tab_file_path + "/HeatModule")
-        heatLoad.to_csv(
-            tab_file_path + "/HeatModule/HeatModuleStochastic_HeatLoadRaw.tab",
-            header=True, index=None, sep='\t', mode='w')
-        cop.to_csv(
-            tab_file_path + "/HeatModule/HeatModuleStochastic_ConverterAvail.tab",
-            header=True, index=None, sep='\t', mode='w')
\ No newline at end of file
+    if probabilities is not None:
+        save_tab(pd.DataFrame({'Scenario': ["scenario" + str(scenario) for scenario in range(1, scenarios + 1)],
+                               'ScenarioProbability': probabilities}),
+                 tab_file_path + "/Stochastic_ScenarioProbability.tab")
+    elif not extend:
+        # equally likely scenarios, remove the probabilities of an earlier run
+        for f in [tab_file_path + "/Stochastic_ScenarioProbability.tab", tab_file_path + "/Stochastic_ScenarioProbability.npz"]:
+            if os.path.exists(f):
+                os.remove(f)
@@ -29,6 +29,7 @@ EMISSION_CAP = UserRunTimeConfig["EMISSION_CAP"]
 IAMC_PRINT = UserRunTimeConfig["IAMC_PRINT"]
 WRITE_LP = UserRunTimeConfig["WRITE_LP"]
 PICKLE_INSTANCE = UserRunTimeConfig["PICKLE_INSTANCE"] 
+TAB_STORE = UserRunTimeConfig.get("TAB_STORE")
 
 
 #############################
@@ -100,7 +101,7 @@ if scenariogeneration:
 			                 fix_sample = fix_sample,
                              north_sea = False)
 
-generate_tab_files(filepath = workbook_path, tab_file_path = tab_file_path)
+generate_tab_files(filepath = workbook_path, tab_file_path = tab_file_path, store = TAB_STORE)
 
 run_empire(name = name, 
            tab_file_path = tab_file_path,
@@ -0,0 +1,43 @@
+import os
+import sys
+
+# The modules are scripts in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# Raw time series of the scenario generator (see scenario_random.load_scenario_data) with their time format
+SCENARIO_SOURCES = {'solar.csv': "%d/%m/%Y %H:%M",
+                    'windonshore.csv': "%d/%m/%Y %H:%M",
+                    'windoffshore.csv': "%d/%m/%Y %H:%M",
+                    'hydroror.csv': "%Y-%m-%d %H:%M",
+                    'hydroseasonal.csv': "%Y-%m-%d %H:%M",
+                    'electricload.csv': "%d/%m/%Y %H:%M"}
+
+
+def write_scenario_data(path):
+    # Function description: two complete years (2015, 2016) of hourly raw data for the countries DE and NO. The
+    # electric load of every year has its highest single-country hour (DE, 10 March) apart from its highest
+    # total hour (10 August), both far from the year boundaries.
+    time = pd.date_range("2015-01-01 00:00", "2016-12-31 23:00", freq="h")
+    for n, (source, time_format) in enumerate(SCENARIO_SOURCES.items()):
+        rng = np.random.default_rng(n)
+        if source == 'electricload.csv':
+            values = np.round(1000 + 1000 * rng.random((len(time), 2)))
+            for year in [2015, 2016]:
+                values[time == pd.Timestamp(year, 3, 10, 12), 0] += 5000
+                values[time == pd.Timestamp(year, 8, 10, 12), :] += 3000
+        else:
+            values = np.round(rng.random((len(time), 2)), 4)
+        frame = pd.DataFrame(values, columns=['DE', 'NO'])
+        frame.insert(0, 'time', time.strftime(time_format))
+        frame.to_csv(os.path.join(path, source), index=False)
+
+
+@pytest.fixture(scope="session")
+def scenario_data(tmp_path_factory):
+    path = tmp_path_factory.mktemp("ScenarioData")
+    write_scenario_data(str(path))
+    return str(path)
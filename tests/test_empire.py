@@ -0,0 +1,60 @@
+import pandas as pd
+from pyomo.environ import AbstractModel, DataPortal, Param, Set
+
+from Empire import TabDataPortal, check_tab_data
+from reader import save_tab
+
+
+def test_cached_load_matches_text_and_builds_instance(tmp_path):
+    save_tab(pd.DataFrame({'Node': ['Germany', 'Norway']}), str(tmp_path / "Sets_Node.tab"))
+    save_tab(pd.DataFrame({'Node': ['Germany', 'Norway'], 'Period': [1, 2], 'Value': [1.5, 2.0]}),
+             str(tmp_path / "Node_Value.tab"))
+    save_tab(pd.DataFrame({'Node': pd.Series([], dtype=object), 'Cost': pd.Series([], dtype=float)}),
+             str(tmp_path / "Node_Cost.tab"))
+
+    model = AbstractModel()
+    model.Node = Set()
+    model.Period = Set(initialize=[1, 2])
+    model.value = Param(model.Node, model.Period, default=0.0)
+    model.cost = Param(model.Node, default=7.0)
+
+    def load(data):
+        data.load(filename=str(tmp_path / "Sets_Node.tab"), format="set", set=model.Node)
+        data.load(filename=str(tmp_path / "Node_Value.tab"), param=model.value, format="table")
+        data.load(filename=str(tmp_path / "Node_Cost.tab"), param=model.cost, format="table")
+        return data
+
+    cached = load(TabDataPortal())
+    text = DataPortal()
+    text.load(filename=str(tmp_path / "Sets_Node.tab"), format="set", set=model.Node)
+    text.load(filename=str(tmp_path / "Node_Value.tab"), param=model.value, format="table")
+    assert cached['Node'] == text['Node']
+    assert cached['value'] == text['value']
+    # the header-only table leaves the param at its default
+    assert 'cost' not in cached.keys()
+
+    instance = model.create_instance(cached.portal())
+    assert list(instance.Node) == ['Germany', 'Norway']
+    assert instance.value['Norway', 2] == 2.0
+    assert instance.cost['Germany'] == 7.0
+
+
+def test_check_tab_data_reports_only_the_key_outside_its_set(tmp_path):
+    save_tab(pd.DataFrame({'Node': ['Germany', 'Norway']}), str(tmp_path / "Sets_Node.tab"))
+    save_tab(pd.DataFrame({'Node': ['Germany', 'Norway'], 'Period': [1, 2], 'Value': [1.5, 2.0]}),
+             str(tmp_path / "Node_Valid.tab"))
+    save_tab(pd.DataFrame({'Node': ['Germany', 'Narnia'], 'Value': [3.0, 4.0]}), str(tmp_path / "Node_Invalid.tab"))
+
+    model = AbstractModel()
+    model.Node = Set()
+    model.Period = Set(initialize=[1, 2])
+    model.valid = Param(model.Node, model.Period, default=0.0)
+    model.invalid = Param(model.Node, default=0.0)
+
+    data = TabDataPortal()
+    data.load(filename=str(tmp_path / "Sets_Node.tab"), format="set", set=model.Node)
+    data.load(filename=str(tmp_path / "Node_Valid.tab"), param=model.valid, format="table")
+    data.load(filename=str(tmp_path / "Node_Invalid.tab"), param=model.invalid, format="table")
+
+    problems = check_tab_data(model, data, {'Period': [1, 2]})
+    assert problems == ["invalid: 1 key(s) not in set Node, e.g. 'Narnia'"]
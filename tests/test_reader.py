@@ -0,0 +1,192 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from reader import TabWriter, append_tab, cache_name, column_list, expand_blocks, read_table_cache, save_tab
+
+
+def assert_cache_matches_text(path):
+    # the cache holds the columns of the .tab text with the types Pyomo parses them to
+    text = pd.read_csv(path, sep='\t')
+    columns = read_table_cache(path)
+    assert columns is not None
+    assert len(columns) == text.shape[1]
+    for ind, column in enumerate(columns):
+        assert len(column) == len(text)
+        if text.iloc[:, ind].dtype.kind in 'iuf':
+            assert column.dtype.kind in 'iuf'
+            np.testing.assert_array_equal(column, text.iloc[:, ind].to_numpy())
+        elif len(text) > 0:
+            assert column.dtype.kind == 'U'
+            assert column.tolist() == text.iloc[:, ind].astype(str).tolist()
+    return columns
+
+
+def test_numeric_and_text_columns(tmp_path):
+    path = str(tmp_path / "Sheet.tab")
+    save_tab(pd.DataFrame({'Node': ['Germany', 'Norway', 'France'],
+                           'Period': [1, 2, 3],
+                           'Value': [0.5, 1e-4, 12.0]}), path)
+    [node, period, value] = assert_cache_matches_text(path)
+    assert node.dtype.kind == 'U'
+    assert period.dtype.kind == 'i'
+    assert value.dtype.kind == 'f'
+
+
+def test_header_only_table(tmp_path):
+    path = str(tmp_path / "Empty.tab")
+    save_tab(pd.DataFrame({'Node': pd.Series([], dtype=object), 'Value': pd.Series([], dtype=float)}), path)
+    with open(path) as f:
+        assert f.read() == "Node\tValue\n"
+    columns = assert_cache_matches_text(path)
+    assert [len(column) for column in columns] == [0, 0]
+
+
+def test_column_mixing_numbers_and_text_has_no_cache(tmp_path):
+    path = str(tmp_path / "Mixed.tab")
+    save_tab(pd.DataFrame({'Node': ['a', 'b'], 'Value': [1.0, 2.0]}), path)
+    assert os.path.exists(cache_name(path))
+    # rewriting the table with a mixed column removes the cache of the earlier table
+    save_tab(pd.DataFrame({'Node': ['a', 'b'], 'Value': [1.0, 'high']}), path)
+    assert not os.path.exists(cache_name(path))
+    assert read_table_cache(path) is None
+
+
+def test_cache_older_than_text_is_not_used(tmp_path):
+    path = str(tmp_path / "Sheet.tab")
+    save_tab(pd.DataFrame({'Node': ['a'], 'Value': [1.0]}), path)
+    cache_time = os.path.getmtime(cache_name(path))
+    os.utime(path, (cache_time + 10, cache_time + 10))
+    assert read_table_cache(path) is None
+
+
+def test_append_extends_cache(tmp_path):
+    path = str(tmp_path / "Sheet.tab")
+    save_tab(pd.DataFrame({'Node': ['a', 'b'], 'Period': [1, 2], 'Value': [1.0, 2.0]}), path)
+    append_tab(pd.DataFrame({'Node': ['c'], 'Period': [3], 'Value': [3.5]}), path)
+    [node, period, value] = assert_cache_matches_text(path)
+    assert node.tolist() == ['a', 'b', 'c']
+    assert value.tolist() == [1.0, 2.0, 3.5]
+
+
+def test_append_changing_column_type_drops_cache(tmp_path):
+    path = str(tmp_path / "Sheet.tab")
+    save_tab(pd.DataFrame({'Node': ['a', 'b'], 'Value': [1.0, 2.0]}), path)
+    append_tab(pd.DataFrame({'Node': ['c'], 'Value': ['high']}), path)
+    assert not os.path.exists(cache_name(path))
+    assert pd.read_csv(path, sep='\t')['Value'].tolist() == ['1.0', '2.0', 'high']
+
+
+@pytest.mark.parametrize("linesep", ["\n", "\r\n"])
+def test_tab_writer_matches_save_tab(tmp_path, monkeypatch, linesep):
+    # to_csv ends lines with os.linesep, "\r\n" on Windows
+    monkeypatch.setattr(os, 'linesep', linesep)
+    table = pd.DataFrame({'Node': ['a', 'b', 'c', 'd', 'e'],
+                          'Period': [1, 2, 3, 4, 5],
+                          'Value': [1.0, 2.5, 3.0, 4.25, 5.0]})
+    saved = str(tmp_path / "Saved.tab")
+    streamed = str(tmp_path / "Streamed.tab")
+    save_tab(table, saved)
+    with TabWriter(streamed, table.columns) as writer:
+        writer.write(table.iloc[:2])
+        writer.write(table.iloc[2:])
+    with open(saved, 'rb') as f, open(streamed, 'rb') as g:
+        assert f.read() == g.read()
+    for column, expected in zip(assert_cache_matches_text(streamed), read_table_cache(saved)):
+        assert column.dtype == expected.dtype
+        np.testing.assert_array_equal(column, expected)
+    assert sorted(os.listdir(tmp_path)) == ['Saved.npz', 'Saved.tab', 'Streamed.npz', 'Streamed.tab']
+
+
+def test_tab_writer_chunk_changing_column_type_drops_cache(tmp_path):
+    path = str(tmp_path / "Sheet.tab")
+    save_tab(pd.DataFrame({'Node': ['a'], 'Value': [1.0]}), path)
+    with TabWriter(path, ['Node', 'Value']) as writer:
+        writer.write(pd.DataFrame({'Node': ['a', 'b'], 'Value': [1.0, 2.0]}))
+        writer.write(pd.DataFrame({'Node': ['c'], 'Value': ['high']}))
+    assert not os.path.exists(cache_name(path))
+    assert pd.read_csv(path, sep='\t')['Value'].tolist() == ['1.0', '2.0', 'high']
+
+
+def test_tab_writer_header_only(tmp_path):
+    path = str(tmp_path / "Empty.tab")
+    with TabWriter(path, ['Node', 'Value']):
+        pass
+    with open(path, 'rb') as f:
+        assert f.read() == ("Node\tValue" + os.linesep).encode()
+    columns = assert_cache_matches_text(path)
+    assert [len(column) for column in columns] == [0, 0]
+
+
+def test_tab_writer_keeps_old_file_on_error(tmp_path):
+    path = str(tmp_path / "Sheet.tab")
+    save_tab(pd.DataFrame({'Node': ['a'], 'Value': [1.0]}), path)
+    try:
+        with TabWriter(path, ['Node', 'Value']) as writer:
+            writer.write(pd.DataFrame({'Node': ['b'], 'Value': [2.0]}))
+            raise RuntimeError
+    except RuntimeError:
+        pass
+    assert sorted(os.listdir(tmp_path)) == ['Sheet.npz', 'Sheet.tab']
+    assert assert_cache_matches_text(path)[0].tolist() == ['a']
+
+
+def block_table():
+    # rows of three samples, the first window sampled twice
+    blocks = [('w1', np.array([1.0, 2.0])), ('w2', np.array([3.0, 4.0])), ('w1', np.array([1.0, 2.0]))]
+    table = pd.DataFrame({'Scenario': ['s1', 's1', 's2', 's2', 's3', 's3'],
+                          'Hour': [1, 2, 1, 2, 1, 2],
+                          'Value': np.concatenate([values for key, values in blocks])})
+    return [table, blocks]
+
+
+def test_blocks_are_stored_once(tmp_path):
+    [table, blocks] = block_table()
+    path = str(tmp_path / "Sheet.tab")
+    save_tab(table, path, blocks=blocks)
+    with np.load(cache_name(path)) as npz:
+        assert sorted(npz.files) == ['b2', 'c0', 'c1', 'columns', 's2']
+        assert npz['b2'].tolist() == [1.0, 2.0, 3.0, 4.0]
+        assert npz['s2'].tolist() == [[0, 2], [2, 2], [0, 2]]
+    [scenario, hour, value] = assert_cache_matches_text(path)
+    assert value.tolist() == table['Value'].tolist()
+
+    [values, segments] = read_table_cache(path, blocks=True)[2]
+    np.testing.assert_array_equal(expand_blocks(values, segments), value)
+    rows = column_list((values, segments))
+    assert rows == table['Value'].tolist()
+    # the rows of a repeated block share the objects of its first rows
+    assert rows[4] is rows[0] and rows[5] is rows[1]
+
+
+def test_tab_writer_stores_blocks_once_over_chunks(tmp_path):
+    [table, blocks] = block_table()
+    saved = str(tmp_path / "Saved.tab")
+    streamed = str(tmp_path / "Streamed.tab")
+    save_tab(table, saved, blocks=blocks)
+    with TabWriter(streamed, table.columns) as writer:
+        writer.write(table.iloc[:4], blocks=blocks[:2])
+        writer.write(table.iloc[4:], blocks=blocks[2:])
+    with open(saved, 'rb') as f, open(streamed, 'rb') as g:
+        assert f.read() == g.read()
+    assert_cache_matches_text(streamed)
+    for column, expected in zip(read_table_cache(streamed, blocks=True), read_table_cache(saved, blocks=True)):
+        for array, expected_array in zip(column, expected):
+            np.testing.assert_array_equal(array, expected_array)
+
+
+def test_append_with_blocks(tmp_path):
+    [table, blocks] = block_table()
+    path = str(tmp_path / "Sheet.tab")
+    save_tab(table.iloc[:4], path, blocks=blocks[:2])
+    append_tab(table.iloc[4:], path, blocks=blocks[2:])
+    [scenario, hour, value] = assert_cache_matches_text(path)
+    assert value.tolist() == table['Value'].tolist()
+    # appending to a plain column keeps the cache and stores the appended values as blocks
+    path = str(tmp_path / "Plain.tab")
+    save_tab(table.iloc[:4], path)
+    append_tab(table.iloc[4:], path, blocks=blocks[2:])
+    assert_cache_matches_text(path)
+    assert isinstance(read_table_cache(path, blocks=True)[2], tuple)
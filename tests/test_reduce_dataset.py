@@ -0,0 +1,23 @@
+import os
+
+import pytest
+
+from reduce_dataset import copy_unfiltered, reduce_dataset
+
+
+def test_generated_files_are_not_copied(tmp_path):
+    full = tmp_path / "full"
+    for f in ["README.txt", "Sets.xlsx", "Sets_Nodes.npz", "HeatModule/HeatModuleSets.xlsx",
+              "Tab_Files_run/Sets_Nodes.tab", "Tab_Files_run/tab_manifest.json", "ScenarioData/solar.csv"]:
+        os.makedirs(os.path.dirname(str(full / f)), exist_ok=True)
+        (full / f).write_text("")
+    copy_unfiltered(str(full), str(tmp_path / "reduced"))
+    copied = sorted(os.path.relpath(os.path.join(root, f), str(tmp_path / "reduced"))
+                    for root, dirs, files in os.walk(str(tmp_path / "reduced")) for f in files)
+    assert copied == ["HeatModule/HeatModuleSets.xlsx", "README.txt", "Sets.xlsx"]
+
+
+@pytest.mark.parametrize("reduced", ["", "reduced", "ScenarioData/reduced"])
+def test_reduced_dataset_outside_of_dataset(tmp_path, reduced):
+    with pytest.raises(ValueError, match="outside of"):
+        reduce_dataset(str(tmp_path), str(tmp_path / reduced), ["Germany"])
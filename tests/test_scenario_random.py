@@ -0,0 +1,252 @@
+import io
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from scenario_random import (STOCHASTIC_FILES, ScenarioTable, TimeCube, cluster_selection, forward_selection,
+                             generate_random_scenario, join_sampling_key, load_timeseries, make_datetime,
+                             sliced_latin_hypercube, timeseries_cache_path)
+from test_reader import assert_cache_matches_text
+
+DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+SEASONS = ["winter", "summer"]
+COUNTRIES = {"DE": "Germany", "NO": "Norway"}
+TABLES = [STOCHASTIC_FILES[name] for name in ['genAvail', 'elecLoad', 'hydroSeasonal']]
+
+
+def generate(scenario_data, path, **kwds):
+    # Function description: generate the stochastic-files of the test data into path
+    settings = dict(filepath=scenario_data, tab_file_path=str(path), scenarios=2, seasons=SEASONS, Periods=2,
+                    regularSeasonHours=6, peakSeasonHours=4, dict_countries=COUNTRIES)
+    settings.update(kwds)
+    generate_random_scenario(**settings)
+    return str(path)
+
+
+def read_text(path):
+    with open(path) as f:
+        return f.read()
+
+
+def sorted_table(path):
+    table = pd.read_csv(path, sep='\t')
+    return table.sort_values(list(table.columns[:-1])).reset_index(drop=True)
+
+
+def test_output_does_not_depend_on_workers(scenario_data, tmp_path):
+    one = generate(scenario_data, tmp_path / "one", scenarios=3, seed=7, workers=1)
+    two = generate(scenario_data, tmp_path / "two", scenarios=3, seed=7, workers=2)
+    for name in TABLES + ["sampling_key.csv"]:
+        assert read_text(one + "/" + name) == read_text(two + "/" + name)
+
+
+def test_stream_matches_batch(scenario_data, tmp_path):
+    batch = generate(scenario_data, tmp_path / "batch", scenarios=3, seed=7)
+    stream = generate(scenario_data, tmp_path / "stream", scenarios=3, seed=7, stream=True)
+    for name in TABLES:
+        pd.testing.assert_frame_equal(sorted_table(stream + "/" + name), sorted_table(batch + "/" + name))
+        assert_cache_matches_text(stream + "/" + name)
+    assert read_text(stream + "/sampling_key.csv") == read_text(batch + "/sampling_key.csv")
+
+
+def test_fix_sample_matches_baseline(scenario_data, tmp_path):
+    # The expected tables were written by the generator before the sampling was reworked, from the same data
+    # and sampling key
+    filepath = str(tmp_path / "ScenarioData")
+    shutil.copytree(scenario_data, filepath)
+    shutil.copy(DATA + "/fix_sample/sampling_key.csv", filepath)
+    path = generate(filepath, tmp_path / "fixed", fix_sample=True)
+    for name in TABLES:
+        expected = sorted_table(DATA + "/fix_sample/" + name + ".gz")
+        table = sorted_table(path + "/" + name)
+        pd.testing.assert_frame_equal(table.iloc[:, :-1], expected.iloc[:, :-1])
+        np.testing.assert_allclose(table.iloc[:, -1], expected.iloc[:, -1], rtol=1e-6)
+
+
+def test_extend_keeps_existing_scenarios_and_adds_new_ones(scenario_data, tmp_path):
+    path = generate(scenario_data, tmp_path / "extended", scenarios=2, seed=7)
+    before = {name: read_text(path + "/" + name) for name in TABLES + ["sampling_key.csv"]}
+    generate(scenario_data, path, scenarios=3, seed=7, extend=True)
+    fresh = generate(scenario_data, tmp_path / "fresh", scenarios=3, seed=7)
+
+    for name in TABLES:
+        text = read_text(path + "/" + name)
+        # the rows written before are kept as they were, only rows of the new scenario are appended
+        assert text.startswith(before[name])
+        added = pd.read_csv(path + "/" + name, sep='\t').iloc[len(pd.read_csv(io.StringIO(before[name]), sep='\t')):]
+        assert set(added['Scenario']) == {'scenario3'}
+        assert_cache_matches_text(path + "/" + name)
+        pd.testing.assert_frame_equal(sorted_table(path + "/" + name), sorted_table(fresh + "/" + name))
+
+    key = pd.read_csv(path + "/sampling_key.csv")
+    assert read_text(path + "/sampling_key.csv").startswith(before["sampling_key.csv"])
+    assert sorted(key['Scenario'].unique()) == [1, 2, 3]
+    assert len(key) == 2 * 3 * (len(SEASONS) + 1)
+
+
+def scenario_probabilities(path):
+    probabilities = pd.read_csv(path + "/Stochastic_ScenarioProbability.tab", sep='\t')
+    return dict(zip(probabilities['Scenario'], probabilities['ScenarioProbability']))
+
+
+def test_kmedoids_selects_candidates_with_cluster_probabilities(scenario_data, tmp_path):
+    path = generate(scenario_data, tmp_path / "kmedoids", scenarios=3, seed=3, sampler='kmedoids', pool=8)
+    # the candidates are the random scenarios of the same seed
+    pool = generate(scenario_data, tmp_path / "pool", scenarios=8, seed=3)
+    key = pd.read_csv(path + "/sampling_key.csv")
+    candidates = pd.read_csv(pool + "/sampling_key.csv")
+    columns = ['Period', 'Season', 'Year', 'Month', 'Hour']
+    candidate_windows = [w[columns].values.tolist() for _, w in candidates.groupby('Scenario')]
+    for _, windows in key.groupby('Scenario'):
+        # every representative scenario is one candidate, with all its periods and seasons
+        assert windows[columns].values.tolist() in candidate_windows
+
+    probabilities = scenario_probabilities(path)
+    assert list(probabilities) == ['scenario1', 'scenario2', 'scenario3']
+    # the share of the 8 candidates in every cluster, the largest first
+    assert all(round(p * 8, 9).is_integer() and p > 0 for p in probabilities.values())
+    assert abs(sum(probabilities.values()) - 1) < 1e-9
+    assert list(probabilities.values()) == sorted(probabilities.values(), reverse=True)
+    for scenario, probability in key.groupby('Scenario')['Probability'].unique().items():
+        assert probability.tolist() == [probabilities['scenario' + str(scenario)]]
+
+
+def test_cluster_selection_gives_cluster_masses():
+    points = np.array([0.0, 0.1, 0.2, 10.0, 10.1])
+    [selected, probabilities] = cluster_selection(np.abs(points[:, None] - points[None, :]), 2,
+                                                  np.random.default_rng(0))
+    # the medoids of the two groups, the larger group first
+    assert selected == [1, 3] or selected == [1, 4]
+    assert probabilities.tolist() == [0.6, 0.4]
+
+
+def test_forward_selection_gives_probability_of_nearest_candidates():
+    points = np.array([0.0, 0.1, 0.2, 10.0, 10.1])
+    [selected, probabilities] = forward_selection(np.abs(points[:, None] - points[None, :]), 2)
+    # one candidate of each group is selected and gets the probability of its group
+    assert sorted(points[c] < 5 for c in selected) == [False, True]
+    for c, probability in zip(selected, probabilities):
+        assert probability == pytest.approx(0.6 if points[c] < 5 else 0.4)
+
+
+def test_reduction_probabilities(scenario_data, tmp_path):
+    path = generate(scenario_data, tmp_path / "reduction", scenarios=2, seed=5, sampler='reduction', pool=6)
+    probabilities = scenario_probabilities(path)
+    assert list(probabilities) == ['scenario1', 'scenario2']
+    assert all(p > 0 for p in probabilities.values())
+    assert abs(sum(probabilities.values()) - 1) < 1e-9
+    key = pd.read_csv(path + "/sampling_key.csv")
+    assert sorted(key['Scenario'].unique()) == [1, 2]
+    for name in TABLES:
+        assert set(pd.read_csv(path + "/" + name, sep='\t')['Scenario']) == {'scenario1', 'scenario2'}
+
+
+def test_sliced_latin_hypercube_strata():
+    draws = sliced_latin_hypercube(np.random.default_rng(1), 4, 3)
+    assert draws.shape == (4, 3)
+    # one draw in each of the 12 strata, and in each of the 3 coarse strata within a period
+    assert sorted((draws * 12).astype(int).ravel().tolist()) == list(range(12))
+    for period in draws:
+        assert sorted((period * 3).astype(int).tolist()) == [0, 1, 2]
+
+
+def test_stratified_sample_years(scenario_data, tmp_path):
+    path = generate(scenario_data, tmp_path / "stratified", seed=4, sampler='stratified')
+    key = pd.read_csv(path + "/sampling_key.csv")
+    for s in SEASONS + ['peak']:
+        windows = key[key['Season'] == s]
+        # 2 periods x 2 scenarios over 2 sample years: every year twice, once in each period
+        assert sorted(windows['Year']) == [2015, 2015, 2016, 2016]
+        for _, w in windows.groupby('Period'):
+            assert sorted(w['Year']) == [2015, 2016]
+
+
+def test_scenario_table_stores_repeated_windows_once():
+    table = ScenarioTable(['Node', 'Operationalhour', 'Scenario', 'Value'], 6)
+    hours = np.array([1, 2])
+    table.add(block='w1', Node='DE', Operationalhour=hours, Scenario='scenario1', Value=np.array([1.0, 2.0]))
+    table.add(block='w2', Node='DE', Operationalhour=hours, Scenario='scenario2', Value=np.array([3.0, 4.0]))
+    table.add(block='w1', Node='NO', Operationalhour=hours, Scenario='scenario3', Value=np.array([1.0, 2.0]))
+    assert table.size == 6
+    assert table.stored == 4
+    frame = table.frame({'Node': COUNTRIES})
+    assert frame['Node'].tolist() == ['Germany'] * 4 + ['Norway'] * 2
+    assert frame['Value'].tolist() == [1.0, 2.0, 3.0, 4.0, 1.0, 2.0]
+    assert [key for key, values in table.value_blocks()] == ['w1', 'w2', 'w1']
+
+
+def write_series(path, values):
+    frame = pd.DataFrame({'time': pd.date_range("2015-01-01", periods=len(values), freq="h").strftime("%Y-%m-%d %H:%M"),
+                          'DE': values})
+    frame.to_csv(path, index=False)
+
+
+def test_timeseries_cache_is_rebuilt_when_the_source_changes(tmp_path):
+    path = str(tmp_path / "solar.csv")
+    write_series(path, [0.1, 0.2, 0.3])
+    assert load_timeseries(str(tmp_path), "solar.csv", "%Y-%m-%d %H:%M")['DE'].tolist() == \
+        pytest.approx([0.1, 0.2, 0.3])
+    stamp = timeseries_cache_path(str(tmp_path), "solar.csv") + "/columns.json"
+    assert os.path.exists(stamp)
+
+    # edited values of the same size
+    write_series(path, [0.4, 0.5, 0.6])
+    os.utime(path, ns=(os.stat(stamp).st_mtime_ns + 10 ** 9,) * 2)
+    assert load_timeseries(str(tmp_path), "solar.csv", "%Y-%m-%d %H:%M")['DE'].tolist() == \
+        pytest.approx([0.4, 0.5, 0.6])
+
+    # only touched: the cache is rebuilt with the new stamp
+    built = os.stat(stamp).st_mtime_ns
+    os.utime(path, ns=(built + 2 * 10 ** 9,) * 2)
+    load_timeseries(str(tmp_path), "solar.csv", "%Y-%m-%d %H:%M")
+    with open(stamp) as f:
+        assert json.load(f)['mtime_ns'] == built + 2 * 10 ** 9
+
+
+def test_sampling_key_with_duplicate_samples():
+    sampling_key = pd.DataFrame([[1, 1, 'winter', 2015, 1, 0],
+                                 [1, 1, 'peak', 2015, 0, 0],
+                                 [1, 1, 'winter', 2016, 2, 5]],
+                                columns=['Period', 'Scenario', 'Season', 'Year', 'Month', 'Hour'])
+    with pytest.raises(ValueError, match=r"more than one sample for .*\(1, 1, 'winter'\) \(rows 2, 4\)"):
+        join_sampling_key(sampling_key, 1, 1, ['winter'])
+    assert join_sampling_key(sampling_key.iloc[:2], 1, 1, ['winter']) == \
+        {(1, 1, 'winter'): [2015, 1, 0], (1, 1, 'peak'): [2015, 0, 0]}
+
+
+def series(start, hours):
+    time = pd.date_range(start, periods=hours, freq="h")
+    frame = pd.DataFrame({'time': time.strftime("%Y-%m-%d %H:%M"), 'DE': np.arange(hours, dtype=float)})
+    return make_datetime(frame, "%Y-%m-%d %H:%M")
+
+
+@pytest.mark.parametrize("other, problem", [(series("2015-01-01 00:00", 47), "47 hours instead of 48"),
+                                            (series("2015-01-01 01:00", 48),
+                                             "first different timestamp 2015-01-01T01:00")])
+def test_time_series_that_are_not_aligned(tmp_path, other, problem):
+    data = {'solar': series("2015-01-01 00:00", 48), 'electricload': other}
+    with pytest.raises(ValueError, match="The time series electricload is not aligned with solar: " + problem):
+        TimeCube(data)
+    with pytest.raises(ValueError, match="not aligned"):
+        TimeCube(data, str(tmp_path / "cube"), {'solar': 1, 'electricload': 2})
+
+
+def test_corrupt_timeseries_cache_is_rebuilt(tmp_path):
+    path = str(tmp_path / "solar.csv")
+    write_series(path, [0.1, 0.2, 0.3])
+    load_timeseries(str(tmp_path), "solar.csv", "%Y-%m-%d %H:%M")
+    cache = timeseries_cache_path(str(tmp_path), "solar.csv")
+    # a half written array, and the raw file of another run building the same cache
+    with open(cache + "/values.npy", 'r+b') as f:
+        f.truncate(os.path.getsize(cache + "/values.npy") - 4)
+    with open(cache + "/values.99999.raw", 'wb') as f:
+        f.write(b"other run")
+    assert load_timeseries(str(tmp_path), "solar.csv", "%Y-%m-%d %H:%M")['DE'].tolist() == \
+        pytest.approx([0.1, 0.2, 0.3])
+    assert np.load(cache + "/values.npy").shape == (3, 1)
+    assert sorted(os.listdir(cache)) == ['calendar.npy', 'columns.json', 'time.npy', 'values.99999.raw',
+                                         'values.npy']